@@ -2,22 +2,32 @@ import json
 import boto3
 import os
 
+from retrieve_cache import retrieval_cache
+
 knowledge_base_id = os.environ.get('KNOWLEDGE_BASE_ID', '')
 number_of_results = 5
 
 bedrock_agent_runtime_client = boto3.client("bedrock-agent-runtime")
 
+def retrieve_results(query: str) -> list:
+    """Return the retrievalResults of a query, from retrieval_cache when the same query was made recently."""
+    def load():
+        response = bedrock_agent_runtime_client.retrieve(
+            retrievalQuery={"text": query},
+            knowledgeBaseId=knowledge_base_id,
+                retrievalConfiguration={
+                    "vectorSearchConfiguration": {"numberOfResults": number_of_results},
+                },
+            )
+        # print(f"response: {response}")
+        return response.get("retrievalResults", [])
+
+    # The cache lives as long as the warm Lambda execution environment
+    key = retrieval_cache.make_key(knowledge_base_id, number_of_results, query)
+    return retrieval_cache.get_or_load(key, load)
+
 def retrieve(query: str) -> str:
-    response = bedrock_agent_runtime_client.retrieve(
-        retrievalQuery={"text": query},
-        knowledgeBaseId=knowledge_base_id,
-            retrievalConfiguration={
-                "vectorSearchConfiguration": {"numberOfResults": number_of_results},
-            },
-        )
-    
-    # print(f"response: {response}")
-    retrieval_results = response.get("retrievalResults", [])
+    retrieval_results = retrieve_results(query)
     # print(f"retrieval_results: {retrieval_results}")
 
     json_docs = []
@@ -1,6 +1,11 @@
 import os
+import ast
 import boto3
 import json
+import importlib.util
+import py_compile
+import sys
+import tempfile
 import zipfile
 import time 
 
@@ -507,21 +512,139 @@ user_pool_id = cognito_config.get('user_pool_id')
 username = cognito_config.get('test_username')
 password = cognito_config.get('test_password')
 
+LAMBDA_RUNTIME = 'python3.13'
+
+# Vendored packages that are only imported lazily for console rendering (STRANDS_TOOL_CONSOLE_MODE=enabled)
+CONSOLE_MODULES = ['rich', 'colorama']
+
+def find_module_path(lambda_dir, module_name):
+    """Return the package directory or .py file of a top-level module in the lambda directory"""
+    package_dir = os.path.join(lambda_dir, module_name)
+    if os.path.isfile(os.path.join(package_dir, '__init__.py')):
+        return package_dir
+    module_file = package_dir + '.py'
+    if os.path.isfile(module_file):
+        return module_file
+    return None
+
+def module_level_imports(file_path):
+    """Return the top-level names imported at module level. Imports inside functions are lazy and skipped."""
+    with open(file_path, 'rb') as f:
+        try:
+            tree = ast.parse(f.read(), filename=file_path)
+        except SyntaxError:
+            return set()
+
+    names = set()
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level == 0 and node.module:
+                names.add(node.module.split('.')[0])
+        elif isinstance(node, (ast.If, ast.Try, ast.With)):
+            # Conditional imports at module level, e.g. try: import x except ImportError
+            for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                for child in getattr(node, field, []):
+                    nodes.extend(child.body if isinstance(child, ast.ExceptHandler) else [child])
+    return names
+
+def find_required_modules(lambda_dir, entry_module='lambda_function'):
+    """
+    Tree-shake the lambda directory: follow the module-level imports from the entry module
+    and return the top-level modules that are reached. Packages are kept as a whole, since
+    they may load their own submodules dynamically.
+    """
+    roots = [entry_module]
+    if os.environ.get('STRANDS_TOOL_CONSOLE_MODE') == 'enabled':
+        roots += CONSOLE_MODULES
+
+    required = set()
+    while roots:
+        module_name = roots.pop()
+        if module_name in required:
+            continue
+        module_path = find_module_path(lambda_dir, module_name)
+        if module_path is None:  # provided by the Lambda runtime or the standard library
+            continue
+        required.add(module_name)
+
+        if os.path.isdir(module_path):
+            files = [os.path.join(root, file) for root, dirs, filenames in os.walk(module_path) for file in filenames if file.endswith('.py')]
+        else:
+            files = [module_path]
+        for file_path in files:
+            roots.extend(module_level_imports(file_path) - required)
+    return required
+
+def create_lambda_zip(lambda_dir, zip_path):
+    """
+    Package the lambda directory for a fast cold start.
+
+    Only the modules reached from lambda_function are packaged. __pycache__, dist-info and
+    bin directories are left out. The memory-mapped service catalog of use_aws is built
+    into aws_catalog.idx. When the local Python matches the Lambda runtime, bytecode
+    is precompiled into the zip with unchecked hashes, so the read-only /var/task does not
+    have to compile the sources on every cold start.
+    """
+    required = find_required_modules(lambda_dir)
+    print(f"Packaging modules: {sorted(required)}")
+
+    runtime_version = LAMBDA_RUNTIME.replace('python', '')
+    precompile = f"{sys.version_info.major}.{sys.version_info.minor}" == runtime_version
+    if not precompile:
+        print(f"Skipping bytecode precompilation: local Python {sys.version_info.major}.{sys.version_info.minor} does not match {LAMBDA_RUNTIME}")
+
+    source_files = []
+    for module_name in sorted(required):
+        module_path = find_module_path(lambda_dir, module_name)
+        if os.path.isfile(module_path):
+            source_files.append(module_path)
+            continue
+        for root, dirs, files in os.walk(module_path):
+            dirs[:] = [d for d in dirs if d != '__pycache__' and not d.endswith('.dist-info')]
+            source_files.extend(os.path.join(root, file) for file in files if not file.endswith(('.pyc', '.pyo')))
+
+    with tempfile.TemporaryDirectory() as build_dir, zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for file_path in source_files:
+            arcname = os.path.relpath(file_path, lambda_dir)
+            zip_file.write(file_path, arcname)
+
+            if precompile and file_path.endswith('.py'):
+                pyc_arcname = os.path.relpath(importlib.util.cache_from_source(file_path), lambda_dir)
+                pyc_path = os.path.join(build_dir, pyc_arcname)
+                try:
+                    py_compile.compile(
+                        file_path, cfile=pyc_path, doraise=True,
+                        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+                    )
+                    zip_file.write(pyc_path, pyc_arcname)
+                except py_compile.PyCompileError as e:
+                    print(f"Failed to compile {arcname}: {e}")
+
+        # Bake the service catalog, so the handler validates names without loading botocore models
+        if 'use_aws' in required:
+            sys.path.insert(0, lambda_dir)
+            try:
+                import use_aws
+                catalog_path = os.path.join(build_dir, 'aws_catalog.idx')
+                use_aws.MappedServiceCatalog.write(catalog_path)
+                zip_file.write(catalog_path, 'aws_catalog.idx')
+            finally:
+                sys.path.remove(lambda_dir)
+
+    print(f"Lambda package: {len(source_files)} files, {os.path.getsize(zip_path) / 1024:.1f} KB")
+
 def update_lambda_function_arn():
     # zip lambda
     lambda_function_name = 'lambda-' + current_folder_name + '-for-' + config['projectName']
     lambda_function_zip_path = os.path.join(script_dir, lambda_function_name, "lambda_function.zip")
     lambda_dir = os.path.join(script_dir, lambda_function_name)
-    # Create zip with all files and folders recursively
+    # Create zip with the modules used by lambda_function
     try:
-        with zipfile.ZipFile(lambda_function_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:            
-            for root, dirs, files in os.walk(lambda_dir):
-                for file in files:
-                    if file == 'lambda_function.zip':
-                        continue
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, lambda_dir)
-                    zip_file.write(file_path, arcname)
+        create_lambda_zip(lambda_dir, lambda_function_zip_path)
         print(f"✓ Lambda function zip created successfully: {lambda_function_zip_path}")
     except Exception as e:
         print(f"Failed to create Lambda function zip: {e}")
@@ -535,14 +658,7 @@ def update_lambda_function_arn():
             create_dummpy_lambda_function(lambda_function_path)
             print(f"✓ Lambda function path created successfully: {lambda_function_path}")
 
-            with zipfile.ZipFile(lambda_function_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:     
-                for root, dirs, files in os.walk(lambda_dir):
-                    for file in files:
-                        if file == 'lambda_function.zip':
-                            continue
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, lambda_dir)
-                        zip_file.write(file_path, arcname)
+            create_lambda_zip(lambda_dir, lambda_function_zip_path)
             print(f"✓ Lambda function zip created successfully: {lambda_function_zip_path}")
         pass
 
@@ -576,7 +692,7 @@ def update_lambda_function_arn():
                 environment_variables = {}
                 response = lambda_client.create_function(
                     FunctionName=lambda_function_name,
-                    Runtime='python3.13',
+                    Runtime=LAMBDA_RUNTIME,
                     Handler='lambda_function.lambda_handler',
                     Role=lambda_function_role,
                     Description=f'Lambda function for {lambda_function_name}',
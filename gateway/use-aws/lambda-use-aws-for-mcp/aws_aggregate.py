@@ -0,0 +1,226 @@
+"""
+aws_aggregate.py folds the records of paginated use_aws responses into per-group metrics.
+
+Aggregator selects the records of each page, groups them and keeps only the running
+metrics (count, sum, min, max, avg) and the top_k records, so an aggregate over millions
+of records returns a small table. Plain dotted field paths are looked up directly instead
+of through JMESPath.
+
+Settings (environment variables):
+    USE_AWS_AGGREGATE_LIMIT: groups returned by an aggregate unless it sets its own limit (default: 100)
+"""
+
+import heapq
+import itertools
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import use_aws as aws_utils
+
+# Groups returned by an aggregate unless it sets its own limit
+AGGREGATE_LIMIT = int(os.environ.get("USE_AWS_AGGREGATE_LIMIT", "100"))
+
+AGGREGATE_METRIC_PATTERN = re.compile(r"^(count|sum|min|max|avg)(?:\((.+)\))?$")
+FIELD_PATH_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+class FieldPath:
+    """
+    Plain dotted field path such as "Placement.AvailabilityZone". It behaves like a
+    compiled JMESPath expression, but is a few dict lookups instead of a tree walk.
+    """
+    __slots__ = ("keys",)
+
+    def __init__(self, expression: str):
+        self.keys = expression.split(".")
+
+    def search(self, value: Any) -> Any:
+        for key in self.keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+def compile_field(expression: str) -> Any:
+    """Compile a per-record expression, using FieldPath for plain dotted paths."""
+    if FIELD_PATH_PATTERN.match(expression):
+        return FieldPath(expression)
+    return aws_utils.compile_query(expression)
+
+class Descending:
+    """Heap entry wrapper that reverses the ordering, used for the smallest top_k records."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __lt__(self, other: "Descending") -> bool:
+        return other.value < self.value
+
+class Aggregator:
+    """
+    Streaming aggregation over the records of paginated responses.
+
+    Records are selected from each page, folded into per-group metrics and dropped, so
+    memory grows with the number of groups (and top_k), not with the number of records.
+
+    Spec:
+        items: JMESPath selecting the records of a page, e.g. "Reservations[].Instances[]".
+            Defaults to the result keys of the paginator.
+        group_by: JMESPath expression or list of expressions, e.g.
+            ["InstanceType", "Placement.AvailabilityZone"]
+        metrics: List of "count", "sum(expr)", "min(expr)", "max(expr)" or "avg(expr)".
+            Defaults to ["count"].
+        sort_by: Metric that orders the groups, descending. Defaults to the first metric.
+        limit: Maximum number of groups returned (default: USE_AWS_AGGREGATE_LIMIT)
+        top_k: {"k": 5, "by": "Size", "order": "desc", "select": "{Key: Key, Size: Size}"}
+            returns the k records with the largest (or smallest) value of "by"
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        if not isinstance(spec, dict):
+            raise ValueError("aggregate must be an object")
+        self.items = aws_utils.compile_query(spec["items"]) if spec.get("items") else None
+
+        group_by = spec.get("group_by") or []
+        self.group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        self._group_exprs = [compile_field(expr) for expr in self.group_by]
+
+        self.metrics = list(spec.get("metrics") or ["count"])
+        self._metric_exprs = []
+        for metric in self.metrics:
+            match = AGGREGATE_METRIC_PATTERN.match(metric.replace(" ", ""))
+            if match is None or (match.group(1) != "count" and not match.group(2)):
+                raise ValueError(f"Invalid metric: {metric}, use count, sum(expr), min(expr), max(expr) or avg(expr)")
+            expr = compile_field(match.group(2)) if match.group(2) else None
+            self._metric_exprs.append((match.group(1), expr))
+
+        self.sort_by = spec.get("sort_by") or self.metrics[0]
+        if self.sort_by not in self.metrics:
+            raise ValueError(f"sort_by must be one of the metrics: {self.metrics}")
+        self.limit = int(spec.get("limit") or AGGREGATE_LIMIT)
+
+        top_k = spec.get("top_k")
+        self.top_k = None
+        if top_k:
+            if not isinstance(top_k, dict) or not top_k.get("by"):
+                raise ValueError('top_k must be an object such as {"k": 5, "by": "Size"}')
+            self.top_k = {
+                "k": int(top_k.get("k", 10)),
+                "by": compile_field(top_k["by"]),
+                "select": compile_field(top_k["select"]) if top_k.get("select") else None,
+                "ascending": top_k.get("order") == "asc",
+            }
+        self._top: List[Tuple[Any, int, Any]] = []
+        self._counter = itertools.count()
+
+        self.records = 0
+        self.pages = 0
+        self._groups: Dict[Tuple, List[Any]] = {}
+
+    def add_page(self, page: Any, result_keys: Optional[List[Any]] = None, limit: Optional[int] = None) -> int:
+        """
+        Fold the records of one page into the aggregate.
+
+        Args:
+            page: One page of a paginated response, or a single response
+            result_keys: Parsed JMESPath expressions of the paginator's result keys, used
+                when the spec does not select the items
+            limit: Optional maximum number of records folded in from the page
+
+        Returns:
+            Number of records folded in
+        """
+        if self.items is not None:
+            records = self.items.search(page) or []
+        elif result_keys:
+            records = [record for key in result_keys for record in (key.search(page) or [])]
+        else:
+            raise ValueError("This operation cannot be paginated, set aggregate.items to select the records")
+        if not isinstance(records, list):
+            records = [records]
+        if limit:
+            records = records[:limit]
+
+        self.pages += 1
+        for record in records:
+            self.add(record)
+        return len(records)
+
+    def add(self, record: Any) -> None:
+        """Fold a single record into the aggregate."""
+        self.records += 1
+        key = tuple(self._hashable(expr.search(record)) for expr in self._group_exprs)
+        state = self._groups.get(key)
+        if state is None:
+            state = self._groups[key] = [None] * len(self._metric_exprs)
+
+        for i, (name, expr) in enumerate(self._metric_exprs):
+            if name == "count":
+                state[i] = (state[i] or 0) + 1
+                continue
+            value = expr.search(record)
+            if value is None:
+                continue
+            try:
+                if name == "sum":
+                    state[i] = (state[i] or 0) + value
+                elif name == "avg":
+                    total, count = state[i] or (0, 0)
+                    state[i] = (total + value, count + 1)
+                elif name == "min":
+                    state[i] = value if state[i] is None or value < state[i] else state[i]
+                elif name == "max":
+                    state[i] = value if state[i] is None or value > state[i] else state[i]
+            except TypeError:
+                pass  # values that cannot be added or compared, e.g. a string in a sum
+
+        if self.top_k is not None:
+            value = self.top_k["by"].search(record)
+            if value is None:
+                return
+            select = self.top_k["select"]
+            entry = (Descending(value) if self.top_k["ascending"] else value, next(self._counter),
+                     select.search(record) if select else record)
+            try:
+                if len(self._top) < self.top_k["k"]:
+                    heapq.heappush(self._top, entry)
+                elif self._top[0] < entry:
+                    heapq.heapreplace(self._top, entry)
+            except TypeError:
+                pass
+
+    @staticmethod
+    def _hashable(value: Any) -> Any:
+        if isinstance(value, (list, dict)):
+            return aws_utils.encode_json(value)
+        return value
+
+    def result(self) -> Dict[str, Any]:
+        """Return the aggregate table, ordered by sort_by and cut to the limit."""
+        rows = []
+        for key, state in self._groups.items():
+            row = dict(zip(self.group_by, key))
+            for metric, (name, _), value in zip(self.metrics, self._metric_exprs, state):
+                if name == "avg":
+                    value = value[0] / value[1] if value else None
+                row[metric] = value
+            rows.append(row)
+
+        def sort_key(row: Dict[str, Any]) -> Tuple[bool, Any]:
+            value = row[self.sort_by]
+            return (value is not None, value if isinstance(value, (int, float)) else 0)
+        rows.sort(key=sort_key, reverse=True)
+
+        result = {
+            "records": self.records,
+            "pages": self.pages,
+            "groups": len(rows),
+            "rows": rows[:self.limit],
+        }
+        if len(rows) > self.limit:
+            result["truncated"] = True
+        if self.top_k is not None:
+            top = sorted(self._top, reverse=True)
+            result["top_k"] = [record for _, _, record in top]
+        return result
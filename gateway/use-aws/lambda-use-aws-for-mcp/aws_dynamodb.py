@@ -0,0 +1,385 @@
+"""
+aws_dynamodb.py runs DynamoDB scans and get_item calls for use_aws in parallel and in batches.
+
+DynamoDBParallelScan splits a scan into segments that are scanned concurrently within a
+share of the read capacity of the table. batch_get_items sends batch_get_item requests of
+any size and retries their unprocessed keys, and get_items_batched turns several get_item
+calls into such requests.
+
+Settings (environment variables):
+    USE_AWS_DYNAMODB_SCAN_SEGMENTS: TotalSegments of a parallel scan (default: 8)
+    USE_AWS_DYNAMODB_SCAN_ITEMS: items returned by a scan that is not aggregated (default: 1000)
+    USE_AWS_DYNAMODB_CAPACITY_FRACTION: fraction of the provisioned read capacity used by a scan (default: 0.5)
+    USE_AWS_DYNAMODB_BATCH_MAX_ATTEMPTS: batch_get_item requests per chunk of keys (default: 8)
+"""
+
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import use_aws as aws_utils
+
+# Defaults of the parallel DynamoDB scan and the batched get_item
+DYNAMODB_SCAN_SEGMENTS = int(os.environ.get("USE_AWS_DYNAMODB_SCAN_SEGMENTS", "8"))
+DYNAMODB_SCAN_ITEMS = int(os.environ.get("USE_AWS_DYNAMODB_SCAN_ITEMS", "1000"))
+DYNAMODB_CAPACITY_FRACTION = float(os.environ.get("USE_AWS_DYNAMODB_CAPACITY_FRACTION", "0.5"))
+DYNAMODB_BATCH_GET_KEYS = 100
+DYNAMODB_BATCH_MAX_ATTEMPTS = int(os.environ.get("USE_AWS_DYNAMODB_BATCH_MAX_ATTEMPTS", "8"))
+
+class CapacityRateLimiter:
+    """
+    Token bucket of capacity units per second shared by the workers of a DynamoDB scan.
+
+    The units of a request are only known from its ConsumedCapacity, so a request waits
+    while the bucket is in debt and is charged after it returns. With rate units per second
+    and a burst of one second, the long-run consumption converges to the rate.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("read_capacity must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.tokens = self.burst
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Wait until the bucket is out of debt. Blocks."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens > 0:
+                    return
+                delay = min(-self.tokens / self.rate + 0.001, 1.0)
+                self.waited += delay
+            time.sleep(delay)
+
+    def charge(self, units: float) -> None:
+        """Charge the capacity units consumed by a request."""
+        with self._lock:
+            self._refill()
+            self.tokens -= units
+
+def consumed_units(response: Dict[str, Any]) -> float:
+    """Sum the CapacityUnits of the ConsumedCapacity of a response (one entry or a list)."""
+    consumed = response.get("ConsumedCapacity") or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(entry.get("CapacityUnits", 0) for entry in consumed)
+
+def provisioned_read_capacity(client: Any, table_name: str, index_name: Optional[str] = None) -> Optional[int]:
+    """Return the provisioned ReadCapacityUnits of a table or index, None for on-demand tables."""
+    table = client.describe_table(TableName=table_name)["Table"]
+    throughput = table.get("ProvisionedThroughput") or {}
+    if index_name:
+        for index in table.get("GlobalSecondaryIndexes") or []:
+            if index["IndexName"] == index_name:
+                throughput = index.get("ProvisionedThroughput") or {}
+    return throughput.get("ReadCapacityUnits") or None
+
+class DynamoDBParallelScan:
+    """
+    Parallel scan of a DynamoDB table split into Segment/TotalSegments.
+
+    Each segment is an independent blocking task that pages through its part of the table
+    with ExclusiveStartKey, run concurrently by the caller (see run for a thread pool
+    driver). Pages are folded under a lock into the first `items` items, or into an
+    Aggregator, and dropped, so memory does not grow with the table. ProjectionExpression
+    and FilterExpression of the parameters are applied by DynamoDB on every segment.
+
+    Read capacity is shared by the segments with a CapacityRateLimiter: read_capacity units
+    per second when set, otherwise capacity_fraction of the provisioned ReadCapacityUnits of
+    the table (or of the scanned index). On-demand tables are not limited unless
+    read_capacity is set.
+
+    Spec:
+        segments: TotalSegments of the scan (default: USE_AWS_DYNAMODB_SCAN_SEGMENTS)
+        workers: Segments scanned at once (default: segments)
+        read_capacity: Read capacity units per second consumed by the scan
+        capacity_fraction: Fraction of the provisioned read capacity (default: USE_AWS_DYNAMODB_CAPACITY_FRACTION)
+        items: Items returned when not aggregating (default: USE_AWS_DYNAMODB_SCAN_ITEMS)
+    """
+
+    def __init__(self, client: Any, parameters: Dict[str, Any], spec: Optional[Dict[str, Any]] = None,
+                 aggregator: Optional[Any] = None, max_items: Optional[int] = None):
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise ValueError("parallel_scan must be an object")
+        unsupported = [name for name in ("Segment", "TotalSegments", "ExclusiveStartKey") if name in parameters]
+        if unsupported:
+            raise ValueError(f"parallel_scan splits the whole table, remove {', '.join(unsupported)}")
+        if "TableName" not in parameters:
+            raise ValueError("parallel_scan requires TableName")
+        self.segments = int(spec.get("segments", DYNAMODB_SCAN_SEGMENTS))
+        if not 1 <= self.segments <= 1000000:
+            raise ValueError("segments must be between 1 and 1000000")
+        self.workers = max(min(int(spec.get("workers", self.segments)), self.segments), 1)
+        self.read_capacity = spec.get("read_capacity")
+        self.capacity_fraction = float(spec.get("capacity_fraction", DYNAMODB_CAPACITY_FRACTION))
+        self.limit_items = int(spec.get("items", DYNAMODB_SCAN_ITEMS))
+        self.parameters = dict(parameters, ReturnConsumedCapacity="TOTAL")
+        self.aggregator = aggregator
+        self.max_items = max_items
+
+        self.client = client
+        self.limiter: Optional[CapacityRateLimiter] = None
+        self.items: List[Dict[str, Any]] = []
+        self.count = 0
+        self.scanned_count = 0
+        self.capacity_units = 0.0
+        self.requests = 0
+        self.scanned_segments = 0
+        self.done = False
+        self._result_keys = [aws_utils.compile_query("Items")]
+        self._lock = threading.Lock()
+
+    def configure_capacity(self) -> Optional[float]:
+        """Set up the rate limiter from the spec or the provisioned capacity. Blocks."""
+        rate = self.read_capacity
+        if rate is None and self.capacity_fraction > 0:
+            provisioned = provisioned_read_capacity(
+                self.client, self.parameters["TableName"], self.parameters.get("IndexName")
+            )
+            if provisioned:
+                rate = provisioned * self.capacity_fraction
+        if rate:
+            self.limiter = CapacityRateLimiter(float(rate))
+        return rate
+
+    def _consume(self, page: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.capacity_units += consumed_units(page)
+            self.scanned_count += page.get("ScannedCount", 0)
+            if self.done:
+                return
+            items = page.get("Items") or []
+            if self.max_items:
+                items = items[:self.max_items - self.count]
+            self.count += len(items)
+            if self.aggregator is not None:
+                self.aggregator.add_page({"Items": items}, self._result_keys)
+            elif len(self.items) < self.limit_items:
+                self.items.extend(items[:self.limit_items - len(self.items)])
+            if self.max_items and self.count >= self.max_items:
+                self.done = True
+
+    def scan_segment(self, segment: int) -> None:
+        """Scan one segment to its end. Blocks."""
+        parameters = dict(self.parameters, Segment=segment, TotalSegments=self.segments)
+        while not self.done:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            page = self.client.scan(**parameters)
+            if self.limiter is not None:
+                self.limiter.charge(consumed_units(page))
+            self._consume(page)
+            if not page.get("LastEvaluatedKey"):
+                break
+            parameters["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+        with self._lock:
+            self.scanned_segments += 1
+
+    def run(self) -> Dict[str, Any]:
+        """Scan the table on a thread pool of `workers` threads and return the result."""
+        start = time.perf_counter()
+        self.configure_capacity()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="use-aws-dynamodb-scan") as pool:
+            list(pool.map(self.scan_segment, range(self.segments)))
+        return self.result(time.perf_counter() - start)
+
+    def result(self, elapsed: float) -> Dict[str, Any]:
+        """Return the items, or the aggregate table, with the scan statistics."""
+        if self.aggregator is not None:
+            result = self.aggregator.result()
+        else:
+            result = {"Items": self.items, "Count": self.count}
+            if self.count > len(self.items):
+                result["items_truncated"] = True
+        result["ScannedCount"] = self.scanned_count
+        result["scan"] = {
+            "segments": self.segments,
+            "workers": self.workers,
+            "requests": self.requests,
+            "capacity_units": round(self.capacity_units, 1),
+            "read_capacity_limit": round(self.limiter.rate, 1) if self.limiter else None,
+            "throttled_ms": round(self.limiter.waited * 1000, 1) if self.limiter else 0,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "items_per_second": round(self.count / elapsed) if elapsed else None,
+        }
+        if self.done and self.max_items:
+            result["truncated"] = True
+        return result
+
+def batch_get_items(client: Any, RequestItems: Dict[str, Dict[str, Any]], ReturnConsumedCapacity: Optional[str] = None,
+                    max_attempts: int = DYNAMODB_BATCH_MAX_ATTEMPTS) -> Dict[str, Any]:
+    """
+    batch_get_item without the limit of 100 keys per request.
+
+    The keys of every table are sent in chunks of 100, and UnprocessedKeys (throttling or
+    the 16 MB response limit) are retried with exponential backoff and jitter. Keys still
+    unprocessed after max_attempts requests of a chunk are returned in UnprocessedKeys.
+
+    Args:
+        client: DynamoDB client
+        RequestItems: Keys and options per table, as for batch_get_item
+        ReturnConsumedCapacity: As for batch_get_item
+        max_attempts: Requests per chunk before giving up on its unprocessed keys
+
+    Returns:
+        Responses, UnprocessedKeys and ConsumedCapacity merged over all requests
+    """
+    keys = [
+        (table, key) for table, request in RequestItems.items() for key in request.get("Keys", [])
+    ]
+    responses: Dict[str, List[Dict[str, Any]]] = {table: [] for table in RequestItems}
+    unprocessed: Dict[str, Dict[str, Any]] = {}
+    consumed: Dict[str, float] = {}
+    for offset in range(0, len(keys), DYNAMODB_BATCH_GET_KEYS):
+        chunk: Dict[str, Dict[str, Any]] = {}
+        for table, key in keys[offset:offset + DYNAMODB_BATCH_GET_KEYS]:
+            if table not in chunk:
+                options = {name: value for name, value in RequestItems[table].items() if name != "Keys"}
+                chunk[table] = dict(options, Keys=[])
+            chunk[table]["Keys"].append(key)
+
+        for attempt in range(max_attempts):
+            if attempt:
+                time.sleep(min(0.05 * 2 ** attempt, 5.0) * random.uniform(0.5, 1.0))
+            parameters = {"RequestItems": chunk}
+            if ReturnConsumedCapacity:
+                parameters["ReturnConsumedCapacity"] = ReturnConsumedCapacity
+            response = client.batch_get_item(**parameters)
+            for table, items in response.get("Responses", {}).items():
+                responses.setdefault(table, []).extend(items)
+            for entry in response.get("ConsumedCapacity") or []:
+                consumed[entry["TableName"]] = consumed.get(entry["TableName"], 0) + entry.get("CapacityUnits", 0)
+            chunk = response.get("UnprocessedKeys") or {}
+            if not chunk:
+                break
+        for table, request in chunk.items():
+            unprocessed.setdefault(table, dict(request, Keys=[]))["Keys"].extend(request["Keys"])
+
+    result: Dict[str, Any] = {"Responses": responses, "UnprocessedKeys": unprocessed}
+    if ReturnConsumedCapacity:
+        result["ConsumedCapacity"] = [
+            {"TableName": table, "CapacityUnits": units} for table, units in consumed.items()
+        ]
+    return result
+
+def _key_value(value: Any) -> Any:
+    """Normalize a key AttributeValue: DynamoDB returns {"N": "1"} for a key sent as "1.0" or "01"."""
+    if isinstance(value, dict) and isinstance(value.get("N"), str):
+        try:
+            number = Decimal(value["N"])
+        except ArithmeticError:
+            return value
+        return {"N": "0" if number.is_zero() else str(number.normalize())}
+    return value
+
+def _key_fingerprint(item: Dict[str, Any], names: List[str]) -> str:
+    # Binary keys are bytes in responses and may be str or bytes in requests; json_default encodes both alike
+    return json.dumps([_key_value(item.get(name)) for name in names], sort_keys=True, default=aws_utils.json_default)
+
+def get_items_batched(client: Any, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run several get_item calls as batch_get_item requests.
+
+    Requests on the same table with the same ConsistentRead, ProjectionExpression and
+    ExpressionAttributeNames share a RequestItems entry; duplicate keys are fetched once.
+    Key attributes missing from a ProjectionExpression are added to match the items back
+    to their requests, and removed again from the returned items.
+
+    Args:
+        client: DynamoDB client
+        requests: Parameters of get_item calls (TableName, Key, ...)
+
+    Returns:
+        get_item shaped responses ({"Item": ...}, or {} when the key does not exist), in the
+        order of the requests. Requests whose keys stay unprocessed get an "Error".
+    """
+    # Requests grouped by table and options, with their distinct keys
+    tables: Dict[str, Dict[str, Any]] = {}
+    # Group, key attribute names and key fingerprint of each request
+    slots: List[Tuple[str, List[str], str]] = []
+    for request in requests:
+        options = {
+            name: request[name] for name in ("ConsistentRead", "ProjectionExpression", "ExpressionAttributeNames")
+            if name in request
+        }
+        group = json.dumps([request["TableName"], options], sort_keys=True)
+        names = sorted(request["Key"])
+        if group not in tables:
+            tables[group] = {"TableName": request["TableName"], "options": options, "keys": {}, "added": set()}
+        entry = tables[group]
+        fingerprint = _key_fingerprint(request["Key"], names)
+        entry["keys"].setdefault(fingerprint, request["Key"])
+        projection = options.get("ProjectionExpression")
+        if projection is not None:
+            projected = {
+                options.get("ExpressionAttributeNames", {}).get(token, token)
+                for token in re.split(r"\s*,\s*", projection.strip())
+            }
+            entry["added"].update(name for name in names if name not in projected)
+        slots.append((group, names, fingerprint))
+
+    # batch_get_item accepts one entry per table, so groups of the same table are separate calls
+    found: Dict[str, Dict[str, Dict[str, Any]]] = {group: {} for group in tables}
+    failed = set()
+    by_table: Dict[str, List[str]] = {}
+    for group, entry in tables.items():
+        by_table.setdefault(entry["TableName"], []).append(group)
+    for round_groups in itertools.zip_longest(*by_table.values()):
+        request_items: Dict[str, Dict[str, Any]] = {}
+        for group in round_groups:
+            if group is None:
+                continue
+            entry = tables[group]
+            options = dict(entry["options"])
+            if entry["added"]:
+                attribute_names = dict(options.get("ExpressionAttributeNames", {}))
+                placeholders = []
+                for i, name in enumerate(sorted(entry["added"])):
+                    attribute_names[f"#use_aws_key{i}"] = name
+                    placeholders.append(f"#use_aws_key{i}")
+                options["ExpressionAttributeNames"] = attribute_names
+                options["ProjectionExpression"] = ", ".join([options["ProjectionExpression"]] + placeholders)
+            request_items[entry["TableName"]] = dict(options, Keys=list(entry["keys"].values()))
+
+        response = batch_get_items(client, request_items)
+        for group in round_groups:
+            if group is None:
+                continue
+            entry = tables[group]
+            names = sorted(next(iter(entry["keys"].values())))
+            for item in response["Responses"].get(entry["TableName"], []):
+                fingerprint = _key_fingerprint(item, names)
+                for name in entry["added"]:
+                    item.pop(name, None)
+                found[group][fingerprint] = item
+            for key in response["UnprocessedKeys"].get(entry["TableName"], {}).get("Keys", []):
+                failed.add((group, _key_fingerprint(key, names)))
+
+    results = []
+    for group, names, fingerprint in slots:
+        if (group, fingerprint) in failed:
+            results.append({"Error": "Key still unprocessed after retries (throttled)"})
+        elif fingerprint in found[group]:
+            results.append({"Item": found[group][fingerprint]})
+        else:
+            results.append({})
+    return results
@@ -0,0 +1,201 @@
+"""
+aws_log_patterns.py mines log templates from CloudWatch Logs events returned by use_aws.
+
+LogPatternMiner groups the messages of filter_log_events and get_log_events pages into
+patterns such as "Connection to <*> timed out after <*>", with their counts, first and
+last timestamps and a few sample lines, instead of returning every event.
+
+Settings (environment variables):
+    USE_AWS_LOG_PATTERN_SIMILARITY: fraction of matching tokens to join a pattern (default: 0.4)
+    USE_AWS_LOG_PATTERN_DEPTH: depth of the routing tree (default: 4)
+    USE_AWS_LOG_PATTERN_MAX_PATTERNS: patterns kept in memory (default: 1000)
+    USE_AWS_LOG_PATTERN_LIMIT: patterns returned (default: 50)
+    USE_AWS_LOG_PATTERN_SAMPLES: sample lines kept per pattern (default: 3)
+"""
+
+import itertools
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Defaults of log pattern mining
+LOG_PATTERN_SIMILARITY = float(os.environ.get("USE_AWS_LOG_PATTERN_SIMILARITY", "0.4"))
+LOG_PATTERN_DEPTH = int(os.environ.get("USE_AWS_LOG_PATTERN_DEPTH", "4"))
+LOG_PATTERN_MAX_PATTERNS = int(os.environ.get("USE_AWS_LOG_PATTERN_MAX_PATTERNS", "1000"))
+LOG_PATTERN_LIMIT = int(os.environ.get("USE_AWS_LOG_PATTERN_LIMIT", "50"))
+LOG_PATTERN_SAMPLES = int(os.environ.get("USE_AWS_LOG_PATTERN_SAMPLES", "3"))
+
+LOG_PATTERN_OPERATIONS = {("logs", "filter_log_events"), ("logs", "get_log_events")}
+LOG_PATTERN_WILDCARD = "<*>"
+# Tokens with a digit are variables (ids, counters, addresses, durations, ...)
+LOG_VARIABLE_PATTERN = re.compile(r"(?<!\S)[^\s\d]*\d\S*")
+LOG_SAMPLE_MAX_CHARS = 500
+LOG_MEMO_SIZE = 65536
+
+class _LogPattern:
+    __slots__ = ("id", "tokens", "count", "first", "last", "samples", "leaf")
+
+    def __init__(self, pattern_id: int, tokens: List[str], leaf: List["_LogPattern"]):
+        self.id = pattern_id
+        self.tokens = tokens
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.samples: List[str] = []
+        self.leaf = leaf
+
+class LogPatternMiner:
+    """
+    Streaming log template mining (Drain) over CloudWatch Logs events.
+
+    Variable tokens are masked, and each line is routed through a fixed-depth tree keyed by
+    its token count and leading tokens to a few candidate patterns. The line joins the most
+    similar one, whose differing tokens become <*>, or starts a new pattern. Events are
+    dropped once counted, and the least recently matched patterns are evicted beyond
+    max_patterns, so memory stays bounded for any number of lines.
+
+    Spec:
+        similarity: Fraction of matching tokens to join a pattern (default: USE_AWS_LOG_PATTERN_SIMILARITY)
+        depth: Depth of the routing tree, at least 3 (default: USE_AWS_LOG_PATTERN_DEPTH)
+        max_patterns: Patterns kept in memory (default: USE_AWS_LOG_PATTERN_MAX_PATTERNS)
+        limit: Patterns returned, by count (default: USE_AWS_LOG_PATTERN_LIMIT)
+        samples: Representative lines kept per pattern (default: USE_AWS_LOG_PATTERN_SAMPLES)
+    """
+
+    max_children = 100
+
+    def __init__(self, spec: Optional[Dict[str, Any]] = None):
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise ValueError("log_patterns must be an object")
+        self.similarity = float(spec.get("similarity", LOG_PATTERN_SIMILARITY))
+        self.depth = int(spec.get("depth", LOG_PATTERN_DEPTH))
+        self.max_patterns = int(spec.get("max_patterns", LOG_PATTERN_MAX_PATTERNS))
+        self.limit = int(spec.get("limit", LOG_PATTERN_LIMIT))
+        self.samples = int(spec.get("samples", LOG_PATTERN_SAMPLES))
+        if not 0 < self.similarity <= 1:
+            raise ValueError("similarity must be between 0 and 1")
+        if self.depth < 3 or self.max_patterns < 1:
+            raise ValueError("depth must be at least 3 and max_patterns at least 1")
+
+        self.records = 0
+        self.pages = 0
+        self.evicted = 0
+        self._root: Dict[Any, Any] = {}
+        # Patterns in order of their last match, for eviction
+        self._patterns: "OrderedDict[int, _LogPattern]" = OrderedDict()
+        # Masked lines seen recently and the pattern they joined
+        self._memo: Dict[str, _LogPattern] = {}
+        self._ids = itertools.count()
+
+    @staticmethod
+    def supports(service_name: str, operation_name: str) -> bool:
+        """Check whether an operation returns log events."""
+        return (service_name, operation_name) in LOG_PATTERN_OPERATIONS
+
+    def add_page(self, page: Any, result_keys: Optional[List[Any]] = None, limit: Optional[int] = None) -> int:
+        """Mine the events of one filter_log_events or get_log_events page, at most limit of them."""
+        events = page.get("events") or []
+        if limit:
+            events = events[:limit]
+        self.pages += 1
+        for event in events:
+            self.add(event.get("message") or "", event.get("timestamp"))
+        return len(events)
+
+    def add(self, message: str, timestamp: Optional[int] = None) -> None:
+        """Mine a single log line with its timestamp in milliseconds."""
+        self.records += 1
+        masked = LOG_VARIABLE_PATTERN.sub(LOG_PATTERN_WILDCARD, message)
+        pattern = self._memo.get(masked)
+        if pattern is None or pattern.id not in self._patterns:
+            pattern = self._match(masked.split())
+            if len(self._memo) >= LOG_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[masked] = pattern
+
+        pattern.count += 1
+        if timestamp is not None:
+            if pattern.first is None or timestamp < pattern.first:
+                pattern.first = timestamp
+            if pattern.last is None or timestamp > pattern.last:
+                pattern.last = timestamp
+        if len(pattern.samples) < self.samples:
+            sample = message.rstrip()[:LOG_SAMPLE_MAX_CHARS]
+            if sample not in pattern.samples:
+                pattern.samples.append(sample)
+        self._patterns.move_to_end(pattern.id)
+
+    def _leaf(self, tokens: List[str]) -> List[_LogPattern]:
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            child = node.get(token)
+            if child is None:
+                if token != LOG_PATTERN_WILDCARD and len(node) >= self.max_children:
+                    token = LOG_PATTERN_WILDCARD
+                child = node.setdefault(token, {})
+            node = child
+        return node.setdefault(None, [])
+
+    def _match(self, tokens: List[str]) -> _LogPattern:
+        # Wildcards match any token; ties go to the more general pattern
+        leaf = self._leaf(tokens)
+        best, best_score = None, (-1, -1)
+        for pattern in leaf:
+            same = wildcards = 0
+            for template_token, token in zip(pattern.tokens, tokens):
+                if template_token == LOG_PATTERN_WILDCARD:
+                    wildcards += 1
+                elif template_token == token:
+                    same += 1
+            score = (same + wildcards, wildcards)
+            if score > best_score:
+                best, best_score = pattern, score
+
+        if best is not None and best_score[0] >= self.similarity * len(tokens):
+            best.tokens = [
+                template_token if template_token == token else LOG_PATTERN_WILDCARD
+                for template_token, token in zip(best.tokens, tokens)
+            ]
+            return best
+
+        pattern = _LogPattern(next(self._ids), tokens, leaf)
+        leaf.append(pattern)
+        self._patterns[pattern.id] = pattern
+        if len(self._patterns) > self.max_patterns:
+            _, evicted = self._patterns.popitem(last=False)
+            evicted.leaf.remove(evicted)
+            self.evicted += evicted.count
+        return pattern
+
+    def result(self) -> Dict[str, Any]:
+        """Return the patterns ordered by count and cut to the limit."""
+        patterns = sorted(self._patterns.values(), key=lambda pattern: pattern.count, reverse=True)
+
+        def iso(timestamp: Optional[int]) -> Optional[str]:
+            if timestamp is None:
+                return None
+            return datetime.fromtimestamp(timestamp / 1000, timezone.utc).isoformat()
+
+        result = {
+            "records": self.records,
+            "pages": self.pages,
+            "groups": len(patterns),
+            "patterns": [
+                {
+                    "template": " ".join(pattern.tokens),
+                    "count": pattern.count,
+                    "first": iso(pattern.first),
+                    "last": iso(pattern.last),
+                    "samples": pattern.samples,
+                }
+                for pattern in patterns[:self.limit]
+            ],
+        }
+        if len(patterns) > self.limit:
+            result["truncated"] = True
+        if self.evicted:
+            result["evicted_records"] = self.evicted
+        return result
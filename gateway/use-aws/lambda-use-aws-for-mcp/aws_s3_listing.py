@@ -0,0 +1,257 @@
+"""
+aws_s3_listing.py lists large S3 buckets for use_aws by splitting them into key ranges.
+
+S3ShardedListing discovers the common prefixes of a bucket and lists groups of them
+concurrently. The pages are folded into an S3ListingSummary (counts, sizes and the first
+objects) or an Aggregator, so memory does not grow with the number of keys.
+
+Settings (environment variables):
+    USE_AWS_S3_LIST_CONCURRENCY: levels or shards listed at once (default: 16)
+    USE_AWS_S3_LIST_MAX_DEPTH: levels of prefixes expanded (default: 3)
+    USE_AWS_S3_LIST_CONTENTS: objects returned with the summary (default: 1000)
+"""
+
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import use_aws as aws_utils
+from aws_aggregate import AGGREGATE_LIMIT, Descending
+
+# Defaults of the prefix-sharded listing of S3 buckets
+S3_LIST_CONCURRENCY = int(os.environ.get("USE_AWS_S3_LIST_CONCURRENCY", "16"))
+S3_LIST_MAX_DEPTH = int(os.environ.get("USE_AWS_S3_LIST_MAX_DEPTH", "3"))
+S3_LIST_CONTENTS = int(os.environ.get("USE_AWS_S3_LIST_CONTENTS", "1000"))
+
+class S3ListingSummary:
+    """
+    Totals of the Contents of list_objects_v2 pages: object count, total size, and breakdowns
+    by prefix (down to prefix_depth delimiters below the listed prefix) and by storage class.
+    The first contents objects, in key order, are returned as well.
+    """
+
+    def __init__(self, prefix: str = "", delimiter: str = "/", prefix_depth: int = 1,
+                 contents: int = S3_LIST_CONTENTS, limit: int = AGGREGATE_LIMIT):
+        self.prefix = prefix
+        self.delimiter = delimiter
+        self.prefix_depth = prefix_depth
+        self.contents = contents
+        self.limit = limit
+        self.records = 0
+        self.pages = 0
+        self.bytes = 0
+        self._by_prefix: Dict[str, List[int]] = {}
+        self._by_storage_class: Dict[str, List[int]] = {}
+        # Max-heap on the key through Descending, keeping the first keys
+        self._first: List[Tuple[Any, Dict[str, Any]]] = []
+
+    def add_page(self, page: Any, result_keys: Optional[List[Any]] = None) -> int:
+        """Fold the Contents of one page into the totals."""
+        contents = page.get("Contents") or []
+        self.pages += 1
+        start = len(self.prefix)
+        for item in contents:
+            key, size = item["Key"], item.get("Size", 0)
+            self.records += 1
+            self.bytes += size
+
+            parts = key[start:].split(self.delimiter, self.prefix_depth)
+            prefix = self.prefix + "".join(part + self.delimiter for part in parts[:-1])
+            totals = self._by_prefix.get(prefix)
+            if totals is None:
+                totals = self._by_prefix[prefix] = [0, 0]
+            totals[0] += 1
+            totals[1] += size
+
+            storage_class = item.get("StorageClass", "STANDARD")
+            totals = self._by_storage_class.get(storage_class)
+            if totals is None:
+                totals = self._by_storage_class[storage_class] = [0, 0]
+            totals[0] += 1
+            totals[1] += size
+
+            if len(self._first) < self.contents:
+                heapq.heappush(self._first, (Descending(key), item))
+            elif self.contents and key < self._first[0][0].value:
+                heapq.heapreplace(self._first, (Descending(key), item))
+        return len(contents)
+
+    def result(self) -> Dict[str, Any]:
+        """Return the totals, the largest prefixes and the first objects."""
+        by_prefix = sorted(self._by_prefix.items(), key=lambda entry: entry[1][1], reverse=True)
+        result = {
+            "records": self.records,
+            "pages": self.pages,
+            "groups": len(by_prefix),
+            "bytes": self.bytes,
+            "by_storage_class": {
+                storage_class: {"objects": count, "bytes": size}
+                for storage_class, (count, size) in sorted(self._by_storage_class.items())
+            },
+            "by_prefix": [
+                {"prefix": prefix, "objects": count, "bytes": size}
+                for prefix, (count, size) in by_prefix[:self.limit]
+            ],
+        }
+        if len(by_prefix) > self.limit:
+            result["by_prefix_truncated"] = True
+        if self.contents:
+            first = sorted(self._first, key=lambda entry: entry[0].value)
+            result["contents"] = [item for _, item in first]
+            if self.records > len(first):
+                result["contents_truncated"] = True
+        return result
+
+class S3ShardedListing:
+    """
+    Prefix-sharded list_objects_v2 of a large bucket.
+
+    Common prefixes are discovered with delimiter listings, level by level, until there are
+    at least `shards` prefixes or max_depth levels added prefixes (levels with a single
+    common prefix, such as logs/2025/, do not count). The objects found directly at an
+    expanded level are consumed during discovery. The remaining prefixes are split into at
+    most `shards` contiguous groups, and each group is listed without a delimiter as one key
+    range, skipping the keys outside its prefixes. A level that overshoots (e.g. 30 days to
+    720 hours) therefore does not turn into one small request per prefix.
+
+    Levels and shards are independent blocking tasks, run concurrently by the caller (see
+    run for a thread pool driver). Pages are folded into a consumer with add_page
+    (S3ListingSummary or Aggregator) under a lock and dropped, so memory does not grow with
+    the number of keys.
+
+    Spec:
+        delimiter: Delimiter of the prefix discovery (default: "/")
+        max_depth: Levels of prefixes expanded (default: USE_AWS_S3_LIST_MAX_DEPTH)
+        shards: Prefixes to reach before listing (default: 4 x concurrency)
+        concurrency: Levels or shards listed at once (default: USE_AWS_S3_LIST_CONCURRENCY)
+        prefix_depth: Delimiter levels of the by_prefix breakdown (default: 1)
+        contents: Objects returned with the summary, in key order (default: USE_AWS_S3_LIST_CONTENTS)
+    """
+
+    def __init__(self, client: Any, parameters: Dict[str, Any], spec: Optional[Dict[str, Any]] = None,
+                 consumer: Optional[Any] = None, max_items: Optional[int] = None):
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise ValueError("sharded_list must be an object")
+        unsupported = [name for name in ("Delimiter", "ContinuationToken", "StartAfter") if name in parameters]
+        if unsupported:
+            raise ValueError(f"sharded_list lists whole prefixes, remove {', '.join(unsupported)}")
+        self.delimiter = spec.get("delimiter") or "/"
+        self.max_depth = int(spec.get("max_depth", S3_LIST_MAX_DEPTH))
+        self.concurrency = max(int(spec.get("concurrency", S3_LIST_CONCURRENCY)), 1)
+        self.shards = int(spec.get("shards", 4 * self.concurrency))
+        self.prefix = parameters.get("Prefix", "")
+        self.parameters = {name: value for name, value in parameters.items() if name != "Prefix"}
+        self.consumer = consumer or S3ListingSummary(
+            self.prefix, self.delimiter, int(spec.get("prefix_depth", 1)), int(spec.get("contents", S3_LIST_CONTENTS))
+        )
+        self.max_items = max_items
+
+        self.client = client
+        self.requests = 0
+        self.depth = 0
+        self.listed_shards = 0
+        self.done = False
+        self._result_keys = [aws_utils.compile_query("Contents")]
+        self._lock = threading.Lock()
+
+    def _pages(self, prefix: str, delimiter: Optional[str] = None) -> Any:
+        parameters = dict(self.parameters, Prefix=prefix)
+        if delimiter:
+            parameters["Delimiter"] = delimiter
+        return self.client.get_paginator("list_objects_v2").paginate(**parameters)
+
+    def _consume(self, page: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests += 1
+            if not self.done:
+                self.consumer.add_page(page, self._result_keys)
+                if self.max_items and self.consumer.records >= self.max_items:
+                    self.done = True
+
+    def list_level(self, prefix: str) -> List[str]:
+        """List the objects directly under a prefix and return its common prefixes. Blocks."""
+        prefixes = []
+        for page in self._pages(prefix, self.delimiter):
+            self._consume(page)
+            prefixes.extend(entry["Prefix"] for entry in page.get("CommonPrefixes") or [])
+            if self.done:
+                break
+        return prefixes
+
+    def group(self, frontier: List[str]) -> List[List[str]]:
+        """Split the sorted prefixes into at most `shards` contiguous groups of similar size."""
+        frontier = sorted(frontier)
+        count = min(len(frontier), max(self.shards, 1))
+        return [frontier[len(frontier) * i // count:len(frontier) * (i + 1) // count] for i in range(count)]
+
+    def list_shard(self, prefixes: List[str]) -> None:
+        """List every object under a group of sorted prefixes. Blocks."""
+        if len(prefixes) == 1:
+            for page in self._pages(prefixes[0]):
+                self._consume(page)
+                if self.done:
+                    break
+        else:
+            self._list_range(prefixes)
+        with self._lock:
+            self.listed_shards += 1
+
+    def _list_range(self, prefixes: List[str]) -> None:
+        # Keys ascend, so a pointer into the prefixes decides whether a key belongs to the group
+        parameters = dict(self.parameters, Prefix=os.path.commonprefix(prefixes))
+        if len(prefixes[0]) > len(parameters["Prefix"]):
+            parameters["StartAfter"] = prefixes[0][:-1]
+        pages = self.client.get_paginator("list_objects_v2").paginate(**parameters)
+        ends = [prefix[:-1] + chr(ord(prefix[-1]) + 1) for prefix in prefixes]
+        index = 0
+        for page in pages:
+            contents = []
+            for item in page.get("Contents") or []:
+                key = item["Key"]
+                while index < len(prefixes) and key >= ends[index]:
+                    index += 1
+                if index == len(prefixes):
+                    break
+                if key.startswith(prefixes[index]):
+                    contents.append(item)
+            self._consume({"Contents": contents})
+            if self.done or index == len(prefixes):
+                break
+
+    def expand(self, frontier: List[str]) -> bool:
+        """Check whether the prefixes of the current level should be expanded by another level."""
+        return bool(frontier) and not self.done and self.depth < self.max_depth and len(frontier) < self.shards
+
+    def advance(self, frontier: List[str], levels: List[List[str]]) -> List[str]:
+        """Return the prefixes of the next level from the common prefixes of each listed level."""
+        expanded = [prefix for level in levels for prefix in level]
+        if len(expanded) > len(frontier):
+            self.depth += 1
+        return expanded
+
+    def run(self) -> Dict[str, Any]:
+        """List the bucket on a thread pool of `concurrency` threads and return the result."""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="use-aws-s3-list") as pool:
+            frontier = [self.prefix]
+            while self.expand(frontier):
+                frontier = self.advance(frontier, list(pool.map(self.list_level, frontier)))
+            list(pool.map(self.list_shard, self.group(frontier)))
+        return self.result(time.perf_counter() - start)
+
+    def result(self, elapsed: float) -> Dict[str, Any]:
+        """Return the consumer's result with the listing statistics."""
+        result = self.consumer.result()
+        result["listing"] = {
+            "shards": self.listed_shards,
+            "requests": self.requests,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "keys_per_second": round(self.consumer.records / elapsed) if elapsed else None,
+        }
+        if self.done and self.max_items:
+            result["truncated"] = True
+        return result
@@ -1,87 +1,49 @@
 import json
 import os
+import time
 import boto3
 import use_aws as aws_utils
-
+import aws_dynamodb
+from aws_aggregate import Aggregator
+from aws_cache import response_cache
+from aws_log_patterns import LogPatternMiner
+from aws_s3_listing import S3ShardedListing
+from aws_watch import StateWatch
+
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Any, Dict, List, Optional
 from botocore.exceptions import ParamValidationError, ValidationError
-from botocore.response import StreamingBody
-from colorama import Fore, Style
-from rich.panel import Panel
+from jmespath.exceptions import JMESPathError
 
-aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-aws_session_token = os.environ.get('AWS_SESSION_TOKEN')
 aws_region = os.environ.get('AWS_DEFAULT_REGION', 'us-west-2')
 
-MUTATIVE_OPERATIONS = [
-    "create",
-    "put",
-    "delete",
-    "update",
-    "terminate",
-    "revoke",
-    "disable",
-    "deregister",
-    "stop",
-    "add",
-    "modify",
-    "remove",
-    "attach",
-    "detach",
-    "start",
-    "enable",
-    "register",
-    "set",
-    "associate",
-    "disassociate",
-    "allocate",
-    "release",
-    "cancel",
-    "reboot",
-    "accept",
-]
+# Limits of region/account fan-out
+FANOUT_MAX_TARGETS = int(os.environ.get("USE_AWS_FANOUT_MAX_TARGETS", "200"))
+FANOUT_CONCURRENCY = int(os.environ.get("USE_AWS_FANOUT_CONCURRENCY", "16"))
+FANOUT_TIMEOUT = float(os.environ.get("USE_AWS_FANOUT_TIMEOUT", "60"))
 
 def get_boto3_client(
     service_name: str,
     region_name: str,
     profile_name: Optional[str] = None,
+    role_arn: Optional[str] = None,
 ) -> Any:
     """
-    Create an AWS boto3 client for the specified service and region.
+    Get an AWS boto3 client for the specified service and region.
+
+    Clients are pooled in the shared client registry of use_aws.py, so warm invocations
+    reuse the loaded service model and open connections instead of creating a new session.
 
     Args:
         service_name: Name of the AWS service (e.g., 's3', 'ec2', 'dynamodb')
         region_name: AWS region name (e.g., 'us-west-2', 'us-east-1')
         profile_name: Optional AWS profile name from ~/.aws/credentials
+        role_arn: Optional IAM role to assume with the profile's credentials
 
     Returns:
         A boto3 client object for the specified service
     """
-    session = boto3.Session(profile_name=profile_name)
-    return session.client(service_name=service_name, region_name=region_name)
-
-def handle_streaming_body(response: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Process streaming body responses from AWS into regular Python objects.
-
-    Some AWS APIs return StreamingBody objects that need special handling to
-    convert them into regular Python dictionaries or strings for proper JSON serialization.
-
-    Args:
-        response: AWS API response that may contain StreamingBody objects
-
-    Returns:
-        Processed response with StreamingBody objects converted to Python objects
-    """
-    for key, value in response.items():
-        if isinstance(value, StreamingBody):
-            content = value.read()
-            try:
-                response[key] = json.loads(content.decode("utf-8"))
-            except json.JSONDecodeError:
-                response[key] = content.decode("utf-8")
-    return response
+    return aws_utils.get_client(service_name, region_name, profile_name, role_arn)
 
 def get_available_services() -> List[str]:
     """
@@ -90,8 +52,7 @@ def get_available_services() -> List[str]:
     Returns:
         List of service names as strings
     """
-    services = boto3.Session().get_available_services()
-    return list(services)
+    return aws_utils.service_catalog.services()
 
 def get_available_operations(service_name: str) -> List[str]:
     """
@@ -104,22 +65,8 @@ def get_available_operations(service_name: str) -> List[str]:
         List of operation names as strings
     """
 
-    aws_region = os.environ.get("AWS_REGION", "us-west-2")
     try:
-        if aws_access_key and aws_secret_key:
-            client = boto3.client(
-                service_name, 
-                region_name=aws_region, 
-                aws_access_key_id=aws_access_key, 
-                aws_secret_access_key=aws_secret_key, 
-                aws_session_token=aws_session_token
-            )
-        else:
-            client = boto3.client(
-                service_name, 
-                region_name=aws_region
-            )
-        return [op for op in dir(client) if not op.startswith("_")]
+        return list(aws_utils.service_catalog.operations(service_name))
     except Exception as e:
         print(f"Error getting operations for service {service_name}: {str(e)}")
         return []
@@ -142,7 +89,16 @@ def use_aws(
     parameters: Dict[str, Any],
     region: Optional[str] = None,
     label: str = "AWS Operation Details",
-    profile_name: Optional[str] = None
+    profile_name: Optional[str] = None,
+    query: Optional[str] = None,
+    prune: bool = True,
+    use_cache: bool = True,
+    role_arn: Optional[str] = None,
+    aggregate: Optional[Dict[str, Any]] = None,
+    log_patterns: Optional[Dict[str, Any]] = None,
+    sharded_list: Optional[Dict[str, Any]] = None,
+    parallel_scan: Optional[Dict[str, Any]] = None,
+    watch: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Execute AWS service operations using boto3 with comprehensive error handling and validation.
@@ -176,6 +132,31 @@ def use_aws(
         region: AWS region (e.g., 'us-west-2')
         label: Human-readable description of the operation
         profile_name: Optional AWS profile name for credentials
+        query: Optional JMESPath expression applied to the response before it is returned
+        prune: Drop ResponseMetadata and null or empty fields from the response (default: True)
+        use_cache: Serve read-only operations (describe, list, get, ...) from a short-lived
+            cache when the same call was made recently (default: True). The cache lives as
+            long as the warm Lambda execution environment. Secrets and credentials (e.g.
+            secretsmanager get_secret_value) are never cached.
+        role_arn: Optional IAM role to assume with the profile's credentials. Used by use_aws_fanout.
+        aggregate: Return only an aggregate table computed over all pages instead of the
+            records, e.g. {"items": "Reservations[].Instances[]", "group_by": ["InstanceType"],
+            "metrics": ["count"]}. See Aggregator for the keys.
+        log_patterns: For logs filter_log_events and get_log_events, return the log line
+            templates with their counts, first and last timestamps and samples instead of the
+            events, e.g. {} for the defaults. See LogPatternMiner for the keys.
+        sharded_list: For s3 list_objects_v2 of large buckets, list the common prefixes of the
+            bucket as shards in parallel and return the totals (or the aggregate table when
+            aggregate is set), e.g. {} for the defaults. See S3ShardedListing for the keys.
+        parallel_scan: For dynamodb scan of large tables, scan Segment/TotalSegments in
+            parallel within a read capacity budget and return the first items and counts (or
+            the aggregate table when aggregate is set), e.g. {} for the defaults. See
+            aws_dynamodb.DynamoDBParallelScan for the keys.
+        watch: For read-only operations polled repeatedly, return only the resources added
+            and removed and the fields changed since the last watch of the same operation,
+            parameters and query, e.g. {"wait": 30}. See StateWatch for the keys.
+            Snapshots live as long as the warm Lambda execution environment, and the wait
+            must fit in the Lambda timeout.
 
     Returns:
         ToolResult dictionary with:
@@ -185,64 +166,212 @@ def use_aws(
     Notes:
         - Mutative operations (create, delete, etc.) require user confirmation in non-dev environments
         - You can disable confirmation by setting the environment variable BYPASS_TOOL_CONSENT=true
-        - The tool automatically handles special response types like streaming bodies
+        - The tool automatically handles special response types like streaming bodies.
+          For large or binary bodies only a preview is read, with the source to read the rest
+          from (e.g. Bucket, Key, VersionId and the Range of the next bytes for s3 get_object)
         - For validation errors, the tool attempts to generate the correct input schema
         - All datetime objects are automatically converted to strings for proper JSON serialization
+        - Mutative operations invalidate cached responses of the same service and region
     """
     if region is None:
         region = aws_region
 
-    console = aws_utils.create()
-
-    # Create a panel for AWS Operation Details
-    operation_details = f"{Fore.CYAN}Service:{Style.RESET_ALL} {service_name}\n"
-    operation_details += f"{Fore.CYAN}Operation:{Style.RESET_ALL} {operation_name}\n"
-    operation_details += f"{Fore.CYAN}Parameters:{Style.RESET_ALL}\n"
-    for key, value in parameters.items():
-        operation_details += f"  - {key}: {value}\n"
-
-    console.print(Panel(operation_details, title=label, expand=False))
+    aws_utils.print_operation_details(service_name, operation_name, parameters, label)
 
     print(
         "Invoking: service_name = %s, operation_name = %s, parameters = %s" % (service_name, operation_name, parameters)
     )
     
     # Check AWS service
-    available_services = get_available_services()
-    print(f"Available services: {available_services}")
-
-    if service_name not in available_services:
-        print(f"{Fore.RED}Invalid AWS service: {service_name}{Style.RESET_ALL}")
+    if not aws_utils.service_catalog.has_service(service_name):
+        print(f"Invalid AWS service: {service_name}")
+        suggestions = aws_utils.service_catalog.suggest_services(service_name)
+        if suggestions:
+            hint = f"Did you mean: {', '.join(suggestions)}"
+        else:
+            hint = f"Available services: {str(get_available_services())}"
         return {
             "status": "error",
             "content": [
-                {"text": f"Invalid AWS service: {service_name}\nAvailable services: {str(available_services)}"}
+                {"text": f"Invalid AWS service: {service_name}\n{hint}"}
             ],
         }
 
     # Check AWS operation
-    available_operations = get_available_operations(service_name)
-    if operation_name not in available_operations:
-        print(f"{Fore.RED}Invalid AWS operation: {operation_name}{Style.RESET_ALL}")
+    resolved = aws_utils.service_catalog.resolve_operation(service_name, operation_name)
+    if resolved is None:
+        # Methods boto3 adds to clients, such as generate_presigned_url or s3 upload_file
+        client_method = aws_utils.resolve_client_method(service_name, operation_name)
+        if client_method is not None:
+            resolved = (client_method, None)
+    if resolved is None:
+        print(f"Invalid AWS operation: {operation_name}")
+        suggestions = aws_utils.service_catalog.suggest_operations(service_name, operation_name)
+        if suggestions:
+            hint = f"Did you mean: {', '.join(suggestions)}"
+        else:
+            hint = f"Available operations:\n{get_available_operations(service_name)}"
         return {
             "status": "error",
             "content": [
-                {"text": f"Invalid AWS operation: {operation_name}, Available operations:\n{available_operations}\n"}
+                {"text": f"Invalid AWS operation: {operation_name}, {hint}\n"}
             ],
         }
+    operation_name = resolved[0]
+
+    # Check JMESPath query
+    if query:
+        try:
+            aws_utils.compile_query(query)
+        except JMESPathError as e:
+            return {
+                "status": "error",
+                "content": [{"text": f"Invalid query: {query}\n{str(e)}"}],
+            }
+
+    # Check aggregate
+    aggregator = None
+    if aggregate is not None:
+        try:
+            aggregator = Aggregator(aggregate)
+        except (ValueError, JMESPathError) as e:
+            return {
+                "status": "error",
+                "content": [{"text": f"Invalid aggregate: {json.dumps(aggregate, default=str)}\n{str(e)}"}],
+            }
+
+    # Check sharded_list
+    if sharded_list is not None and (service_name, operation_name) != ("s3", "list_objects_v2"):
+        return {
+            "status": "error",
+            "content": [{"text": "sharded_list applies to s3 list_objects_v2"}],
+        }
+
+    # Check parallel_scan
+    if parallel_scan is not None and (service_name, operation_name) != ("dynamodb", "scan"):
+        return {
+            "status": "error",
+            "content": [{"text": "parallel_scan applies to dynamodb scan"}],
+        }
+
+    # Check watch
+    if watch is not None:
+        if not aws_utils.is_read_only_operation(operation_name):
+            return {
+                "status": "error",
+                "content": [{"text": "watch applies to read-only operations (describe, list, get, ...)"}],
+            }
+        if any(spec is not None for spec in (aggregate, log_patterns, sharded_list, parallel_scan)):
+            return {
+                "status": "error",
+                "content": [{"text": "watch cannot be combined with aggregate, log_patterns, sharded_list or parallel_scan"}],
+            }
+
+    # Check log_patterns, mined over all pages like an aggregate
+    if log_patterns is not None:
+        if not LogPatternMiner.supports(service_name, operation_name):
+            return {
+                "status": "error",
+                "content": [{"text": "log_patterns applies to logs filter_log_events and get_log_events"}],
+            }
+        try:
+            aggregator = LogPatternMiner(log_patterns)
+        except (ValueError, TypeError) as e:
+            return {
+                "status": "error",
+                "content": [{"text": f"Invalid log_patterns: {json.dumps(log_patterns, default=str)}\n{str(e)}"}],
+            }
 
     # Set up the boto3 client
-    client = get_boto3_client(service_name, region, profile_name)
+    client = get_boto3_client(service_name, region, profile_name, role_arn)
     operation_method = getattr(client, operation_name)
 
+    cache_key = None
+    if use_cache and aws_utils.is_cacheable_operation(service_name, operation_name):
+        identity = aws_utils.client_registry.get_identity(profile_name, role_arn)
+        # Without the caller identity a key could be shared with another account, so the cache is skipped
+        if identity is not None:
+            cache_key = response_cache.make_key(service_name, operation_name, parameters, region, identity)
+
     try:
-        response = operation_method(**parameters)
-        response = handle_streaming_body(response)
-        response = aws_utils.convert_datetime_to_str(response)
+        # Required parameters are checked against the catalog before the call
+        missing = [
+            name for name in aws_utils.service_catalog.required_parameters(service_name, operation_name)
+            if name not in parameters
+        ]
+        if missing:
+            raise ParamValidationError(report=f"Missing required parameters: {', '.join(missing)}")
+
+        if sharded_list is not None:
+            try:
+                listing = S3ShardedListing(client, parameters, sharded_list, aggregator)
+            except (ValueError, TypeError) as e:
+                return {"status": "error", "content": [{"text": f"Invalid sharded_list: {str(e)}"}]}
+            result = listing.run()
+            print(f"Sharded listing: {result['records']} objects, {result['listing']}")
+            return {
+                "status": "success",
+                "content": [{"text": aws_utils.encode_json(result)}],
+            }
+
+        if parallel_scan is not None:
+            try:
+                scan = aws_dynamodb.DynamoDBParallelScan(client, parameters, parallel_scan, aggregator)
+            except (ValueError, TypeError) as e:
+                return {"status": "error", "content": [{"text": f"Invalid parallel_scan: {str(e)}"}]}
+            result = scan.run()
+            print(f"Parallel scan: {scan.count} items, {result['scan']}")
+            _, text, _ = aws_utils.encode_response(result, None if aggregator else query, prune, structured=False)
+            return {
+                "status": "success",
+                "content": [{"text": text}],
+            }
+
+        if watch is not None:
+            identity = aws_utils.client_registry.get_identity(profile_name, role_arn)
+            if identity is None:
+                # Snapshots are kept per account, so they cannot be keyed without the caller identity
+                return {"status": "error", "content": [{"text": "watch needs the caller identity, and sts get_caller_identity failed"}]}
+            key = response_cache.make_key(service_name, operation_name, parameters, region, identity)
+            try:
+                state_watch = StateWatch(key + (query, prune), watch)
+            except (ValueError, TypeError) as e:
+                return {"status": "error", "content": [{"text": f"Invalid watch: {str(e)}"}]}
+            result = watch_operation(operation_method, parameters, query, prune, state_watch)
+            print(f"Watch of {service_name}.{operation_name}: {result['watch']}")
+            return {
+                "status": "success",
+                "content": [{"text": aws_utils.encode_json(result)}],
+            }
+
+        if aggregator is not None:
+            try:
+                result = aggregate_pages(client, operation_name, parameters, aggregator)
+            except ValueError as e:
+                return {"status": "error", "content": [{"text": f"Invalid aggregate: {str(e)}"}]}
+            print(f"Aggregated {result['records']} records of {result['pages']} pages into {result['groups']} groups")
+            return {
+                "status": "success",
+                "content": [{"text": aws_utils.encode_json(result)}],
+            }
+
+        response = response_cache.get(cache_key) if cache_key else None
+        cached = response is not None
+        if not cached:
+            if (service_name, operation_name) == ("dynamodb", "batch_get_item"):
+                # Chunks of 100 keys, retrying UnprocessedKeys
+                response = aws_dynamodb.batch_get_items(client, **parameters)
+            else:
+                response = operation_method(**parameters)
+            response = aws_utils.handle_streaming_body(response, parameters)
+        _, text, sizes = aws_utils.encode_response(response, query, prune, structured=False)
+        if cache_key and not cached:
+            response_cache.put(cache_key, response, sizes["bytes_before"])
+        print(f"Response size: {sizes['bytes_before']} -> {sizes['bytes_after']} bytes (cached: {cached})")
 
         return {
             "status": "success",
-            "content": [{"text": f"Success: {str(response)}"}],
+            "content": [{"text": text}],
         }
     except (ValidationError, ParamValidationError) as val_ex:
         # Handle validation errors with schema
@@ -270,6 +399,154 @@ def use_aws(
             "status": "error",
             "content": [{"text": f"AWS call threw exception: {str(ex)}"}],
         }
+    finally:
+        if aws_utils.is_mutative_operation(operation_name):
+            response_cache.invalidate(service_name, region)
+
+def aggregate_pages(client: Any, operation_name: str, parameters: Dict[str, Any], aggregator: Any) -> Dict[str, Any]:
+    """
+    Stream the pages of an operation through an aggregator. Each page is dropped once it is
+    folded in, so memory grows with the number of groups. Operations that cannot be
+    paginated are called once.
+
+    Returns:
+        The aggregate table
+    """
+    if not client.can_paginate(operation_name):
+        aggregator.add_page(getattr(client, operation_name)(**parameters))
+        return aggregator.result()
+
+    page_iterator = client.get_paginator(operation_name).paginate(**parameters)
+    for page in page_iterator:
+        aggregator.add_page(page, page_iterator.result_keys)
+    return aggregator.result()
+
+def watch_operation(
+    operation_method: Any, parameters: Dict[str, Any], query: Optional[str], prune: bool, state_watch: Any
+) -> Dict[str, Any]:
+    """
+    Poll an operation until the watched state changes or the wait of the watch expires, and
+    return the full state on the first call, then the changes. Polls bypass the response cache.
+    """
+    start = time.monotonic()
+    polls = 0
+    while True:
+        response = aws_utils.handle_streaming_body(operation_method(**parameters), parameters)
+        state, _, _ = aws_utils.encode_response(response, query, prune)
+        polls += 1
+        observed = state_watch.observe(json.loads(aws_utils.encode_json(state)))
+        if observed is not None or time.monotonic() - start + state_watch.interval > state_watch.wait:
+            break
+        time.sleep(state_watch.interval)
+
+    observed = observed or state_watch.unchanged()
+    observed["watch"].update(polls=polls, waited_ms=round((time.monotonic() - start) * 1000, 1))
+    return observed
+
+def use_aws_fanout(
+    service_name: str,
+    operation_name: str,
+    parameters: Dict[str, Any],
+    regions: List[str],
+    accounts: Optional[List[str]] = None,
+    label: str = "AWS Operation Details",
+    profile_name: Optional[str] = None,
+    query: Optional[str] = None,
+    prune: bool = True,
+    use_cache: bool = True,
+    aggregate: Optional[Dict[str, Any]] = None,
+    log_patterns: Optional[Dict[str, Any]] = None,
+    sharded_list: Optional[Dict[str, Any]] = None,
+    parallel_scan: Optional[Dict[str, Any]] = None,
+    watch: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Run use_aws in every combination of regions and accounts in parallel and merge the results.
+
+    Args:
+        regions: Regions to call, "*" means every region of the service in the botocore endpoint data
+        accounts: Optional account ids, whose USE_AWS_ASSUME_ROLE_NAME role is assumed, or role ARNs
+        Other arguments as for use_aws
+
+    Returns:
+        ToolResult dictionary. When every result is a list, the first content block is the
+        merged list whose entries carry _region and _account. Failed or timed out targets
+        follow as their own blocks, then a summary.
+    """
+    # Invalid names fail the same way everywhere, so report them once
+    if (not aws_utils.service_catalog.has_service(service_name)
+            or (aws_utils.service_catalog.resolve_operation(service_name, operation_name) is None
+                and aws_utils.resolve_client_method(service_name, operation_name) is None)):
+        return use_aws(service_name, operation_name, parameters, aws_region, label, profile_name)
+
+    try:
+        role_arns = [aws_utils.resolve_role_arn(account) for account in accounts] if accounts else [None]
+    except ValueError:
+        return {"status": "error", "content": [{"text": f"Invalid accounts: {accounts}"}]}
+    regions = aws_utils.expand_regions(service_name, regions)
+    targets = [(role_arn, region) for role_arn in role_arns for region in regions]
+    if len(targets) > FANOUT_MAX_TARGETS:
+        return {
+            "status": "error",
+            "content": [{"text": f"Too many targets: {len(targets)} accounts x regions, the limit is {FANOUT_MAX_TARGETS}"}],
+        }
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=min(FANOUT_CONCURRENCY, len(targets)))
+    futures = [
+        executor.submit(
+            use_aws, service_name, operation_name, parameters, region, label, profile_name,
+            query, prune, use_cache, role_arn, aggregate, log_patterns, sharded_list, parallel_scan, watch
+        )
+        for role_arn, region in targets
+    ]
+    _, pending = wait(futures, timeout=FANOUT_TIMEOUT)
+    executor.shutdown(wait=False, cancel_futures=True)
+    elapsed = time.perf_counter() - start
+
+    items = []
+    for (role_arn, region), future in zip(targets, futures):
+        if future in pending:
+            result = {"status": "timeout", "content": [{"text": f"Not finished within {FANOUT_TIMEOUT} seconds"}]}
+        else:
+            result = future.result()
+        items.append({
+            "account": aws_utils.account_of(role_arn),
+            "region": region,
+            "status": result["status"],
+            "text": "\n".join(block["text"] for block in result["content"]),
+        })
+
+    summary = {
+        "total": len(items),
+        "success": sum(1 for item in items if item["status"] == "success"),
+        "error": sum(1 for item in items if item["status"] == "error"),
+        "timeout": sum(1 for item in items if item["status"] == "timeout"),
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+    print(f"Fan-out summary: {summary}")
+
+    # Merge list results into one list tagged with the region and account of each entry
+    results = [(item, json.loads(item["text"])) for item in items if item["status"] == "success"]
+    merged = None
+    if results and all(isinstance(result, list) for _, result in results):
+        merged = [
+            {**entry, "_region": item["region"], "_account": item["account"]} if isinstance(entry, dict) else entry
+            for item, result in results
+            for entry in result
+        ]
+        summary["merged"] = len(merged)
+
+    content = []
+    if merged is not None:
+        content.append({"text": aws_utils.encode_json(merged)})
+    for item in items:
+        if merged is None or item["status"] != "success":
+            target = f"{item['account']}/{item['region']}" if item["account"] else item["region"]
+            content.append({"text": f"[{target}] {item['status']}\n{item['text']}"})
+    content.append({"text": f"Fan-out summary: {json.dumps(summary)}"})
+
+    return {"status": "success", "content": content}
 
 def lambda_handler(event, context):
     print(f"event: {event}")
@@ -302,8 +579,34 @@ def lambda_handler(event, context):
     profile_name = event.get('profile_name')
     print(f"profile_name: {profile_name}")
 
+    query = event.get('query')
+    print(f"query: {query}")
+
+    prune = event.get('prune', True)
+    use_cache = event.get('use_cache', True)
+    aggregate = event.get('aggregate')
+    log_patterns = event.get('log_patterns')
+    sharded_list = event.get('sharded_list')
+    parallel_scan = event.get('parallel_scan')
+    watch = event.get('watch')
+
+    regions = event.get('regions')
+    accounts = event.get('accounts')
+    print(f"regions: {regions}, accounts: {accounts}")
+
     if toolName == 'use_aws':
-        body = use_aws(service_name, operation_name, parameters, region, label, profile_name)
+        if regions or accounts:
+            body = use_aws_fanout(
+                service_name, operation_name, parameters, regions or [region or aws_region], accounts,
+                label, profile_name, query, prune, use_cache, aggregate, log_patterns, sharded_list, parallel_scan,
+                watch
+            )
+        else:
+            body = use_aws(
+                service_name, operation_name, parameters, region, label, profile_name, query, prune, use_cache,
+                aggregate=aggregate, log_patterns=log_patterns, sharded_list=sharded_list,
+                parallel_scan=parallel_scan, watch=watch
+            )
         print(f"body: {body}")
         return {
             'statusCode': 200, 
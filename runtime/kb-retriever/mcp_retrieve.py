@@ -4,6 +4,12 @@ import sys
 import os
 import json
 
+from botocore.config import Config
+from retrieve_cache import retrieval_cache
+from retrieve_executor import RETRIEVE_CONCURRENCY
+from retrieve_federation import Federation, KnowledgeBase, load_knowledge_bases, merge_results
+from retrieve_postprocess import post_processor
+
 logging.basicConfig(
     level=logging.INFO,  # Default to INFO level
     format='%(filename)s:%(lineno)d | %(message)s',
@@ -26,24 +32,63 @@ config = load_config()
 
 bedrock_region = config['region']
 projectName = config['projectName']
-knowledge_base_id = config['knowledge_base_id']
+knowledge_bases = load_knowledge_bases(config)
 number_of_results = 5
 
-bedrock_agent_runtime_client = boto3.client("bedrock-agent-runtime", region_name=bedrock_region)
+# One pooled connection per concurrent retrieval and knowledge base, so calls never wait for a connection
+connections = RETRIEVE_CONCURRENCY * len(knowledge_bases)
+bedrock_agent_runtime_client = boto3.client(
+    "bedrock-agent-runtime",
+    region_name=bedrock_region,
+    config=Config(max_pool_connections=connections)
+)
+federation = Federation(knowledge_bases, workers=connections)
+
+def retrieve_knowledge_base(knowledge_base: KnowledgeBase, query: str) -> list:
+    """Return the retrievalResults of a query in one knowledge base, from retrieval_cache when the same query was made recently."""
+    def load():
+        response = bedrock_agent_runtime_client.retrieve(
+            retrievalQuery={"text": query},
+            knowledgeBaseId=knowledge_base.knowledge_base_id,
+                retrievalConfiguration={
+                    "vectorSearchConfiguration": {"numberOfResults": number_of_results},
+                },
+            )
+        # logger.info(f"response: {response}")
+        return response.get("retrievalResults", [])
+
+    key = retrieval_cache.make_key(knowledge_base.knowledge_base_id, number_of_results, query)
+    return retrieval_cache.get_or_load(key, load)
+
+def retrieve_results(query: str) -> list:
+    """Return the retrievalResults of a query from all knowledge bases, merged into one ranked list."""
+    return federation.retrieve(query, retrieve_knowledge_base, number_of_results)
+
+def cached_results(query: str):
+    """Return the retrievalResults of a query if they are cached for all knowledge bases, otherwise None."""
+    keys = [
+        retrieval_cache.make_key(knowledge_base.knowledge_base_id, number_of_results, query)
+        for knowledge_base in knowledge_bases
+    ]
+    cached = retrieval_cache.get_all(keys)
+    if cached is None:
+        return None
+    return merge_results(list(zip(knowledge_bases, cached)), number_of_results)
+
+def cached_retrieve(query: str):
+    """Return the formatted result of a query if it is cached, otherwise None."""
+    retrieval_results = cached_results(query)
+    if retrieval_results is None:
+        return None
+    return format_results(post_processor.process(retrieval_results))
 
 def retrieve(query: str) -> str:
-    response = bedrock_agent_runtime_client.retrieve(
-        retrievalQuery={"text": query},
-        knowledgeBaseId=knowledge_base_id,
-            retrievalConfiguration={
-                "vectorSearchConfiguration": {"numberOfResults": number_of_results},
-            },
-        )
-    
-    # logger.info(f"response: {response}")
-    retrieval_results = response.get("retrievalResults", [])
+    retrieval_results = retrieve_results(query)
     # logger.info(f"retrieval_results: {retrieval_results}")
+    logger.info(f"cache: {retrieval_cache.stats()}")
+    return format_results(post_processor.process(retrieval_results))
 
+def format_results(retrieval_results: list) -> str:
     json_docs = []
     for result in retrieval_results:
         text = url = name = None
@@ -66,14 +111,19 @@ def retrieve(query: str) -> str:
                 url = location["webLocation"]["url"] if location["webLocation"]["url"] is not None else ""
                 name = "WEB"
 
-        json_docs.append({
+        json_doc = {
             "contents": text,              
             "reference": {
                 "url": url,                   
                 "title": name,
                 "from": "RAG"
             }
-        })
+        }
+        if "knowledgeBase" in result:  # merged from several knowledge bases
+            json_doc["reference"]["knowledge_base"] = result["knowledgeBase"]
+        if "queries" in result:  # fused by retrieve_many
+            json_doc["queries"] = result["queries"]
+        json_docs.append(json_doc)
     logger.info(f"json_docs: {json_docs}")
 
     return json.dumps(json_docs, ensure_ascii=False)
\ No newline at end of file
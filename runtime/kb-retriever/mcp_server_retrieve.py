@@ -1,8 +1,15 @@
+import asyncio
 import logging
 import sys
 import mcp_retrieve
 
 from mcp.server.fastmcp import FastMCP 
+from retrieve_cache import retrieval_cache
+from retrieve_executor import BusyError, retrieve_executor
+from retrieve_fusion import MANY_MAX_QUERIES, MANY_MAX_RESULTS, apply_budget, reciprocal_rank_fusion, unique_queries
+from retrieve_postprocess import post_processor
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 
 logging.basicConfig(
     level=logging.INFO,  # Default to INFO level
@@ -33,7 +40,7 @@ except Exception as e:
 # RAG
 ######################################
 @mcp.tool()
-def retrieve(keyword: str) -> str:
+async def retrieve(keyword: str) -> str:
     """
     Query the keyword using RAG based on the knowledge base.
     keyword: the keyword to query
@@ -42,14 +49,85 @@ def retrieve(keyword: str) -> str:
     logger.info(f"search --> keyword: {keyword}")
 
     try:
-        result = mcp_retrieve.retrieve(keyword)
+        # Cache hits skip the bounded pool; their post-processing is CPU work, so it runs in a thread
+        result = await asyncio.to_thread(mcp_retrieve.cached_retrieve, keyword)
+        if result is None:
+            # Runs in a bounded worker pool, so concurrent identical keywords share one upstream call
+            result = await retrieve_executor.run(mcp_retrieve.retrieve, keyword)
         logger.info(f"result: {result}")
         
         return result
+    except BusyError as e:
+        logger.warning(f"{e} metrics: {retrieve_executor.metrics()}")
+        return str(e)
     except Exception as e:
         logger.error(f"Error in retrieve function: {e}")
         return f"Error retrieving data: {str(e)}"
 
+@mcp.tool()
+async def retrieve_many(keywords: list[str], max_results: int = MANY_MAX_RESULTS) -> str:
+    """
+    Query several keywords at once using RAG based on the knowledge base, for example
+    rephrasings or sub-questions of one question. Prefer this over calling retrieve repeatedly.
+    keywords: the keywords to query (up to 8)
+    max_results: the maximum number of documents to return
+    return: one list of documents ranked across all keywords, with the keywords each matched
+    """
+    logger.info(f"search --> keywords: {keywords}")
+
+    keywords = unique_queries(keywords)
+    if not keywords:
+        return "Error retrieving data: no keywords"
+    if len(keywords) > MANY_MAX_QUERIES:
+        return f"Error retrieving data: at most {MANY_MAX_QUERIES} keywords are allowed, got {len(keywords)}"
+
+    async def retrieve_one(keyword: str) -> list:
+        results = mcp_retrieve.cached_results(keyword)
+        if results is None:
+            results = await retrieve_executor.run(mcp_retrieve.retrieve_results, keyword)
+        return results
+
+    outcomes = await asyncio.gather(*[retrieve_one(keyword) for keyword in keywords], return_exceptions=True)
+
+    ranked_lists = []
+    for keyword, outcome in zip(keywords, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.warning(f"retrieve failed for {keyword}: {outcome}")
+            ranked_lists.append([])
+        else:
+            ranked_lists.append(outcome)
+    failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    if len(failures) == len(keywords):
+        if isinstance(failures[0], BusyError):
+            return str(failures[0])
+        return f"Error retrieving data: {str(failures[0])}"
+
+    def fuse() -> list:
+        # Scores are comparable only within the results of one keyword, so each list is
+        # thresholded on its own score before the lists are fused by rank
+        fused = reciprocal_rank_fusion([post_processor.threshold(results) for results in ranked_lists])
+        return post_processor.process(fused, threshold=False)
+
+    # MinHash deduplication is CPU work, kept off the event loop
+    fused = await asyncio.to_thread(fuse)
+    selected = apply_budget(fused, max_results=max(1, min(max_results, MANY_MAX_RESULTS)))
+    for result in selected:
+        result["queries"] = [keywords[index] for index in result["queries"]]
+    logger.info(f"retrieve_many: {sum(len(results) for results in ranked_lists)} results, "
+                f"{len(fused)} after fusion and post-processing, {len(selected)} returned, {len(failures)} keywords failed")
+
+    return mcp_retrieve.format_results(selected)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> JSONResponse:
+    """Expose the retrieval cache, retrieve pool, knowledge base and post-processing metrics."""
+    return JSONResponse({
+        "cache": retrieval_cache.stats(),
+        "executor": retrieve_executor.metrics(),
+        "knowledge_bases": mcp_retrieve.federation.stats(),
+        "post_processing": post_processor.stats()
+    })
+
 if __name__ =="__main__":
     print(f"###### main ######")
     mcp.run(transport="streamable-http")
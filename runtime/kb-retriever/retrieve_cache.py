@@ -0,0 +1,165 @@
+"""
+retrieve_cache.py caches knowledge base retrieval results.
+
+Agents repeat the same keyword within a turn and across users, and every retrieve call costs
+an embedding and a vector search. Results are kept in an in-process LRU cache with a TTL,
+keyed by the knowledge base id, the number of results and the normalized query, so that
+"Amazon  S3" and "amazon s3", or a Hangul query typed as composed syllables and as
+decomposed jamo, share an entry. Identical queries that arrive while the first one is still
+in flight wait for its result instead of calling the knowledge base again (single flight).
+
+Settings (environment variables):
+    KB_CACHE_MAX_ENTRIES: cached queries (default: 1024, 0 disables the cache)
+    KB_CACHE_TTL: seconds a result is served from the cache (default: 300)
+"""
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CACHE_MAX_ENTRIES = int(os.environ.get("KB_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL = float(os.environ.get("KB_CACHE_TTL", "300"))
+
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for the cache key.
+
+    NFKC composes Hangul jamo into syllables and folds compatibility forms such as
+    full-width letters, casefold ignores case, and whitespace runs become one space.
+    """
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query).casefold()).strip()
+
+class RetrievalCache:
+    """
+    LRU + TTL cache of retrieval results with single-flight loading.
+
+    get_or_load returns the cached result of a key, or calls the loader once for all the
+    callers that ask for the same key at the same time. Failures are not cached and are
+    raised to every waiting caller.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires, upstream latency in seconds, result)
+        self._entries: "OrderedDict[Tuple, Tuple[float, float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(knowledge_base_id: str, number_of_results: int, query: str) -> Tuple:
+        """Build the cache key of a retrieval."""
+        return (knowledge_base_id, number_of_results, normalize_query(query))
+
+    def get_all(self, keys: List[Tuple]) -> Optional[List[Any]]:
+        """
+        Return the cached results of several keys, or None unless all of them are cached.
+        Hits are counted only when every key is cached, since otherwise the caller loads
+        them again through get_or_load; a miss is not counted and nothing is loaded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            entries = [self._entries.get(key) for key in keys]
+            if any(entry is None or entry[0] <= now for entry in entries):
+                return None
+            for key, entry in zip(keys, entries):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+            return [entry[2] for entry in entries]
+
+    def get_or_load(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        """
+        Return the result of a key from the cache, from the call in flight for the same key,
+        or from the loader.
+
+        Args:
+            key: Cache key, see make_key
+            loader: Function that retrieves the result from the knowledge base
+
+        Returns:
+            The result of the loader
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, latency, result = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += latency
+                    return result
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            result, latency = future.result()
+            with self._lock:
+                self.saved_seconds += latency
+            return result
+
+        start = time.perf_counter()
+        try:
+            result = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        latency = time.perf_counter() - start
+
+        with self._lock:
+            del self._inflight[key]
+            self.upstream_calls += 1
+            self.upstream_seconds += latency
+            if self.max_entries > 0 and self.ttl > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, latency, result)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        future.set_result((result, latency))
+        return result
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit ratio, coalesced calls and the upstream latency saved."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "upstream_calls": self.upstream_calls,
+                "upstream_avg_ms": round(self.upstream_seconds * 1000 / self.upstream_calls, 1) if self.upstream_calls else 0.0,
+                "latency_saved_ms": round(self.saved_seconds * 1000, 1),
+            }
+
+retrieval_cache = RetrievalCache()
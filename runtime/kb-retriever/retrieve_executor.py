@@ -0,0 +1,143 @@
+"""
+retrieve_executor.py runs blocking knowledge base retrievals on a bounded thread pool.
+
+The MCP server is async, so boto3 retrieve calls must not run on the event loop. At most
+KB_RETRIEVE_CONCURRENCY retrievals run at once, which is also the size of the boto3
+connection pool, so a running retrieval never waits for a connection. Further calls wait
+for a slot, and once KB_RETRIEVE_QUEUE calls are waiting, or a call has waited longer than
+KB_RETRIEVE_QUEUE_TIMEOUT seconds, new calls fail fast with BusyError instead of piling up
+until the client times out.
+
+Settings (environment variables):
+    KB_RETRIEVE_CONCURRENCY: retrievals running at once (default: 16)
+    KB_RETRIEVE_QUEUE: retrievals waiting for a slot before new ones are rejected (default: 64)
+    KB_RETRIEVE_QUEUE_TIMEOUT: seconds a retrieval waits for a slot (default: 10)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+RETRIEVE_CONCURRENCY = int(os.environ.get("KB_RETRIEVE_CONCURRENCY", "16"))
+RETRIEVE_QUEUE = int(os.environ.get("KB_RETRIEVE_QUEUE", "64"))
+RETRIEVE_QUEUE_TIMEOUT = float(os.environ.get("KB_RETRIEVE_QUEUE_TIMEOUT", "10"))
+
+class BusyError(Exception):
+    """Raised when the retriever is at capacity and a call is rejected."""
+
+class RetrieveExecutor:
+    """
+    Bounded executor for blocking retrievals with admission control.
+
+    Metrics:
+        running: retrievals executing in a worker thread
+        queued: retrievals waiting for a slot
+        completed: retrievals finished since start
+        rejected: retrievals rejected as busy
+        wait time: time from submission until a slot is acquired
+    """
+
+    def __init__(self, concurrency: int = RETRIEVE_CONCURRENCY, max_queue: int = RETRIEVE_QUEUE,
+                 queue_timeout: float = RETRIEVE_QUEUE_TIMEOUT):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="kb-retrieve")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _busy(self, reason: str) -> BusyError:
+        with self._lock:
+            self._rejected += 1
+            running, queued = self._running, self._queued
+        return BusyError(
+            f"Busy: the knowledge base retriever is at capacity ({reason}; {running} running, "
+            f"{queued} queued). Retry in a few seconds."
+        )
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking function in the thread pool without blocking the event loop.
+
+        Args:
+            func: Blocking function to run
+            *args: Arguments for the function
+
+        Returns:
+            The return value of the function
+
+        Raises:
+            BusyError: when the queue is full or no slot frees up within the queue timeout
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        submitted = time.perf_counter()
+        with self._lock:
+            full = self._semaphore.locked() and self._queued >= self.max_queue
+            if not full:
+                self._queued += 1
+        if full:
+            raise self._busy(f"{self.max_queue} retrievals waiting")
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._queued -= 1
+            raise self._busy(f"no slot within {self.queue_timeout:g} seconds")
+
+        wait = time.perf_counter() - submitted
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore
+
+        def done(_: Optional[Future]) -> None:
+            # The slot is released when the retrieval is done, not when the caller stops
+            # waiting: a cancelled caller leaves a started call running, and it keeps its slot
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # the loop is closed, and its semaphore with it
+
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            done(None)
+            raise
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return concurrency, queue depth, rejections and wait time metrics."""
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "concurrency": self.concurrency,
+                "running": self._running,
+                "queued": self._queued,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 3) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+retrieve_executor = RetrieveExecutor()
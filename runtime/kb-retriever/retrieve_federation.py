@@ -0,0 +1,207 @@
+"""
+retrieve_federation.py queries several knowledge bases in parallel and merges their results.
+
+config.json may list the knowledge bases to query instead of a single knowledge_base_id:
+
+    "knowledge_bases": [
+        {"knowledge_base_id": "ABCDEFGHIJ", "name": "manuals", "weight": 1.0, "timeout": 5},
+        {"knowledge_base_id": "KLMNOPQRST", "name": "faq", "weight": 0.5, "score_range": [0.3, 0.9]}
+    ]
+
+Every knowledge base is queried at the same time. A knowledge base that has not answered
+within its timeout (seconds since the query started) is dropped from that query's results
+instead of stalling the whole call, and so is one that fails, as long as another one answers.
+Raw scores are not comparable across knowledge bases with different embedding models or
+chunking, so the scores of each knowledge base are mapped from its fixed score_range (default
+[0, 1], the range of Bedrock relevance scores) to [0, 1] and multiplied by its weight before
+the lists are merged. The range is fixed rather than taken from each result list, so a weak
+top hit stays weak and the score threshold of retrieve_postprocess keeps its meaning.
+
+Settings (environment variables):
+    KB_FEDERATION_TIMEOUT: default timeout of a knowledge base in seconds (default: 5)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from retrieve_fusion import chunk_key
+
+FEDERATION_TIMEOUT = float(os.environ.get("KB_FEDERATION_TIMEOUT", "5"))
+
+logger = logging.getLogger("retrieve")
+
+class KnowledgeBase:
+    """A knowledge base to query, with its weight in the merged ranking and its timeout."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        if not isinstance(spec, dict):
+            raise ValueError(f"knowledge base must be an object, got {spec!r}")
+        unknown = set(spec) - {"knowledge_base_id", "name", "weight", "timeout", "score_range"}
+        if unknown:
+            raise ValueError(f"unknown knowledge base keys: {', '.join(sorted(unknown))}")
+
+        self.knowledge_base_id = spec.get("knowledge_base_id")
+        if not isinstance(self.knowledge_base_id, str) or not self.knowledge_base_id:
+            raise ValueError("knowledge_base_id must be a non-empty string")
+        self.name = spec.get("name", self.knowledge_base_id)
+
+        self.weight = spec.get("weight", 1.0)
+        if isinstance(self.weight, bool) or not isinstance(self.weight, (int, float)) or self.weight <= 0:
+            raise ValueError(f"weight of {self.name} must be a positive number")
+        self.timeout = spec.get("timeout", FEDERATION_TIMEOUT)
+        if isinstance(self.timeout, bool) or not isinstance(self.timeout, (int, float)) or self.timeout <= 0:
+            raise ValueError(f"timeout of {self.name} must be a positive number of seconds")
+        self.score_range = spec.get("score_range", [0.0, 1.0])
+        if (not isinstance(self.score_range, list) or len(self.score_range) != 2
+                or any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in self.score_range)
+                or self.score_range[0] >= self.score_range[1]):
+            raise ValueError(f"score_range of {self.name} must be [low, high] with low < high")
+
+def load_knowledge_bases(config: Dict[str, Any]) -> List[KnowledgeBase]:
+    """
+    Read the knowledge bases from config.json.
+
+    Args:
+        config: Configuration with "knowledge_bases", or a single "knowledge_base_id"
+
+    Returns:
+        The knowledge bases to query
+
+    Raises:
+        ValueError: when the configuration is invalid
+    """
+    specs = config.get("knowledge_bases")
+    if specs is None:
+        specs = [{"knowledge_base_id": config.get("knowledge_base_id")}]
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("knowledge_bases must be a non-empty list")
+
+    knowledge_bases = [KnowledgeBase(spec) for spec in specs]
+    for attribute in ("knowledge_base_id", "name"):
+        values = [getattr(knowledge_base, attribute) for knowledge_base in knowledge_bases]
+        duplicates = sorted({value for value in values if values.count(value) > 1})
+        if duplicates:
+            raise ValueError(f"duplicate knowledge base {attribute}: {', '.join(duplicates)}")
+    return knowledge_bases
+
+def normalize_scores(results: List[Dict[str, Any]], score_range: List[float]) -> List[float]:
+    """Map the scores of a result list from a fixed [low, high] range to [0, 1], clamping scores outside it."""
+    low, high = score_range
+    return [min(max(((result.get("score") or 0.0) - low) / (high - low), 0.0), 1.0) for result in results]
+
+def merge_results(answers: List[Tuple[KnowledgeBase, List[Dict[str, Any]]]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Merge the results of several knowledge bases into one ranked list.
+
+    Results of a single knowledge base are returned as they are. Otherwise every result is
+    copied with "knowledgeBase" and "federatedScore" (normalized score times weight) added,
+    a chunk returned by several knowledge bases is kept once with its best score, and the
+    best results are returned first.
+
+    Args:
+        answers: Each knowledge base that answered, with its results
+        limit: Maximum number of results
+
+    Returns:
+        The merged results, best first
+    """
+    if len(answers) == 1:
+        return answers[0][1][:limit]
+
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for knowledge_base, results in answers:
+        for result, normalized in zip(results, normalize_scores(results, knowledge_base.score_range)):
+            score = normalized * knowledge_base.weight
+            key = chunk_key(result)
+            if key not in merged or score > merged[key]["federatedScore"]:
+                merged[key] = dict(result, knowledgeBase=knowledge_base.name, federatedScore=score)
+
+    # Ties, e.g. the top result of equally weighted knowledge bases, go to the higher raw score
+    ranked = sorted(merged.values(), key=lambda result: (result["federatedScore"], result.get("score") or 0.0), reverse=True)
+    return ranked[:limit]
+
+class Federation:
+    """
+    Queries the knowledge bases in parallel and merges their answers.
+
+    Metrics per knowledge base:
+        answered: queries answered within the timeout
+        timeouts: queries dropped after the timeout
+        errors: queries that failed
+    """
+
+    def __init__(self, knowledge_bases: List[KnowledgeBase], workers: int = 16):
+        self.knowledge_bases = knowledge_bases
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if len(knowledge_bases) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kb-federation")
+        self._lock = threading.Lock()
+        self._counts = {
+            knowledge_base.name: {"answered": 0, "timeouts": 0, "errors": 0}
+            for knowledge_base in knowledge_bases
+        }
+
+    def _count(self, knowledge_base: KnowledgeBase, outcome: str) -> None:
+        with self._lock:
+            self._counts[knowledge_base.name][outcome] += 1
+
+    def retrieve(self, query: str, load: Callable[[KnowledgeBase, str], List[Dict[str, Any]]],
+                 limit: int) -> List[Dict[str, Any]]:
+        """
+        Query every knowledge base and merge the answers that arrive within their timeouts.
+
+        Args:
+            query: Query text
+            load: Function that returns the results of a query from a knowledge base
+            limit: Maximum number of merged results
+
+        Returns:
+            The merged results, best first
+
+        Raises:
+            TimeoutError: when no knowledge base answered within its timeout
+            Exception: the error of the first knowledge base when all of them failed
+        """
+        if self._executor is None:
+            return load(self.knowledge_bases[0], query)[:limit]
+
+        start = time.monotonic()
+        futures = [
+            (knowledge_base, self._executor.submit(load, knowledge_base, query))
+            for knowledge_base in self.knowledge_bases
+        ]
+
+        answers, errors, dropped = [], [], []
+        for knowledge_base, future in sorted(futures, key=lambda item: item[0].timeout):
+            remaining = start + knowledge_base.timeout - time.monotonic()
+            try:
+                # A dropped call keeps running in its thread; its result still fills the cache
+                answers.append((knowledge_base, future.result(timeout=max(remaining, 0))))
+                self._count(knowledge_base, "answered")
+            except TimeoutError:
+                dropped.append(knowledge_base.name)
+                self._count(knowledge_base, "timeouts")
+                logger.warning(f"knowledge base {knowledge_base.name} did not answer within {knowledge_base.timeout:g} seconds")
+            except Exception as e:
+                errors.append(e)
+                self._count(knowledge_base, "errors")
+                logger.warning(f"knowledge base {knowledge_base.name} failed: {e}")
+
+        if not answers:
+            if errors:
+                raise errors[0]
+            raise TimeoutError(f"no knowledge base answered in time ({', '.join(dropped)})")
+
+        # Keep the configured order so that merging is deterministic
+        order = {knowledge_base.name: index for index, knowledge_base in enumerate(self.knowledge_bases)}
+        answers.sort(key=lambda answer: order[answer[0].name])
+        return merge_results(answers, limit)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return answered, timed out and failed queries per knowledge base."""
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
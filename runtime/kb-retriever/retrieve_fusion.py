@@ -0,0 +1,115 @@
+"""
+retrieve_fusion.py merges the results of several retrievals into one ranked list.
+
+retrieve_many runs rephrased keywords in one tool call. Their result lists overlap: the
+same chunk comes back for several keywords, sometimes from the same S3 object indexed twice.
+Chunks are identified by their location (S3 URI or web URL) and a hash of their normalized
+text, and the lists are merged with reciprocal-rank fusion (RRF): a chunk scores
+sum(1 / (k + rank)) over the lists it appears in, so chunks that rank well for several
+keywords come first without comparing raw scores across queries. The merged list is then cut
+to a budget of results and characters.
+
+Settings (environment variables):
+    KB_RRF_K: RRF rank constant (default: 60)
+    KB_MANY_MAX_QUERIES: keywords per retrieve_many call (default: 8)
+    KB_MANY_MAX_RESULTS: results returned by retrieve_many (default: 8)
+    KB_MANY_MAX_CHARS: characters of content returned by retrieve_many (default: 12000)
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from retrieve_cache import normalize_query
+
+RRF_K = int(os.environ.get("KB_RRF_K", "60"))
+MANY_MAX_QUERIES = int(os.environ.get("KB_MANY_MAX_QUERIES", "8"))
+MANY_MAX_RESULTS = int(os.environ.get("KB_MANY_MAX_RESULTS", "8"))
+MANY_MAX_CHARS = int(os.environ.get("KB_MANY_MAX_CHARS", "12000"))
+
+def result_text(result: Dict[str, Any]) -> str:
+    """Return the text content of a retrieval result."""
+    return (result.get("content") or {}).get("text") or ""
+
+def result_location(result: Dict[str, Any]) -> str:
+    """Return the S3 URI or web URL of a retrieval result."""
+    location = result.get("location") or {}
+    if "s3Location" in location:
+        return location["s3Location"].get("uri") or ""
+    if "webLocation" in location:
+        return location["webLocation"].get("url") or ""
+    return ""
+
+def chunk_key(result: Dict[str, Any]) -> Tuple[str, str]:
+    """Identify a chunk by its location and a hash of its normalized text."""
+    digest = hashlib.sha256(normalize_query(result_text(result)).encode("utf-8")).hexdigest()
+    return (result_location(result), digest)
+
+def unique_queries(queries: List[str]) -> List[str]:
+    """Drop empty keywords and keywords that normalize to one already given, keeping the order."""
+    seen = set()
+    unique = []
+    for query in queries:
+        normalized = normalize_query(query or "")
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            unique.append(query)
+    return unique
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists with reciprocal-rank fusion.
+
+    A chunk that appears more than once, within a list or across lists, is kept once: its
+    RRF score sums the best rank it has in each list, and it keeps the highest raw score.
+
+    Args:
+        ranked_lists: Retrieval results of each query, best first
+        k: RRF rank constant; larger values flatten the difference between ranks
+
+    Returns:
+        Copies of the unique results, best first, with "rrfScore" and "queries" (the indexes
+        of the lists a chunk appeared in) added
+    """
+    fused: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for index, results in enumerate(ranked_lists):
+        for rank, result in enumerate(results, start=1):
+            key = chunk_key(result)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(result, rrfScore=0.0, queries=[])
+            elif result.get("score", 0) > entry.get("score", 0):
+                entry["score"] = result["score"]
+            if index not in entry["queries"]:
+                entry["queries"].append(index)
+                entry["rrfScore"] += 1.0 / (k + rank)
+
+    return sorted(fused.values(), key=lambda entry: entry["rrfScore"], reverse=True)
+
+def apply_budget(results: List[Dict[str, Any]], max_results: int = MANY_MAX_RESULTS,
+                 max_chars: Optional[int] = MANY_MAX_CHARS) -> List[Dict[str, Any]]:
+    """
+    Keep the best results that fit in the budget.
+
+    A result whose text does not fit in the characters left is skipped so that a shorter one
+    further down can still be returned; the first result is always kept.
+
+    Args:
+        results: Results, best first
+        max_results: Maximum number of results
+        max_chars: Maximum characters of text in total, None for no limit
+
+    Returns:
+        The results within the budget, best first
+    """
+    selected = []
+    used = 0
+    for result in results:
+        if len(selected) >= max_results:
+            break
+        size = len(result_text(result))
+        if selected and max_chars is not None and used + size > max_chars:
+            continue
+        selected.append(result)
+        used += size
+    return selected
@@ -0,0 +1,247 @@
+"""
+retrieve_postprocess.py makes retrieval results fewer and denser before they reach the model.
+
+A retrieval returns a fixed number of chunks whatever their score, and chunking with overlap
+means that several of them are often near copies, or consecutive overlapping pieces of the
+same document. Results go through three steps:
+
+1. Score threshold: results below KB_MIN_SCORE, or below KB_MIN_RELATIVE_SCORE times the best
+   score, are dropped. The best result is always kept. The score is the federated score when
+   results come from several knowledge bases, since their raw scores are not comparable.
+2. Near-duplicate removal: each text is turned into character shingles and a MinHash
+   signature; a result whose estimated Jaccard similarity with a better result reaches
+   KB_DEDUP_THRESHOLD is dropped. Character shingles work the same for Korean and English.
+3. Overlap merge: chunks of the same S3 object where the end of one is the start of the other
+   (at least KB_MERGE_MIN_OVERLAP characters) are joined into one passage, and a chunk
+   contained in another is dropped.
+
+Token counts before and after are estimated and logged, and the totals are in stats().
+
+Settings (environment variables):
+    KB_MIN_SCORE: absolute score threshold (default: 0, disabled)
+    KB_MIN_RELATIVE_SCORE: threshold as a fraction of the best score (default: 0.5, 0 disables)
+    KB_DEDUP_THRESHOLD: estimated Jaccard similarity of near duplicates (default: 0.8, 0 disables)
+    KB_SHINGLE_SIZE: characters per shingle (default: 5)
+    KB_MINHASH_PERMUTATIONS: hash functions in a MinHash signature (default: 64)
+    KB_MERGE_MIN_OVERLAP: characters two chunks must share to be merged (default: 40, 0 disables)
+"""
+
+import hashlib
+import logging
+import os
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from retrieve_cache import normalize_query
+from retrieve_fusion import result_location, result_text
+
+MIN_SCORE = float(os.environ.get("KB_MIN_SCORE", "0"))
+MIN_RELATIVE_SCORE = float(os.environ.get("KB_MIN_RELATIVE_SCORE", "0.5"))
+DEDUP_THRESHOLD = float(os.environ.get("KB_DEDUP_THRESHOLD", "0.8"))
+SHINGLE_SIZE = int(os.environ.get("KB_SHINGLE_SIZE", "5"))
+MINHASH_PERMUTATIONS = int(os.environ.get("KB_MINHASH_PERMUTATIONS", "64"))
+MERGE_MIN_OVERLAP = int(os.environ.get("KB_MERGE_MIN_OVERLAP", "40"))
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+logger = logging.getLogger("retrieve")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the tokens of a text without a tokenizer: about 4 characters per token for
+    ASCII text and 2 for other scripts such as Hangul.
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+def result_score(result: Dict[str, Any]) -> Optional[float]:
+    """Return the score to threshold a result on: its federated score if it has one, else its raw score."""
+    score = result.get("federatedScore")
+    return result.get("score") if score is None else score
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Return the character shingles of a normalized text."""
+    text = normalize_query(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class MinHasher:
+    """MinHash signatures with universal hashing (a * h + b) mod p over a 64-bit shingle hash."""
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        generator = random.Random(seed)
+        self.permutations = [
+            (generator.randrange(1, MERSENNE_PRIME), generator.randrange(0, MERSENNE_PRIME))
+            for _ in range(permutations)
+        ]
+
+    def signature(self, shingle_set: set) -> Optional[Tuple[int, ...]]:
+        """Return the MinHash signature of a shingle set, or None when it is empty."""
+        if not shingle_set:
+            return None
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in shingle_set
+        ]
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.permutations)
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimate the Jaccard similarity of two signatures."""
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+def find_overlap(first: str, second: str, min_overlap: int) -> int:
+    """Return the length of the longest end of first that is also the start of second, if at least min_overlap."""
+    if min_overlap <= 0 or len(first) < min_overlap or len(second) < min_overlap:
+        return 0
+    anchor = second[:min_overlap]
+    position = first.find(anchor, max(0, len(first) - len(second)))
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(anchor, position + 1)
+    return 0
+
+class PostProcessor:
+    """
+    Threshold, deduplicate and merge retrieval results.
+
+    Metrics:
+        calls: result lists processed
+        results_in, results_out: results before and after
+        tokens_in, tokens_out: estimated tokens of the result texts before and after
+        below_threshold, near_duplicates, merged: results removed by each step
+    """
+
+    def __init__(self, min_score: float = MIN_SCORE, min_relative_score: float = MIN_RELATIVE_SCORE,
+                 dedup_threshold: float = DEDUP_THRESHOLD, min_overlap: int = MERGE_MIN_OVERLAP):
+        self.min_score = min_score
+        self.min_relative_score = min_relative_score
+        self.dedup_threshold = dedup_threshold
+        self.min_overlap = min_overlap
+        self.hasher = MinHasher()
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            ["calls", "results_in", "results_out", "tokens_in", "tokens_out",
+             "below_threshold", "near_duplicates", "merged"], 0)
+
+    def threshold(self, results: List[Dict[str, Any]],
+                  score: Callable[[Dict[str, Any]], Optional[float]] = result_score) -> List[Dict[str, Any]]:
+        """
+        Drop results below the absolute or relative score; the best result is always kept.
+
+        Args:
+            results: Retrieval results whose scores are comparable with each other
+            score: Function that returns the score of a result
+
+        Returns:
+            The results above the threshold, in their order
+        """
+        scores = [score(result) for result in results]
+        if not results or any(value is None for value in scores):
+            return results
+        cutoff = max(self.min_score, self.min_relative_score * max(scores))
+        best = scores.index(max(scores))
+        kept = [result for i, result in enumerate(results) if i == best or scores[i] >= cutoff]
+        with self._lock:
+            self._counts["below_threshold"] += len(results) - len(kept)
+        return kept
+
+    def deduplicate(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop results that are near duplicates of a better ranked result."""
+        if self.dedup_threshold <= 0:
+            return results
+        kept, signatures = [], []
+        for result in results:
+            signature = self.hasher.signature(shingles(result_text(result)))
+            if signature is not None and any(
+                    self.hasher.similarity(signature, other) >= self.dedup_threshold for other in signatures):
+                continue
+            kept.append(result)
+            if signature is not None:
+                signatures.append(signature)
+        return kept
+
+    def merge_overlaps(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Join overlapping chunks of the same S3 object into one passage at the position of the
+        better ranked chunk, and drop chunks contained in a better ranked one of the same object.
+        """
+        if self.min_overlap <= 0:
+            return results
+        merged: List[Dict[str, Any]] = []
+        for result in results:
+            location, text = result_location(result), result_text(result)
+            if location.startswith("s3://") and text:
+                target = None
+                for passage in merged:
+                    if result_location(passage) != location:
+                        continue
+                    current = result_text(passage)
+                    if text in current:
+                        target, joined = passage, current
+                        break
+                    if len(current) >= self.min_overlap and current in text:
+                        target, joined = passage, text
+                        break
+                    overlap = find_overlap(current, text, self.min_overlap)
+                    if overlap:
+                        target, joined = passage, current + text[overlap:]
+                        break
+                    overlap = find_overlap(text, current, self.min_overlap)
+                    if overlap:
+                        target, joined = passage, text + current[overlap:]
+                        break
+                if target is not None:
+                    target["content"] = dict(target.get("content") or {}, text=joined)
+                    target["mergedChunks"] = target.get("mergedChunks", 1) + 1
+                    if "queries" in result:
+                        # The passage now answers the keywords of both chunks
+                        queries = list(target.get("queries") or [])
+                        target["queries"] = queries + [query for query in result["queries"] if query not in queries]
+                    continue
+            # Copy so that merging never changes the cached results
+            merged.append(dict(result))
+        return merged
+
+    def process(self, results: List[Dict[str, Any]], threshold: bool = True) -> List[Dict[str, Any]]:
+        """
+        Threshold, deduplicate and merge results, best first.
+
+        Args:
+            results: Retrieval results, best first
+            threshold: False when the results were already thresholded, e.g. fused results of
+                several queries whose scores are not comparable with each other
+
+        Returns:
+            The remaining results, best first
+        """
+        tokens_in = sum(estimate_tokens(result_text(result)) for result in results)
+        kept = self.threshold(results) if threshold else results
+        below_threshold = len(results) - len(kept)
+        unique = self.deduplicate(kept)
+        near_duplicates = len(kept) - len(unique)
+        passages = self.merge_overlaps(unique)
+        merged = len(unique) - len(passages)
+        tokens_out = sum(estimate_tokens(result_text(result)) for result in passages)
+
+        with self._lock:
+            for name, value in (("calls", 1), ("results_in", len(results)), ("results_out", len(passages)),
+                                ("tokens_in", tokens_in), ("tokens_out", tokens_out),
+                                ("near_duplicates", near_duplicates), ("merged", merged)):
+                self._counts[name] += value
+        logger.info(f"post-processing: {len(results)} results ({tokens_in} tokens) -> {len(passages)} results "
+                    f"({tokens_out} tokens), below threshold: {below_threshold}, near duplicates: {near_duplicates}, "
+                    f"merged: {merged}")
+        return passages
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the results and estimated tokens before and after, and what each step removed."""
+        with self._lock:
+            stats = dict(self._counts)
+        stats["token_reduction"] = round(1 - stats["tokens_out"] / stats["tokens_in"], 4) if stats["tokens_in"] else 0.0
+        return stats
+
+post_processor = PostProcessor()
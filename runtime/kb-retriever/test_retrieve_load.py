@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import os
+import time
+
+parser = argparse.ArgumentParser(description="Load test for the retrieve tool with a stubbed bedrock-agent-runtime")
+parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+parser.add_argument("--requests", type=int, default=8, help="calls per client")
+parser.add_argument("--latency", type=float, default=0.2, help="seconds per stubbed retrieve call")
+parser.add_argument("--concurrency", type=int, default=16, help="KB_RETRIEVE_CONCURRENCY")
+parser.add_argument("--queue", type=int, default=32, help="KB_RETRIEVE_QUEUE")
+parser.add_argument("--queue-timeout", type=float, default=1, help="KB_RETRIEVE_QUEUE_TIMEOUT")
+args = parser.parse_args()
+
+# The settings are read at import, so set them before importing the server
+os.environ["KB_RETRIEVE_CONCURRENCY"] = str(args.concurrency)
+os.environ["KB_RETRIEVE_QUEUE"] = str(args.queue)
+os.environ["KB_RETRIEVE_QUEUE_TIMEOUT"] = str(args.queue_timeout)
+os.environ["KB_CACHE_MAX_ENTRIES"] = "0"  # every call goes to the stub
+
+import mcp_retrieve
+import mcp_server_retrieve
+from retrieve_executor import retrieve_executor
+
+class StubAgentRuntime:
+    """Stands in for the bedrock-agent-runtime client; every retrieve blocks for a fixed latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def retrieve(self, retrievalQuery, knowledgeBaseId, retrievalConfiguration):
+        time.sleep(self.latency)
+        return {
+            "retrievalResults": [{
+                "content": {"text": f"result for {retrievalQuery['text']}"},
+                "location": {"s3Location": {"uri": "s3://stub/docs/stub.pdf"}},
+                "score": 0.5
+            }]
+        }
+
+mcp_retrieve.bedrock_agent_runtime_client = StubAgentRuntime(args.latency)
+
+async def run_client(client: int, requests: int, latencies: list, busy: list):
+    """Call the retrieve tool sequentially with queries that are never cached"""
+    for i in range(requests):
+        start = time.perf_counter()
+        result = await mcp_server_retrieve.retrieve(f"load test {client} {i} {time.perf_counter_ns()}")
+        if result.startswith("Busy:"):
+            busy.append(result)
+        else:
+            latencies.append(time.perf_counter() - start)
+
+async def run_load(clients: int, requests: int):
+    latencies, busy = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[run_client(c, requests, latencies, busy) for c in range(clients)])
+    elapsed = time.perf_counter() - start
+
+    ideal = min(clients, args.concurrency) / args.latency
+    throughput = len(latencies) / elapsed
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000 if latencies else 0.0
+    print(f"clients: {clients:3d}, calls: {len(latencies):4d}, busy: {len(busy):4d}, "
+          f"throughput: {throughput:6.1f} calls/s ({throughput / ideal:4.0%} of ideal {ideal:6.1f}), "
+          f"p50: {p50:7.1f} ms, p95: {p95:7.1f} ms")
+
+async def main():
+    print(f"concurrency: {args.concurrency}, queue: {args.queue}, queue timeout: {args.queue_timeout:g} s, "
+          f"stub latency: {args.latency * 1000:g} ms")
+    for clients in args.clients:
+        await run_load(clients, args.requests)
+    print(f"executor: {retrieve_executor.metrics()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
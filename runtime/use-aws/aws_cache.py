@@ -0,0 +1,141 @@
+"""
+aws_cache.py keeps an in-process TTL cache of read-only responses returned by use_aws.
+
+Only operations accepted by use_aws.is_cacheable_operation are cached, so secrets and
+credentials never are. Keys include the credential identity of the caller.
+
+Settings (environment variables):
+    USE_AWS_CACHE_MAX_BYTES: total size of cached responses (default: 64 MB)
+    USE_AWS_CACHE_TTL: seconds a response is cached (default: 30)
+    USE_AWS_CACHE_TTLS: TTLs in seconds per service, e.g. "ec2=60,logs=0"
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import use_aws as aws_utils
+
+# Response cache settings
+CACHE_MAX_BYTES = int(os.environ.get("USE_AWS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL = int(os.environ.get("USE_AWS_CACHE_TTL", "30"))
+CACHE_TTLS = os.environ.get("USE_AWS_CACHE_TTLS", "")
+
+
+class ResponseCache:
+    """
+    In-process TTL cache of read-only AWS responses.
+
+    Entries are keyed by the normalized (service, operation, parameters, region, credential
+    identity) and expire after the TTL of their service (0 disables caching for a service).
+    The total size of cached responses is capped, evicting the least recently used entries.
+    A mutative call invalidates every entry of the same service and region.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, default_ttl: int = CACHE_TTL, ttls: Optional[Dict[str, int]] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = ttls if ttls is not None else aws_utils.parse_service_settings(CACHE_TTLS)
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, Any]]" = OrderedDict()
+        self._by_target: Dict[Tuple[str, str], set] = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.bytes_saved = 0
+
+    def ttl_for(self, service_name: str) -> int:
+        """Return the TTL in seconds of a service."""
+        return self.ttls.get(service_name, self.default_ttl)
+
+    @staticmethod
+    def make_key(
+        service_name: str,
+        operation_name: str,
+        parameters: Dict[str, Any],
+        region: str,
+        identity: Optional[str],
+    ) -> Tuple:
+        """Build a cache key. Parameters are normalized so that key order does not matter."""
+        normalized = json.dumps(parameters, sort_keys=True, default=aws_utils.json_default, separators=(",", ":"))
+        return (service_name, region, operation_name, normalized, identity)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Return a cached response, or None on a miss or after expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, size, response = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += size
+            return response
+
+    def put(self, key: Tuple, response: Any, size: int) -> None:
+        """Cache a response of the given serialized size."""
+        ttl = self.ttl_for(key[0])
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, response)
+            self._by_target.setdefault(key[:2], set()).add(key)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, service_name: str, region: str) -> None:
+        """Drop every cached response of a service in a region."""
+        with self._lock:
+            keys = self._by_target.get((service_name, region))
+            if keys:
+                self.invalidations += len(keys)
+                for key in list(keys):
+                    self._remove(key)
+
+    def _remove(self, key: Tuple) -> None:
+        # Called with the lock held
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+        keys = self._by_target[key[:2]]
+        keys.discard(key)
+        if not keys:
+            del self._by_target[key[:2]]
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        with self._lock:
+            self._entries.clear()
+            self._by_target.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit rate, bytes saved and cache size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,191 @@
+"""
+aws_executor.py runs blocking boto3 calls on a bounded thread pool.
+
+The MCP server is async, so a slow describe_* call or StreamingBody.read() must not
+run on the event loop. Calls are handed to a shared ThreadPoolExecutor, and the number
+of calls in flight per service and region is limited with asyncio semaphores.
+
+Settings (environment variables):
+    USE_AWS_MAX_WORKERS: size of the thread pool (default: 32)
+    USE_AWS_SERVICE_CONCURRENCY: default limit per (service, region) (default: 8)
+    USE_AWS_SERVICE_CONCURRENCY_LIMITS: overrides such as "ec2=4,s3:us-east-1=16"
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("aws-executor")
+
+MAX_WORKERS = int(os.environ.get("USE_AWS_MAX_WORKERS", "32"))
+SERVICE_CONCURRENCY = int(os.environ.get("USE_AWS_SERVICE_CONCURRENCY", "8"))
+SERVICE_CONCURRENCY_LIMITS = os.environ.get("USE_AWS_SERVICE_CONCURRENCY_LIMITS", "")
+
+
+def parse_concurrency_limits(value: str) -> Dict[Tuple[str, Optional[str]], int]:
+    """
+    Parse per-service concurrency limits.
+
+    Args:
+        value: Comma separated "service=limit" or "service:region=limit" entries
+
+    Returns:
+        Dictionary of (service, region or None) -> limit
+    """
+    limits = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            target, limit = item.split("=")
+            service_name, _, region = target.strip().partition(":")
+            limits[(service_name, region or None)] = int(limit)
+        except ValueError:
+            logger.warning(f"Ignoring invalid concurrency limit: {item}")
+    return limits
+
+
+def release_soon(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore) -> None:
+    """Release an asyncio semaphore from any thread, once its loop runs again."""
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        pass  # the loop is closed, and its semaphores with it
+
+
+class AwsCallExecutor:
+    """
+    Bounded executor for blocking AWS calls with per-service and per-region limits.
+
+    Metrics:
+        queued: calls waiting for a service slot or a worker thread
+        running: calls currently executing in a worker thread
+        completed: calls finished since start
+        wait time: time from submission until a worker thread starts the call
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MAX_WORKERS,
+        default_limit: int = SERVICE_CONCURRENCY,
+        limits: Optional[Dict[Tuple[str, Optional[str]], int]] = None,
+    ):
+        self.max_workers = max_workers
+        self.default_limit = default_limit
+        self.limits = limits if limits is not None else parse_concurrency_limits(SERVICE_CONCURRENCY_LIMITS)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="use-aws")
+        self._semaphores: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._queued_by_key: Dict[Tuple[str, str], int] = {}
+
+    def limit_for(self, service_name: str, region: str) -> int:
+        """Return the concurrency limit of a service in a region."""
+        limit = self.limits.get((service_name, region))
+        if limit is None:
+            limit = self.limits.get((service_name, None), self.default_limit)
+        return limit
+
+    def _semaphore(self, key: Tuple[str, str]) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limit_for(*key))
+            self._semaphores[key] = semaphore
+        return semaphore
+
+    async def run(self, service_name: str, region: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking function in the thread pool without blocking the event loop.
+
+        Args:
+            service_name: AWS service the call goes to, used for the concurrency limit
+            region: AWS region the call goes to, used for the concurrency limit
+            func: Blocking function to run
+            *args: Arguments for the function
+
+        Returns:
+            The return value of the function
+        """
+        key = (service_name, region)
+        submitted = time.perf_counter()
+        started = False
+
+        with self._lock:
+            self._queued += 1
+            self._queued_by_key[key] = self._queued_by_key.get(key, 0) + 1
+
+        def dequeue() -> None:
+            # Called with the lock held, exactly once per call
+            nonlocal started
+            started = True
+            self._queued -= 1
+            self._queued_by_key[key] -= 1
+            if not self._queued_by_key[key]:
+                del self._queued_by_key[key]
+
+        def call() -> Any:
+            wait = time.perf_counter() - submitted
+            with self._lock:
+                if not started:
+                    dequeue()
+                self._running += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        try:
+            semaphore = self._semaphore(key)
+            await semaphore.acquire()
+            loop = asyncio.get_running_loop()
+            try:
+                future = self._executor.submit(call)
+            except BaseException:
+                semaphore.release()
+                raise
+            # The slot is released when the call is done, not when the caller stops waiting:
+            # a cancelled caller leaves a started boto3 call running, and it keeps its slot
+            future.add_done_callback(lambda _: release_soon(loop, semaphore))
+            return await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                if not started:  # cancelled before a worker picked it up
+                    dequeue()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth and wait time metrics."""
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 3) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "queued_by_service": {
+                    f"{service_name}:{region}": count
+                    for (service_name, region), count in self._queued_by_key.items()
+                },
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False)
+
+
+aws_executor = AwsCallExecutor()
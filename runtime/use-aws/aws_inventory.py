@@ -0,0 +1,473 @@
+"""
+aws_inventory.py keeps a local SQLite index of AWS resources for the use_aws_inventory tool.
+
+Resource types (ec2:instance, s3:bucket, ...) are crawled per (type, account, region) target
+with the list or describe operation of the type, following every page. Each crawl replaces
+the rows of its target in one transaction, so deleted resources disappear as well. A target
+is crawled again only when it is older than the TTL of its type, so repeated questions are
+answered from the index in milliseconds and only stale targets cost API calls.
+
+The caller provides the boto3 client of each target, so crawls use the same credentials,
+assumed roles and executor limits as use_aws.
+
+Tables:
+    resources(type, account, region, id, name, data, updated): one row per resource; data is
+        the resource as returned by the API, in JSON (query it with json_extract/json_each)
+    crawls(type, account, region, crawled, count, elapsed_ms): the last crawl of each target
+
+Settings (environment variables):
+    USE_AWS_INVENTORY_PATH: SQLite file of the index (default: <tmp>/use-aws-inventory.sqlite)
+    USE_AWS_INVENTORY_TTLS: TTLs in seconds per resource type, e.g. "ec2:instance=60,iam:role=86400"
+    USE_AWS_INVENTORY_TYPES: JSON object of additional resource types, with the keys of RESOURCE_TYPES
+    USE_AWS_INVENTORY_LIMIT: rows returned by a query (default: 100)
+    USE_AWS_INVENTORY_SQL_TIMEOUT: seconds a sql statement may run (default: 5)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import use_aws as aws_utils
+from aws_aggregate import compile_field
+from aws_cache import CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_PATH = os.environ.get(
+    "USE_AWS_INVENTORY_PATH", os.path.join(tempfile.gettempdir(), "use-aws-inventory.sqlite")
+)
+INVENTORY_TTLS = os.environ.get("USE_AWS_INVENTORY_TTLS", "")
+INVENTORY_TYPES = os.environ.get("USE_AWS_INVENTORY_TYPES", "")
+INVENTORY_LIMIT = int(os.environ.get("USE_AWS_INVENTORY_LIMIT", "100"))
+INVENTORY_SQL_TIMEOUT = float(os.environ.get("USE_AWS_INVENTORY_SQL_TIMEOUT", "5"))
+
+# Actions a sql statement may perform: reading tables and columns and calling functions
+# (json_extract, COUNT, ...). ATTACH, PRAGMA, writes and everything else are denied.
+SQL_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION}
+
+def authorize_read(action: int, table: Optional[str], *_: Any) -> int:
+    """SQLite authorizer of sql statements: allow SQL_ALLOWED_ACTIONS, deny everything else."""
+    if action in SQL_ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_OK
+    # Connecting a table-valued function such as json_each checks an update of the schema
+    # table; nothing can be written, since the connection is read-only and query_only
+    if action == sqlite3.SQLITE_UPDATE and table in ("sqlite_master", "sqlite_schema"):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+# Region of the targets of global resource types
+GLOBAL_REGION = "global"
+
+# service, operation, items (JMESPath of the resources in a page), id and name (JMESPath in a
+# resource; "@" for operations that list plain names), ttl in seconds, and global for types
+# listed once per account
+RESOURCE_TYPES: Dict[str, Dict[str, Any]] = {
+    "ec2:instance": {
+        "service": "ec2", "operation": "describe_instances", "items": "Reservations[].Instances[]",
+        "id": "InstanceId", "name": "Tags[?Key=='Name'].Value | [0]", "ttl": 300,
+    },
+    "ec2:security_group": {
+        "service": "ec2", "operation": "describe_security_groups", "items": "SecurityGroups[]",
+        "id": "GroupId", "name": "GroupName", "ttl": 900,
+    },
+    "ec2:vpc": {
+        "service": "ec2", "operation": "describe_vpcs", "items": "Vpcs[]",
+        "id": "VpcId", "name": "Tags[?Key=='Name'].Value | [0]", "ttl": 3600,
+    },
+    "ec2:subnet": {
+        "service": "ec2", "operation": "describe_subnets", "items": "Subnets[]",
+        "id": "SubnetId", "name": "Tags[?Key=='Name'].Value | [0]", "ttl": 3600,
+    },
+    "ec2:volume": {
+        "service": "ec2", "operation": "describe_volumes", "items": "Volumes[]",
+        "id": "VolumeId", "name": "Tags[?Key=='Name'].Value | [0]", "ttl": 900,
+    },
+    "s3:bucket": {
+        "service": "s3", "operation": "list_buckets", "items": "Buckets[]",
+        "id": "Name", "name": "Name", "ttl": 3600, "global": True,
+    },
+    "lambda:function": {
+        "service": "lambda", "operation": "list_functions", "items": "Functions[]",
+        "id": "FunctionArn", "name": "FunctionName", "ttl": 900,
+    },
+    "rds:db_instance": {
+        "service": "rds", "operation": "describe_db_instances", "items": "DBInstances[]",
+        "id": "DBInstanceArn", "name": "DBInstanceIdentifier", "ttl": 900,
+    },
+    "dynamodb:table": {
+        "service": "dynamodb", "operation": "list_tables", "items": "TableNames[]",
+        "id": "@", "name": "@", "ttl": 3600,
+    },
+    "ecs:cluster": {
+        "service": "ecs", "operation": "list_clusters", "items": "clusterArns[]",
+        "id": "@", "name": "@", "ttl": 3600,
+    },
+    "eks:cluster": {
+        "service": "eks", "operation": "list_clusters", "items": "clusters[]",
+        "id": "@", "name": "@", "ttl": 3600,
+    },
+    "elbv2:load_balancer": {
+        "service": "elbv2", "operation": "describe_load_balancers", "items": "LoadBalancers[]",
+        "id": "LoadBalancerArn", "name": "LoadBalancerName", "ttl": 900,
+    },
+    "cloudformation:stack": {
+        "service": "cloudformation", "operation": "describe_stacks", "items": "Stacks[]",
+        "id": "StackId", "name": "StackName", "ttl": 600,
+    },
+    "sns:topic": {
+        "service": "sns", "operation": "list_topics", "items": "Topics[]",
+        "id": "TopicArn", "name": "TopicArn", "ttl": 3600,
+    },
+    "sqs:queue": {
+        "service": "sqs", "operation": "list_queues", "items": "QueueUrls[]",
+        "id": "@", "name": "@", "ttl": 3600,
+    },
+    "iam:role": {
+        "service": "iam", "operation": "list_roles", "items": "Roles[]",
+        "id": "Arn", "name": "RoleName", "ttl": 3600, "global": True,
+    },
+    "iam:user": {
+        "service": "iam", "operation": "list_users", "items": "Users[]",
+        "id": "Arn", "name": "UserName", "ttl": 3600, "global": True,
+    },
+}
+
+# Comparison operators of query filters, e.g. {"Size": {">": 100}}
+FILTER_OPERATORS = {"=": "=", "!=": "!=", ">": ">", ">=": ">=", "<": "<", "<=": "<=", "like": "LIKE"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    type TEXT NOT NULL,
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (type, account, region, id)
+);
+CREATE INDEX IF NOT EXISTS resources_name ON resources (type, name);
+CREATE TABLE IF NOT EXISTS crawls (
+    type TEXT NOT NULL,
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    crawled REAL NOT NULL,
+    count INTEGER NOT NULL,
+    elapsed_ms REAL NOT NULL,
+    PRIMARY KEY (type, account, region)
+);
+"""
+
+
+def load_resource_types() -> Dict[str, Dict[str, Any]]:
+    """Return the built-in resource types merged with USE_AWS_INVENTORY_TYPES and USE_AWS_INVENTORY_TTLS."""
+    types = {name: dict(spec) for name, spec in RESOURCE_TYPES.items()}
+    if INVENTORY_TYPES:
+        try:
+            types.update(json.loads(INVENTORY_TYPES))
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid USE_AWS_INVENTORY_TYPES: {str(e)}")
+    for name, ttl in aws_utils.parse_service_settings(INVENTORY_TTLS).items():
+        if name in types:
+            types[name]["ttl"] = ttl
+    return types
+
+
+class Inventory:
+    """
+    SQLite index of AWS resources. Crawls write through one connection under a lock, and
+    queries read through their own connections, so they do not wait for a running crawl.
+    """
+
+    def __init__(self, path: str = INVENTORY_PATH, types: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.types = types if types is not None else load_resource_types()
+        self._expressions: Dict[str, Tuple[Any, Any, Any]] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _writer(self) -> sqlite3.Connection:
+        # Called with the lock held
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def _reader(self) -> sqlite3.Connection:
+        with self._lock:
+            self._writer()
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    def _compiled(self, type_name: str) -> Tuple[Any, Any, Any]:
+        if type_name not in self._expressions:
+            spec = self.types[type_name]
+            self._expressions[type_name] = (
+                aws_utils.compile_query(spec["items"]),
+                aws_utils.compile_query(spec["id"]),
+                aws_utils.compile_query(spec["name"]) if spec.get("name") else None,
+            )
+        return self._expressions[type_name]
+
+    def check_types(self, types: Optional[List[str]]) -> List[str]:
+        """Return the requested resource types, or all of them. Raises ValueError for unknown types."""
+        if not types:
+            return list(self.types)
+        unknown = [name for name in types if name not in self.types]
+        if unknown:
+            raise ValueError(f"Unknown resource types: {', '.join(unknown)}. Available: {', '.join(self.types)}")
+        return list(types)
+
+    def targets(self, types: List[str], regions: List[str], accounts: List[Any]) -> List[Tuple[str, Any, str]]:
+        """Return the (type, account, region) targets; global types have one target per account."""
+        targets = []
+        for type_name in types:
+            type_regions = [GLOBAL_REGION] if self.types[type_name].get("global") else regions
+            targets.extend((type_name, account, region) for account in accounts for region in type_regions)
+        return targets
+
+    def stale(self, targets: List[Tuple[str, str, str]], now: Optional[float] = None) -> List[Tuple[str, str, str]]:
+        """Return the targets that were never crawled or whose last crawl is older than their TTL."""
+        now = now or time.time()
+        with self._lock:
+            crawled = {
+                (type_name, account, region): at
+                for type_name, account, region, at in self._writer().execute("SELECT type, account, region, crawled FROM crawls")
+            }
+        return [
+            target for target in targets
+            if crawled.get(target, 0) + self.types[target[0]].get("ttl", CACHE_TTL) <= now
+        ]
+
+    def crawl(self, client: Any, type_name: str, account: str, region: str) -> Dict[str, Any]:
+        """
+        Crawl one target and replace its rows. Blocks.
+
+        Args:
+            client: boto3 client of the service of the type, in the region and account
+            type_name: Resource type, e.g. "ec2:instance"
+            account: Account label of the rows
+            region: Region label of the rows (GLOBAL_REGION for global types)
+
+        Returns:
+            Dictionary with the number of resources and pages and the elapsed time
+        """
+        spec = self.types[type_name]
+        items, id_expr, name_expr = self._compiled(type_name)
+        parameters = spec.get("parameters") or {}
+        start = time.perf_counter()
+        if client.can_paginate(spec["operation"]):
+            pages = client.get_paginator(spec["operation"]).paginate(**parameters)
+        else:
+            pages = [getattr(client, spec["operation"])(**parameters)]
+
+        now = time.time()
+        rows = {}
+        page_count = 0
+        for page in pages:
+            page_count += 1
+            for resource in items.search(page) or []:
+                resource_id = id_expr.search(resource)
+                if resource_id is None:
+                    continue
+                name = name_expr.search(resource) if name_expr is not None else None
+                if isinstance(name, bool) or not isinstance(name, (str, int, float)):
+                    # A custom name expression may select a list or an object, which SQLite cannot bind
+                    name = None
+                else:
+                    name = str(name)
+                rows[str(resource_id)] = (
+                    type_name, account, region, str(resource_id), name, aws_utils.encode_json(resource), now
+                )
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        with self._lock:
+            connection = self._writer()
+            with connection:
+                connection.execute(
+                    "DELETE FROM resources WHERE type = ? AND account = ? AND region = ?", (type_name, account, region)
+                )
+                connection.executemany("INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)", rows.values())
+                connection.execute(
+                    "INSERT OR REPLACE INTO crawls VALUES (?, ?, ?, ?, ?, ?)",
+                    (type_name, account, region, now, len(rows), elapsed_ms),
+                )
+        return {"resources": len(rows), "pages": page_count, "elapsed_ms": elapsed_ms}
+
+    @staticmethod
+    def _condition(field: str, value: Any) -> Tuple[str, List[Any]]:
+        """Translate one filter into an SQL condition and its parameters."""
+        if field in ("account", "region", "id", "name"):
+            column, parameters = field, []
+        elif field.startswith("tag:"):
+            # true: the tag exists, false: the tag is missing, otherwise the value of the tag
+            exists = (
+                "EXISTS (SELECT 1 FROM json_each(resources.data, '$.Tags') AS tag "
+                "WHERE json_extract(tag.value, '$.Key') = ?"
+            )
+            if value is True or value is False:
+                return ("" if value else "NOT ") + exists + ")", [field[4:]]
+            return exists + " AND json_extract(tag.value, '$.Value') = ?)", [field[4:], value]
+        else:
+            column, parameters = "json_extract(data, ?)", ["$." + field]
+
+        if value is None:
+            return f"{column} IS NULL", parameters
+        if isinstance(value, list):
+            return f"{column} IN ({', '.join('?' * len(value))})", parameters + value
+        if isinstance(value, dict) and value:
+            # The column parameters repeat for every operator
+            conditions, values = [], []
+            for operator, operand in value.items():
+                if operator not in FILTER_OPERATORS:
+                    raise ValueError(f"Invalid operator of {field}: {operator}, use one of {', '.join(FILTER_OPERATORS)}")
+                conditions.append(f"{column} {FILTER_OPERATORS[operator]} ?")
+                values.extend(parameters + [operand])
+            return " AND ".join(conditions), values
+        if isinstance(value, bool):
+            value = int(value)  # JSON booleans are 1 and 0 in SQLite
+        return f"{column} = ?", parameters + [value]
+
+    def query(
+        self,
+        types: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Return the resources of some types that match the filters.
+
+        Args:
+            types: Resource types
+            filters: Conditions combined with AND, by field:
+                - account, region, id, name: the columns of the row
+                - tag:<Key>: true when the tag exists, false when it is missing, or its value
+                - any other field: a dotted path in the resource, e.g. "State.Name"
+                A value matches with =, a list with IN, null with IS NULL, and an object
+                applies operators, e.g. {"Size": {">=": 100}} or {"name": {"like": "prod-%"}}
+            fields: JMESPath expressions returned for each resource instead of the whole
+                resource, e.g. ["State.Name", "Tags[?Key=='Owner'].Value | [0]"]
+            limit: Maximum number of rows returned (default: USE_AWS_INVENTORY_LIMIT)
+
+        Returns:
+            Dictionary with the rows, the number of matching resources and the elapsed time
+        """
+        start = time.perf_counter()
+        limit = limit or INVENTORY_LIMIT
+        conditions = [f"type IN ({', '.join('?' * len(types))})"]
+        parameters: List[Any] = list(types)
+        for field, value in (filters or {}).items():
+            condition, condition_parameters = self._condition(field, value)
+            conditions.append(condition)
+            parameters.extend(condition_parameters)
+        where = " AND ".join(conditions)
+        expressions = [(field, compile_field(field)) for field in fields or []]
+
+        connection = self._reader()
+        try:
+            count = connection.execute(f"SELECT COUNT(*) FROM resources WHERE {where}", parameters).fetchone()[0]
+            cursor = connection.execute(
+                f"SELECT type, account, region, id, name, data FROM resources WHERE {where} "
+                "ORDER BY type, account, region, name, id LIMIT ?",
+                parameters + [limit],
+            )
+            rows = []
+            for type_name, account, region, resource_id, name, data in cursor:
+                resource = json.loads(data)
+                row = {"type": type_name, "account": account, "region": region, "id": resource_id, "name": name}
+                if expressions:
+                    row.update((field, expression.search(resource)) for field, expression in expressions)
+                else:
+                    row["data"] = resource
+                rows.append(row)
+        finally:
+            connection.close()
+
+        result = {"count": count, "rows": rows, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+        if count > len(rows):
+            result["truncated"] = True
+        return result
+
+    def sql(self, statement: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run one read-only SQL statement on the index, e.g.
+        SELECT region, json_extract(data, '$.InstanceType') AS type, COUNT(*) FROM resources
+        WHERE type = 'ec2:instance' GROUP BY 1, 2
+
+        The statement may only read: an authorizer denies everything but SELECT, reading
+        columns and calling functions, so ATTACH, PRAGMA and writes fail to prepare. It is
+        interrupted after USE_AWS_INVENTORY_SQL_TIMEOUT seconds.
+
+        Returns:
+            Dictionary with the column names, at most limit rows and the elapsed time
+
+        Raises:
+            sqlite3.DatabaseError: when the statement is not allowed, fails or times out
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + INVENTORY_SQL_TIMEOUT
+        limit = limit or INVENTORY_LIMIT
+        connection = self._reader()
+        try:
+            connection.set_authorizer(authorize_read)
+            # Called every 10000 virtual machine instructions; a non-zero return interrupts the statement
+            connection.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+            try:
+                cursor = connection.execute(statement)
+                rows = cursor.fetchmany(limit + 1)
+            except sqlite3.OperationalError as ex:
+                if time.monotonic() > deadline:
+                    raise sqlite3.OperationalError(
+                        f"statement interrupted after {INVENTORY_SQL_TIMEOUT:g} seconds"
+                    ) from ex
+                raise
+            columns = [column[0] for column in cursor.description or []]
+        finally:
+            connection.close()
+
+        result = {
+            "columns": columns,
+            "rows": [list(row) for row in rows[:limit]],
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        if len(rows) > limit:
+            result["truncated"] = True
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        """Return the resource types with their TTL, and the age and size of every crawled target."""
+        now = time.time()
+        connection = self._reader()
+        try:
+            crawls = connection.execute(
+                "SELECT type, account, region, crawled, count, elapsed_ms FROM crawls ORDER BY type, account, region"
+            ).fetchall()
+        finally:
+            connection.close()
+        return {
+            "path": self.path,
+            "types": {
+                name: {"service": spec["service"], "operation": spec["operation"], "ttl": spec.get("ttl", CACHE_TTL)}
+                for name, spec in self.types.items()
+            },
+            "crawls": [
+                {
+                    "type": type_name, "account": account, "region": region, "resources": count,
+                    "age_seconds": round(now - crawled), "stale": crawled + self.types.get(type_name, {}).get("ttl", 0) <= now,
+                    "elapsed_ms": elapsed_ms,
+                }
+                for type_name, account, region, crawled, count, elapsed_ms in crawls
+            ],
+        }
+
+
+inventory = Inventory()
@@ -0,0 +1,248 @@
+"""
+aws_watch.py turns repeated use_aws reads into diffs against the last response seen.
+
+StateWatch compares each response of a watched (operation, parameters, query) with its
+snapshot in the SnapshotStore and reports only the resources that were added or removed
+and the fields that changed.
+
+Settings (environment variables):
+    USE_AWS_WATCH_MAX_SNAPSHOTS: snapshots kept in memory (default: 256)
+    USE_AWS_WATCH_MAX_BYTES: total size of the snapshots (default: 32 MB)
+    USE_AWS_WATCH_INTERVAL: seconds between polls (default: 5)
+    USE_AWS_WATCH_MAX_WAIT: longest wait of a watch in seconds (default: 300)
+    USE_AWS_WATCH_MAX_CHANGES: changes returned by a watch (default: 200)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import use_aws as aws_utils
+
+# Watch mode: snapshots of watched responses and their structural diffs
+WATCH_MAX_SNAPSHOTS = int(os.environ.get("USE_AWS_WATCH_MAX_SNAPSHOTS", "256"))
+WATCH_MAX_BYTES = int(os.environ.get("USE_AWS_WATCH_MAX_BYTES", str(32 * 1024 * 1024)))
+WATCH_INTERVAL = float(os.environ.get("USE_AWS_WATCH_INTERVAL", "5"))
+WATCH_MAX_WAIT = float(os.environ.get("USE_AWS_WATCH_MAX_WAIT", "300"))
+WATCH_MAX_CHANGES = int(os.environ.get("USE_AWS_WATCH_MAX_CHANGES", "200"))
+
+# Fields that identify the entries of a list of resources, by priority of their suffix
+IDENTITY_SUFFIXES = ("Id", "Arn", "ARN", "Name", "Key", "Identifier")
+
+
+class SnapshotStore:
+    """
+    In-process store of the last response seen by each watch.
+
+    Snapshots are keyed like ResponseCache entries and carry a version that is increased
+    every time the watched state changes. The number of snapshots and their total size
+    are capped, evicting the least recently used snapshots.
+    """
+
+    def __init__(self, max_entries: int = WATCH_MAX_SNAPSHOTS, max_bytes: int = WATCH_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[int, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[Tuple[int, Any]]:
+        """Return the version and state of a snapshot, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[2]
+
+    def put(self, key: Tuple, state: Any, size: int) -> int:
+        """Store the state of a watch and return its new version."""
+        with self._lock:
+            version = 1
+            if key in self._entries:
+                version = self._entries[key][0] + 1
+                self.size -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return version
+            self._entries[key] = (version, size, state)
+            self.size += size
+            while self.size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+            return version
+
+    def discard(self, key: Tuple) -> None:
+        """Drop the snapshot of a watch."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+
+snapshot_store = SnapshotStore()
+
+
+def identity_field(old: List[Any], new: List[Any]) -> Optional[str]:
+    """
+    Find the field that identifies the entries of two versions of a list of resources.
+
+    The field must end with one of IDENTITY_SUFFIXES (InstanceId, FunctionArn, ...), hold a
+    string or number in every entry, and be unique within each list.
+    """
+    entries = old + new
+    if not entries or not all(isinstance(entry, dict) for entry in entries):
+        return None
+    candidates = [
+        name for name, value in entries[0].items()
+        if isinstance(value, (str, int)) and name.endswith(IDENTITY_SUFFIXES)
+    ]
+    candidates.sort(key=lambda name: next(i for i, suffix in enumerate(IDENTITY_SUFFIXES) if name.endswith(suffix)))
+    for name in candidates:
+        for entries in (old, new):
+            values = [entry.get(name) for entry in entries]
+            if any(not isinstance(value, (str, int)) for value in values) or len(set(values)) < len(values):
+                break
+        else:
+            return name
+    return None
+
+
+def structural_diff(old: Any, new: Any, ignore: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compute the structural diff between two versions of a response.
+
+    Lists of resources are matched by their identity field (see identity_field), so a
+    resource that moves in the list is not reported. Paths name entries of such lists by
+    their identity, e.g. Reservations[r-0a1].Instances[i-0b2].State.Name, and other list
+    entries by their index.
+
+    Args:
+        old: The previous response
+        new: The current response
+        ignore: Field names whose changes are not reported, e.g. ["LastModified"]
+
+    Returns:
+        Dictionary with added resources ({path, value}), removed resources ({path}) and
+        changed fields ({path, old, new}; a missing side is a field that was added or removed)
+    """
+    diff: Dict[str, List[Dict[str, Any]]] = {"added": [], "removed": [], "changed": []}
+    _diff(old, new, "", set(ignore or ()), diff)
+    return diff
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
+
+
+def _diff(old: Any, new: Any, path: str, ignore: set, diff: Dict[str, List[Dict[str, Any]]]) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for name, value in old.items():
+            if name in ignore:
+                continue
+            if name not in new:
+                diff["changed"].append({"path": _join(path, name), "old": value})
+            else:
+                _diff(value, new[name], _join(path, name), ignore, diff)
+        for name, value in new.items():
+            if name not in old and name not in ignore:
+                diff["changed"].append({"path": _join(path, name), "new": value})
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        if old == new:
+            return
+        field = identity_field(old, new)
+        if field is not None:
+            before = {entry[field]: entry for entry in old}
+            after = {entry[field]: entry for entry in new}
+            for identity, entry in before.items():
+                if identity not in after:
+                    diff["removed"].append({"path": f"{path}[{identity}]"})
+            for identity, entry in after.items():
+                if identity in before:
+                    _diff(before[identity], entry, f"{path}[{identity}]", ignore, diff)
+                else:
+                    diff["added"].append({"path": f"{path}[{identity}]", "value": entry})
+        elif all(not isinstance(entry, (dict, list)) for entry in old + new):
+            # Lists of scalars, such as security group ids, are compared as sets
+            before, after = set(old), set(new)
+            for entry in old:
+                if entry not in after:
+                    diff["removed"].append({"path": f"{path}[{entry}]"})
+            for entry in new:
+                if entry not in before:
+                    diff["added"].append({"path": f"{path}[{entry}]", "value": entry})
+        else:
+            for i, (before, after) in enumerate(zip(old, new)):
+                _diff(before, after, f"{path}[{i}]", ignore, diff)
+            for i in range(len(new), len(old)):
+                diff["removed"].append({"path": f"{path}[{i}]"})
+            for i in range(len(old), len(new)):
+                diff["added"].append({"path": f"{path}[{i}]", "value": new[i]})
+        return
+
+    if old != new:
+        diff["changed"].append({"path": path, "old": old, "new": new})
+
+
+class StateWatch:
+    """
+    Watch of one (operation, parameters, query) key that turns each observed response into
+    a diff against the last snapshot.
+
+    The first observation stores the snapshot and returns the full state. Later observations
+    return only the added, removed and changed entries, or None while nothing has changed,
+    so the caller can keep polling until something changes or its wait expires.
+
+    Spec:
+        wait: Seconds to keep polling until something changes (default: 0, a single poll)
+        interval: Seconds between polls (default: USE_AWS_WATCH_INTERVAL)
+        ignore: Field names whose changes are not reported, e.g. ["LastModified"]
+        reset: Drop the snapshot and return the full state (default: False)
+    """
+
+    def __init__(self, key: Tuple, spec: Optional[Dict[str, Any]] = None, store: Optional[SnapshotStore] = None):
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise ValueError("watch must be an object")
+        self.wait = min(max(float(spec.get("wait", 0)), 0.0), WATCH_MAX_WAIT)
+        self.interval = max(float(spec.get("interval", WATCH_INTERVAL)), 1.0)
+        ignore = spec.get("ignore") or []
+        self.ignore = [ignore] if isinstance(ignore, str) else list(ignore)
+        self.key = key
+        self.store = store if store is not None else snapshot_store
+        if spec.get("reset"):
+            self.store.discard(key)
+        self.version = None
+
+    def observe(self, state: Any) -> Optional[Dict[str, Any]]:
+        """Compare a response with the snapshot, store it when it changed, and return the result."""
+        snapshot = self.store.get(self.key)
+        size = len(aws_utils.encode_json(state))
+        if snapshot is None:
+            self.version = self.store.put(self.key, state, size)
+            return {"watch": {"version": self.version, "snapshot": "created"}, "state": state}
+
+        self.version, previous = snapshot
+        diff = structural_diff(previous, state, self.ignore)
+        changes = sum(len(entries) for entries in diff.values())
+        if not changes:
+            return None
+        self.version = self.store.put(self.key, state, size)
+
+        result: Dict[str, Any] = {"watch": {"version": self.version, "changes": changes}}
+        budget = WATCH_MAX_CHANGES
+        for kind, entries in diff.items():
+            if entries:
+                result[kind] = entries[:budget]
+                budget = max(budget - len(entries), 0)
+        if changes > WATCH_MAX_CHANGES:
+            result["watch"]["truncated"] = True
+        return result
+
+    def unchanged(self) -> Dict[str, Any]:
+        """Return the result of a watch that saw no change."""
+        return {"watch": {"version": self.version, "changes": 0}}
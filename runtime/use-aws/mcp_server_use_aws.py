@@ -1,17 +1,34 @@
+import asyncio
 import json
 import logging
 import os
+import sqlite3
 import use_aws as aws_utils
 import sys
+import time
 
-from mcp.server.fastmcp import FastMCP
-from typing import Any, Dict, List, Optional
+import aws_dynamodb
+from aws_aggregate import Aggregator
+from aws_cache import response_cache
+from aws_executor import aws_executor
+from aws_inventory import GLOBAL_REGION, inventory
+from aws_log_patterns import LogPatternMiner
+from aws_s3_listing import S3ShardedListing
+from aws_watch import StateWatch
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import CallToolResult, TextContent
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import boto3
 from botocore.exceptions import ParamValidationError, ValidationError
-from botocore.response import StreamingBody
-from colorama import Fore, Style, init
-from rich.panel import Panel
+from jmespath.exceptions import JMESPathError
+
+try:
+    import metric_compaction
+except ImportError:  # numpy is not installed, metric responses are returned raw
+    metric_compaction = None
 
 logging.basicConfig(
     level=logging.INFO,  # Default to INFO level
@@ -37,80 +54,52 @@ except Exception as e:
         err_msg = f"Error: {str(e)}"
         logger.info(f"{err_msg}")
 
-aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-aws_session_token = os.environ.get('AWS_SESSION_TOKEN')
 aws_region = os.environ.get('AWS_DEFAULT_REGION', 'us-west-2')
 
-MUTATIVE_OPERATIONS = [
-    "create",
-    "put",
-    "delete",
-    "update",
-    "terminate",
-    "revoke",
-    "disable",
-    "deregister",
-    "stop",
-    "add",
-    "modify",
-    "remove",
-    "attach",
-    "detach",
-    "start",
-    "enable",
-    "register",
-    "set",
-    "associate",
-    "disassociate",
-    "allocate",
-    "release",
-    "cancel",
-    "reboot",
-    "accept",
-]
+# Upper bound of serialized pages returned by paginate mode
+PAGINATE_MAX_BYTES = int(os.environ.get("USE_AWS_PAGINATE_MAX_BYTES", str(1024 * 1024)))
+
+# Limits of use_aws_batch, and overall deadline of batches and region/account fan-out
+BATCH_MAX_ITEMS = int(os.environ.get("USE_AWS_BATCH_MAX_ITEMS", "20"))
+BATCH_CONCURRENCY = int(os.environ.get("USE_AWS_BATCH_CONCURRENCY", "8"))
+BATCH_TIMEOUT = float(os.environ.get("USE_AWS_BATCH_TIMEOUT", "60"))
+
+# Regions and accounts crawled by use_aws_inventory when the call does not name them
+INVENTORY_REGIONS = [region for region in os.environ.get("USE_AWS_INVENTORY_REGIONS", "").split(",") if region]
+INVENTORY_ACCOUNTS = [account for account in os.environ.get("USE_AWS_INVENTORY_ACCOUNTS", "").split(",") if account]
+
+# Limits of region/account fan-out
+FANOUT_MAX_TARGETS = int(os.environ.get("USE_AWS_FANOUT_MAX_TARGETS", "200"))
+FANOUT_CONCURRENCY = int(os.environ.get("USE_AWS_FANOUT_CONCURRENCY", "16"))
+
+def log_invalid(message: str) -> None:
+    """Log an invalid request at debug level in red. colorama is imported only when debug logging is on."""
+    if logger.isEnabledFor(logging.DEBUG):
+        from colorama import Fore, Style
+        logger.debug(f"{Fore.RED}{message}{Style.RESET_ALL}")
 
 def get_boto3_client(
     service_name: str,
     region_name: str,
     profile_name: Optional[str] = None,
+    role_arn: Optional[str] = None,
 ) -> Any:
     """
-    Create an AWS boto3 client for the specified service and region.
+    Get an AWS boto3 client for the specified service and region.
+
+    Clients are pooled in the shared client registry of use_aws.py, so repeated calls
+    reuse the loaded service model and open connections instead of creating a new session.
 
     Args:
         service_name: Name of the AWS service (e.g., 's3', 'ec2', 'dynamodb')
         region_name: AWS region name (e.g., 'us-west-2', 'us-east-1')
         profile_name: Optional AWS profile name from ~/.aws/credentials
+        role_arn: Optional IAM role to assume with the profile's credentials
 
     Returns:
         A boto3 client object for the specified service
     """
-    session = boto3.Session(profile_name=profile_name)
-    return session.client(service_name=service_name, region_name=region_name)
-
-def handle_streaming_body(response: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Process streaming body responses from AWS into regular Python objects.
-
-    Some AWS APIs return StreamingBody objects that need special handling to
-    convert them into regular Python dictionaries or strings for proper JSON serialization.
-
-    Args:
-        response: AWS API response that may contain StreamingBody objects
-
-    Returns:
-        Processed response with StreamingBody objects converted to Python objects
-    """
-    for key, value in response.items():
-        if isinstance(value, StreamingBody):
-            content = value.read()
-            try:
-                response[key] = json.loads(content.decode("utf-8"))
-            except json.JSONDecodeError:
-                response[key] = content.decode("utf-8")
-    return response
-
+    return aws_utils.get_client(service_name, region_name, profile_name, role_arn)
 
 def get_available_services() -> List[str]:
     """
@@ -119,8 +108,7 @@ def get_available_services() -> List[str]:
     Returns:
         List of service names as strings
     """
-    services = boto3.Session().get_available_services()
-    return list(services)
+    return aws_utils.service_catalog.services()
 
 
 def get_available_operations(service_name: str) -> List[str]:
@@ -134,22 +122,8 @@ def get_available_operations(service_name: str) -> List[str]:
         List of operation names as strings
     """
 
-    aws_region = os.environ.get("AWS_REGION", "us-west-2")
     try:
-        if aws_access_key and aws_secret_key:
-            client = boto3.client(
-                service_name, 
-                region_name=aws_region, 
-                aws_access_key_id=aws_access_key, 
-                aws_secret_access_key=aws_secret_key, 
-                aws_session_token=aws_session_token
-            )
-        else:
-            client = boto3.client(
-                service_name, 
-                region_name=aws_region
-            )
-        return [op for op in dir(client) if not op.startswith("_")]
+        return list(aws_utils.service_catalog.operations(service_name))
     except Exception as e:
         logger.error(f"Error getting operations for service {service_name}: {str(e)}")
         return []
@@ -220,14 +194,30 @@ class ToolUse(TypedDict):
     name: str
 
 @mcp.tool()
-def use_aws(
+async def use_aws(
     service_name: str,
     operation_name: str,
     parameters: Dict[str, Any],
     region: Optional[str] = None,
     label: str = "AWS Operation Details",
-    profile_name: Optional[str] = None
-) -> Dict[str, Any]:
+    profile_name: Optional[str] = None,
+    paginate: bool = False,
+    max_items: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    query: Optional[str] = None,
+    prune: bool = True,
+    use_cache: bool = True,
+    regions: Optional[List[str]] = None,
+    accounts: Optional[List[str]] = None,
+    aggregate: Optional[Dict[str, Any]] = None,
+    metric_points: Optional[int] = None,
+    raw_metrics: bool = False,
+    log_patterns: Optional[Dict[str, Any]] = None,
+    sharded_list: Optional[Dict[str, Any]] = None,
+    parallel_scan: Optional[Dict[str, Any]] = None,
+    watch: Optional[Dict[str, Any]] = None,
+    ctx: Context = None
+) -> CallToolResult:
     """
     Execute AWS service operations using boto3 with comprehensive error handling and validation.
 
@@ -241,7 +231,8 @@ def use_aws(
     1. The tool validates the provided service and operation names against available APIs
     2. For potentially disruptive operations (create, delete, etc.), it prompts for confirmation
     3. It sets up a boto3 client with appropriate region and credentials
-    4. The requested operation is executed with the provided parameters
+    4. The requested operation is executed with the provided parameters on a bounded
+       thread pool, so slow calls do not block other sessions
     5. Responses are processed to handle special data types (e.g., streaming bodies)
     6. If errors occur, helpful messages and expected parameter schemas are returned
 
@@ -260,75 +251,892 @@ def use_aws(
         region: AWS region (e.g., 'us-west-2')
         label: Human-readable description of the operation
         profile_name: Optional AWS profile name for credentials
+        paginate: Fetch all pages of a list/describe operation instead of only the first one
+        max_items: With paginate, stop after this many items. The summary returns a
+            PaginationConfig StartingToken to continue from.
+        max_bytes: With paginate, stop after this many bytes of serialized pages
+        query: Optional JMESPath expression applied to the response before it is returned
+            (e.g., 'Reservations[].Instances[].{id: InstanceId, state: State.Name}')
+        prune: Drop ResponseMetadata and null or empty fields from the response (default: True)
+        use_cache: Serve read-only operations (describe, list, get, ...) from a short-lived
+            cache when the same call was made recently (default: True). Set to False for fresh data.
+            Secrets and credentials (e.g. secretsmanager get_secret_value) are never cached.
+        regions: Run the operation in several regions in parallel, e.g. ["us-east-1", "eu-west-1"].
+            ["*"] means every region of the service. Overrides region.
+        accounts: Run the operation in several accounts in parallel. Each entry is an account id,
+            whose USE_AWS_ASSUME_ROLE_NAME role is assumed, or a role ARN.
+        aggregate: Return only an aggregate table computed over all pages instead of the
+            records, e.g. instances per type and AZ:
+            {"items": "Reservations[].Instances[]",
+             "group_by": ["InstanceType", "Placement.AvailabilityZone"],
+             "metrics": ["count", "max(LaunchTime)"]}
+            Keys: items (JMESPath of the records, defaults to the paginator's result keys),
+            group_by (JMESPath or list), metrics (count, sum(expr), min(expr), max(expr),
+            avg(expr)), sort_by (a metric), limit (groups returned), and
+            top_k ({"k": 5, "by": "Size", "order": "desc", "select": "{Key: Key, Size: Size}"}).
+            max_items limits the records read.
+        metric_points: Points kept per series of CloudWatch get_metric_data and
+            get_metric_statistics (default: 100). Longer series are returned as a summary
+            (min, max, mean, p50, p95, p99, slope per hour), anomaly points and a downsampled
+            series that keeps peaks and dips.
+        raw_metrics: Return CloudWatch metric series without compaction (default: False)
+        log_patterns: For logs filter_log_events and get_log_events, return the log line
+            templates (e.g. "ERROR Timeout after <*> waiting for <*>") with their counts,
+            first and last timestamps and sample lines instead of the events. All pages are
+            mined; max_items limits the events read. Use {} for the defaults, or set
+            similarity (0.4), depth (4), max_patterns (1000), limit (50) and samples (3).
+        sharded_list: For s3 list_objects_v2 of large buckets, discover the common prefixes
+            with delimiter listings and list them as shards in parallel. Returns the object
+            count, total size, by_prefix and by_storage_class breakdowns and the first objects,
+            or the aggregate table when aggregate is set (e.g. group_by "StorageClass").
+            Use {} for the defaults, or set delimiter ("/"), concurrency (16), shards,
+            max_depth (3), prefix_depth (1) and contents (objects returned, 1000).
+            max_items limits the objects read.
+        parallel_scan: For dynamodb scan of large tables, scan Segment/TotalSegments in
+            parallel within a read capacity budget. Returns the first items, Count,
+            ScannedCount and the consumed capacity, or the aggregate table when aggregate is
+            set. ProjectionExpression and FilterExpression are applied by DynamoDB and query
+            to the result. Use {} for the defaults, or set segments (8), workers (segments),
+            read_capacity (units per second), capacity_fraction (0.5 of the provisioned read
+            capacity; on-demand tables are not limited unless read_capacity is set) and items
+            (items returned, 1000). max_items limits the items read.
+        watch: For read-only operations polled repeatedly, e.g. while monitoring a deployment,
+            return only what changed since the last watch of the same operation, parameters
+            and query. The first call returns the full state; later calls return the resources
+            added and removed and the fields changed, with paths such as
+            Reservations[r-0a1].Instances[i-0b2].State.Name. Use {} for a single poll, or set
+            wait (seconds to keep polling until something changes, at most 300), interval
+            (seconds between polls, 5), ignore (field names not reported) and reset (return
+            the full state again).
 
     Returns:
-        ToolResult dictionary with:
-        - status: 'success' or 'error'
-        - content: List of content dictionaries with response text
+        CallToolResult with:
+        - content: compact JSON text of the response, or the error message
+        - structuredContent: status ('success' or 'error') and the decoded response, with
+          bytes_before and bytes_after when query or prune shaped it
 
     Notes:
         - Mutative operations (create, delete, etc.) require user confirmation in non-dev environments
         - You can disable confirmation by setting the environment variable BYPASS_TOOL_CONSENT=true
-        - The tool automatically handles special response types like streaming bodies
+        - The tool automatically handles special response types like streaming bodies.
+          For large or binary bodies only a preview is read, with the source to read the rest
+          from (e.g. Bucket, Key, VersionId and the Range of the next bytes for s3 get_object)
         - For validation errors, the tool attempts to generate the correct input schema
         - All datetime objects are automatically converted to strings for proper JSON serialization
+        - Use query to return only the fields you need; large describe_* responses shrink a lot
+        - Mutative operations invalidate cached responses of the same service and region
+        - With regions or accounts, results are tagged with region and account. When every
+          result is a list (e.g. with a query such as 'Reservations[].Instances[]'), they are
+          merged into one list whose entries carry _region and _account
+        - In paginate mode every page is sent as a progress notification while fetching,
+          and returned as its own content block followed by a summary
+        - dynamodb batch_get_item accepts more than 100 keys; they are sent in chunks of 100
+          and UnprocessedKeys are retried with backoff
     """
-    if region is None:
-        region = aws_region
+    if regions or accounts:
+        result = await run_use_aws_fanout(
+            service_name, operation_name, parameters, regions or [region or aws_region], accounts, label,
+            profile_name, paginate, max_items, max_bytes, query, prune, use_cache, aggregate,
+            metric_points, raw_metrics, log_patterns, sharded_list, parallel_scan, watch, ctx
+        )
+    else:
+        result = await run_use_aws(
+            service_name, operation_name, parameters, region, label, profile_name,
+            paginate, max_items, max_bytes, query, prune, use_cache, aggregate=aggregate,
+            metric_points=metric_points, raw_metrics=raw_metrics, log_patterns=log_patterns,
+            sharded_list=sharded_list, parallel_scan=parallel_scan, watch=watch, ctx=ctx
+        )
+    return to_call_tool_result(result)
 
-    console = aws_utils.create()
+def to_call_tool_result(result: Dict[str, Any]) -> CallToolResult:
+    """
+    Convert a ToolResult dictionary into an MCP CallToolResult. Text blocks are returned
+    as they are, and the decoded response, if any, is returned as structured content.
+    Errors are reported through the status rather than isError, so agents read the message.
+    """
+    return CallToolResult(
+        content=[TextContent(type="text", text=block["text"]) for block in result["content"]],
+        structuredContent=result.get("structuredContent", {"status": result["status"]}),
+    )
 
-    # Create a panel for AWS Operation Details
-    operation_details = f"{Fore.CYAN}Service:{Style.RESET_ALL} {service_name}\n"
-    operation_details += f"{Fore.CYAN}Operation:{Style.RESET_ALL} {operation_name}\n"
-    operation_details += f"{Fore.CYAN}Parameters:{Style.RESET_ALL}\n"
-    for key, value in parameters.items():
-        operation_details += f"  - {key}: {value}\n"
+async def run_use_aws(
+    service_name: str,
+    operation_name: str,
+    parameters: Dict[str, Any],
+    region: Optional[str] = None,
+    label: str = "AWS Operation Details",
+    profile_name: Optional[str] = None,
+    paginate: bool = False,
+    max_items: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    query: Optional[str] = None,
+    prune: bool = True,
+    use_cache: bool = True,
+    role_arn: Optional[str] = None,
+    aggregate: Optional[Dict[str, Any]] = None,
+    metric_points: Optional[int] = None,
+    raw_metrics: bool = False,
+    log_patterns: Optional[Dict[str, Any]] = None,
+    sharded_list: Optional[Dict[str, Any]] = None,
+    parallel_scan: Optional[Dict[str, Any]] = None,
+    watch: Optional[Dict[str, Any]] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Validate and execute a use_aws request in one region. See use_aws for the arguments.
+    role_arn is the role assumed for a target account of a fan-out.
+
+    Returns:
+        ToolResult dictionary with status and content
+    """
+    if region is None:
+        region = aws_region
 
-    console.print(Panel(operation_details, title=label, expand=False))
+    aws_utils.print_operation_details(service_name, operation_name, parameters, label)
 
     logger.debug(
         "Invoking: service_name = %s, operation_name = %s, parameters = %s" % (service_name, operation_name, parameters)
     )
     
     # Check AWS service
-    available_services = get_available_services()
-    logger.info(f"Available services: {available_services}")
-
-    if service_name not in available_services:
-        logger.debug(f"{Fore.RED}Invalid AWS service: {service_name}{Style.RESET_ALL}")
+    if not aws_utils.service_catalog.has_service(service_name):
+        log_invalid(f"Invalid AWS service: {service_name}")
+        suggestions = aws_utils.service_catalog.suggest_services(service_name)
+        if suggestions:
+            hint = f"Did you mean: {', '.join(suggestions)}"
+        else:
+            hint = f"Available services: {str(get_available_services())}"
         return {
             "status": "error",
             "content": [
-                {"text": f"Invalid AWS service: {service_name}\nAvailable services: {str(available_services)}"}
+                {"text": f"Invalid AWS service: {service_name}\n{hint}"}
             ],
         }
 
     # Check AWS operation
-    available_operations = get_available_operations(service_name)
-    if operation_name not in available_operations:
-        logger.debug(f"{Fore.RED}Invalid AWS operation: {operation_name}{Style.RESET_ALL}")
+    resolved = aws_utils.service_catalog.resolve_operation(service_name, operation_name)
+    if resolved is None:
+        # Methods boto3 adds to clients, such as generate_presigned_url or s3 upload_file
+        client_method = aws_utils.resolve_client_method(service_name, operation_name)
+        if client_method is not None:
+            resolved = (client_method, None)
+    if resolved is None:
+        log_invalid(f"Invalid AWS operation: {operation_name}")
+        suggestions = aws_utils.service_catalog.suggest_operations(service_name, operation_name)
+        if suggestions:
+            hint = f"Did you mean: {', '.join(suggestions)}"
+        else:
+            hint = f"Available operations:\n{get_available_operations(service_name)}"
         return {
             "status": "error",
             "content": [
-                {"text": f"Invalid AWS operation: {operation_name}, Available operations:\n{available_operations}\n"}
+                {"text": f"Invalid AWS operation: {operation_name}, {hint}\n"}
             ],
         }
+    operation_name = resolved[0]
 
+    # Check required parameters
+    missing = [
+        name for name in aws_utils.service_catalog.required_parameters(service_name, operation_name)
+        if name not in parameters
+    ]
+    if missing:
+        ex = ParamValidationError(report=f"Missing required parameters: {', '.join(missing)}")
+        return handle_aws_exception(ex, service_name, operation_name)
+
+    # Check JMESPath query
+    if query:
+        try:
+            aws_utils.compile_query(query)
+        except JMESPathError as e:
+            return {
+                "status": "error",
+                "content": [{"text": f"Invalid query: {query}\n{str(e)}"}],
+            }
+
+    if sharded_list is not None and (service_name, operation_name) != ("s3", "list_objects_v2"):
+        return {
+            "status": "error",
+            "content": [{"text": "sharded_list applies to s3 list_objects_v2"}],
+        }
+    if parallel_scan is not None and (service_name, operation_name) != ("dynamodb", "scan"):
+        return {
+            "status": "error",
+            "content": [{"text": "parallel_scan applies to dynamodb scan"}],
+        }
+    if watch is not None:
+        if not aws_utils.is_read_only_operation(operation_name):
+            return {
+                "status": "error",
+                "content": [{"text": "watch applies to read-only operations (describe, list, get, ...)"}],
+            }
+        if paginate or any(spec is not None for spec in (aggregate, log_patterns, sharded_list, parallel_scan)):
+            return {
+                "status": "error",
+                "content": [{"text": "watch cannot be combined with paginate, aggregate, log_patterns, sharded_list or parallel_scan"}],
+            }
+
+    if aggregate is not None:
+        try:
+            aggregator = Aggregator(aggregate)
+        except (ValueError, JMESPathError) as e:
+            return {
+                "status": "error",
+                "content": [{"text": f"Invalid aggregate: {json.dumps(aggregate, default=str)}\n{str(e)}"}],
+            }
+        if sharded_list is not None:
+            return await list_s3_sharded(
+                parameters, region, profile_name, sharded_list, aggregator, max_items, role_arn, ctx
+            )
+        if parallel_scan is not None:
+            return await scan_dynamodb_parallel(
+                parameters, region, profile_name, parallel_scan, aggregator, max_items, None, prune, role_arn, ctx
+            )
+        return await aggregate_aws_operation(
+            service_name, operation_name, parameters, region, profile_name, aggregator, max_items, role_arn, ctx
+        )
+
+    if sharded_list is not None:
+        return await list_s3_sharded(parameters, region, profile_name, sharded_list, None, max_items, role_arn, ctx)
+
+    if parallel_scan is not None:
+        return await scan_dynamodb_parallel(
+            parameters, region, profile_name, parallel_scan, None, max_items, query, prune, role_arn, ctx
+        )
+
+    if log_patterns is not None:
+        if not LogPatternMiner.supports(service_name, operation_name):
+            return {
+                "status": "error",
+                "content": [{"text": "log_patterns applies to logs filter_log_events and get_log_events"}],
+            }
+        try:
+            miner = LogPatternMiner(log_patterns)
+        except (ValueError, TypeError) as e:
+            return {
+                "status": "error",
+                "content": [{"text": f"Invalid log_patterns: {json.dumps(log_patterns, default=str)}\n{str(e)}"}],
+            }
+        return await aggregate_aws_operation(
+            service_name, operation_name, parameters, region, profile_name, miner, max_items, role_arn, ctx
+        )
+
+    if watch is not None:
+        return await watch_aws_operation(
+            service_name, operation_name, parameters, region, profile_name, query, prune, role_arn,
+            metric_points, raw_metrics, watch, ctx
+        )
+
+    if paginate:
+        return await paginate_aws_operation(
+            service_name, operation_name, parameters, region, profile_name, max_items, max_bytes, query, prune,
+            use_cache, role_arn, ctx
+        )
+
+    return await aws_executor.run(
+        service_name, region, call_aws_operation,
+        service_name, operation_name, parameters, region, profile_name, query, prune, use_cache, role_arn,
+        metric_points, raw_metrics
+    )
+
+@mcp.tool()
+async def use_aws_batch(
+    operations: List[Dict[str, Any]],
+    label: str = "AWS Batch Operation",
+    profile_name: Optional[str] = None,
+    timeout: Optional[float] = None,
+    ctx: Context = None
+) -> CallToolResult:
+    """
+    Execute several independent AWS operations concurrently in a single call.
+
+    Use this instead of several use_aws calls in a row when the operations do not depend on
+    each other, e.g. describing instances, security groups and alarms while troubleshooting.
+    Each operation is validated, executed and serialized exactly like use_aws.
+
+    Args:
+        operations: List of operations, each a dictionary with:
+            - service_name: AWS service name (e.g., 'ec2')
+            - operation_name: Operation in snake_case (e.g., 'describe_instances')
+            - parameters: Dictionary of parameters for the operation (default: {})
+            - region: Optional AWS region
+            - query: Optional JMESPath expression applied to the response
+            - prune: Optional, drop ResponseMetadata and null or empty fields (default: True)
+            "service" and "operation" are accepted as short names.
+        label: Human-readable description of the batch
+        profile_name: Optional AWS profile name for credentials
+        timeout: Overall deadline in seconds. Operations that have not finished by then are
+            reported with status 'timeout' and the finished ones are returned.
+
+    Returns:
+        CallToolResult with:
+        - content: one text block per operation, in the order of the request, and a summary
+        - structuredContent: status and a list of items with index, service_name,
+          operation_name, region, status ('success', 'error' or 'timeout') and result or error
+
+    Notes:
+        - At most USE_AWS_BATCH_MAX_ITEMS (default: 20) operations per call
+        - At most USE_AWS_BATCH_CONCURRENCY (default: 8) operations of a batch run at once,
+          on the same bounded thread pool as use_aws
+    """
+    result = await run_use_aws_batch(operations, label, profile_name, timeout, ctx)
+    return to_call_tool_result(result)
+
+async def run_use_aws_batch(
+    operations: List[Dict[str, Any]],
+    label: str = "AWS Batch Operation",
+    profile_name: Optional[str] = None,
+    timeout: Optional[float] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Run the operations of a use_aws_batch request concurrently. See use_aws_batch for the arguments.
+
+    Returns:
+        ToolResult dictionary with status, content and structuredContent
+    """
+    if not operations:
+        return {"status": "error", "content": [{"text": "No operations given"}]}
+    if len(operations) > BATCH_MAX_ITEMS:
+        return {
+            "status": "error",
+            "content": [{"text": f"Too many operations: {len(operations)}, the limit is {BATCH_MAX_ITEMS}"}],
+        }
+    if timeout is None or timeout <= 0:
+        timeout = BATCH_TIMEOUT
+
+    operations = [operation if isinstance(operation, dict) else {} for operation in operations]
+    items = []
+    for index, operation in enumerate(operations):
+        items.append({
+            "index": index,
+            "service_name": operation.get("service_name", operation.get("service")),
+            "operation_name": operation.get("operation_name", operation.get("operation")),
+            "region": operation.get("region") or aws_region,
+        })
+
+    # dynamodb get_item operations of the same region are coalesced into batch_get_item requests
+    coalesced: Dict[str, List[int]] = {}
+    for item, operation in zip(items, operations):
+        if is_coalescible_get_item(item["service_name"], item["operation_name"], operation.get("parameters")):
+            coalesced.setdefault(item["region"], []).append(item["index"])
+    coalesced = {region: indexes for region, indexes in coalesced.items() if len(indexes) > 1}
+    batches: Dict[str, asyncio.Future] = {}
+
+    async def run_coalesced(item: Dict[str, Any]) -> Dict[str, Any]:
+        region, operation = item["region"], operations[item["index"]]
+        indexes = coalesced[region]
+        if region not in batches:
+            requests = [operations[index]["parameters"] for index in indexes]
+            batches[region] = asyncio.ensure_future(
+                aws_executor.run("dynamodb", region, get_items_batched, requests, region, profile_name)
+            )
+        try:
+            # Shielded so that the batch outlives the cancellation of one of its items
+            response = (await asyncio.shield(batches[region]))[indexes.index(item["index"])]
+        except Exception as ex:
+            return handle_aws_exception(ex, "dynamodb", "get_item")
+        if "Error" in response:
+            return {"status": "error", "content": [{"text": response["Error"]}]}
+        query, prune = operation.get("query"), operation.get("prune", True)
+        shaped, text, sizes = aws_utils.encode_response(response, query, prune)
+        return {
+            "status": "success",
+            "content": [{"text": text}],
+            "structuredContent": structured_result(shaped, sizes, query, prune),
+        }
+
+    async def run_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        operation = operations[item["index"]]
+        if item["index"] in coalesced.get(item["region"], ()):
+            return await run_coalesced(item)
+        if not item["service_name"] or not item["operation_name"]:
+            return {"status": "error", "content": [{"text": "service_name and operation_name are required"}]}
+        return await run_use_aws(
+            item["service_name"], item["operation_name"], operation.get("parameters") or {},
+            item["region"], f"{label} #{item['index']}", profile_name,
+            query=operation.get("query"), prune=operation.get("prune", True),
+        )
+
+    texts, summary = await gather_use_aws(items, run_item, BATCH_CONCURRENCY, timeout)
+    if coalesced:
+        summary["coalesced_get_items"] = sum(len(indexes) for indexes in coalesced.values())
+    logger.info(f"Batch summary: {summary}")
+
+    content = [
+        {"text": f"#{item['index']} {item['service_name']}.{item['operation_name']} ({item['region']}): {item['status']}\n{text}"}
+        for item, text in zip(items, texts)
+    ]
+    content.append({"text": f"Batch summary: {json.dumps(summary)}"})
+
+    return {
+        "status": "success",
+        "content": content,
+        "structuredContent": {"status": "success", "items": items, "summary": summary},
+    }
+
+@mcp.tool()
+async def use_aws_inventory(
+    action: str = "query",
+    types: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    fields: Optional[List[str]] = None,
+    sql: Optional[str] = None,
+    limit: Optional[int] = None,
+    regions: Optional[List[str]] = None,
+    accounts: Optional[List[str]] = None,
+    refresh: bool = True,
+    force: bool = False,
+    profile_name: Optional[str] = None,
+    ctx: Context = None
+) -> CallToolResult:
+    """
+    Answer inventory questions ("which instances lack an Owner tag", "buckets per region")
+    from a local SQLite index of AWS resources instead of many live describe/list calls.
+
+    Resources are crawled per type, account and region, concurrently and with the same
+    credentials as use_aws, and re-crawled only when older than the TTL of their type
+    (e.g. 5 minutes for ec2:instance, 1 hour for iam:role). Queries take milliseconds.
+
+    Args:
+        action: One of
+            - "query": resources of the types matching the filters (default)
+            - "sql": a read-only SQL statement on the index
+            - "refresh": crawl the stale targets of the types and return the crawl summary
+            - "status": resource types with their TTL, and the age of every crawled target
+        types: Resource types, e.g. ["ec2:instance", "s3:bucket"]. Defaults to every type;
+            "status" lists them (ec2:instance, ec2:security_group, ec2:vpc, ec2:subnet,
+            ec2:volume, s3:bucket, lambda:function, rds:db_instance, dynamodb:table,
+            ecs:cluster, eks:cluster, elbv2:load_balancer, cloudformation:stack, sns:topic,
+            sqs:queue, iam:role, iam:user, ...)
+        filters: For "query", conditions combined with AND: account, region, id or name;
+            "tag:<Key>" (true: tag exists, false: tag missing, or its value); or a dotted
+            path in the resource such as "State.Name". A value matches with =, a list with
+            IN, null with IS NULL, and an object applies operators (=, !=, >, >=, <, <=,
+            like), e.g. {"State.Name": "running", "tag:Owner": false, "name": {"like": "prod-%"}}
+        fields: For "query", JMESPath expressions returned per resource instead of the whole
+            resource, e.g. ["InstanceType", "Tags[?Key=='Owner'].Value | [0]"]
+        sql: For "sql", one SELECT statement on the tables
+            resources(type, account, region, id, name, data, updated), where data is the
+            resource in JSON (use json_extract(data, '$.State.Name') and json_each), and
+            crawls(type, account, region, crawled, count, elapsed_ms)
+        limit: Maximum number of rows returned (default: 100)
+        regions: Regions crawled (default: USE_AWS_INVENTORY_REGIONS or the default region).
+            ["*"] means every region of each service. For "query", rows are limited to these
+            regions and global resources.
+        accounts: Accounts crawled, account ids or role ARNs as for use_aws (default:
+            USE_AWS_INVENTORY_ACCOUNTS or the current credentials)
+        refresh: For "query", crawl the stale targets of the types first (default: True).
+            Set to False to answer from the index as it is.
+        force: Crawl every target of the types regardless of its TTL (default: False)
+        profile_name: Optional AWS profile name for credentials
+
+    Returns:
+        CallToolResult with the rows (or columns and rows for "sql"), the number of matching
+        resources, and a summary of the targets crawled by this call
+    """
+    result = await run_use_aws_inventory(
+        action, types, filters, fields, sql, limit, regions, accounts, refresh, force, profile_name, ctx
+    )
+    return to_call_tool_result(result)
+
+async def run_use_aws_inventory(
+    action: str = "query",
+    types: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    fields: Optional[List[str]] = None,
+    sql: Optional[str] = None,
+    limit: Optional[int] = None,
+    regions: Optional[List[str]] = None,
+    accounts: Optional[List[str]] = None,
+    refresh: bool = True,
+    force: bool = False,
+    profile_name: Optional[str] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Run a use_aws_inventory request. See use_aws_inventory for the arguments.
+
+    Returns:
+        ToolResult dictionary with status, content and structuredContent
+    """
+    if action not in ("query", "sql", "refresh", "status"):
+        return {"status": "error", "content": [{"text": f"Invalid action: {action}, use query, sql, refresh or status"}]}
+    try:
+        if action == "status":
+            result = await asyncio.to_thread(inventory.status)
+        elif action == "sql":
+            if not sql:
+                return {"status": "error", "content": [{"text": "sql is required for action sql"}]}
+            result = await asyncio.to_thread(inventory.sql, sql, limit)
+        else:
+            types = inventory.check_types(types)
+            try:
+                role_arns = [aws_utils.resolve_role_arn(account) for account in accounts or INVENTORY_ACCOUNTS] or [None]
+            except ValueError:
+                return {"status": "error", "content": [{"text": f"Invalid accounts: {accounts or INVENTORY_ACCOUNTS}"}]}
+            crawled = None
+            if refresh or force or action == "refresh":
+                crawled = await crawl_inventory(types, regions, role_arns, profile_name, force, ctx)
+            if action == "refresh":
+                result = crawled
+            else:
+                filters = dict(filters or {})
+                if regions and "*" not in regions and "region" not in filters:
+                    filters["region"] = list(regions) + [GLOBAL_REGION]
+                if accounts and "account" not in filters:
+                    filters["account"] = [inventory_account(role_arn, profile_name) for role_arn in role_arns]
+                result = await asyncio.to_thread(inventory.query, types, filters, fields, limit)
+                if crawled is not None:
+                    result["crawled"] = crawled["summary"]
+    except (ValueError, JMESPathError) as ex:
+        return {"status": "error", "content": [{"text": f"Invalid inventory request: {str(ex)}"}]}
+    except sqlite3.Error as ex:
+        return {"status": "error", "content": [{"text": f"SQL error: {str(ex)}"}]}
+
+    text = aws_utils.encode_json(result)
+    return {
+        "status": "success",
+        "content": [{"text": text}],
+        "structuredContent": {"status": "success", "result": json.loads(text)},
+    }
+
+def inventory_account(role_arn: Optional[str], profile_name: Optional[str]) -> str:
+    """Return the account label of inventory rows: the account of the role, or the profile."""
+    return aws_utils.account_of(role_arn) or profile_name or "default"
+
+async def crawl_inventory(
+    types: List[str],
+    regions: Optional[List[str]],
+    role_arns: List[Optional[str]],
+    profile_name: Optional[str],
+    force: bool = False,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Crawl the stale (or, with force, all) inventory targets of some types concurrently.
+
+    Each target runs on the executor under the concurrency limit of its service, like a
+    fan-out of use_aws, and the crawl as a whole is bounded by USE_AWS_BATCH_TIMEOUT.
+
+    Returns:
+        Dictionary with the crawled targets and a summary of their statuses
+    """
+    regions = regions or INVENTORY_REGIONS or [aws_region]
+    targets = []
+    for role_arn in role_arns:
+        account = inventory_account(role_arn, profile_name)
+        for type_name in types:
+            service_name = inventory.types[type_name]["service"]
+            for target in inventory.targets([type_name], aws_utils.expand_regions(service_name, regions), [account]):
+                targets.append((target, role_arn))
+    stale = set(await asyncio.to_thread(inventory.stale, [target for target, _ in targets]))
+    up_to_date = 0 if force else len(targets) - len(stale)
+    targets = [(target, role_arn) for target, role_arn in targets if force or target in stale]
+
+    items = [
+        {
+            "index": index, "type": type_name, "account": account, "region": region,
+            "service_name": inventory.types[type_name]["service"],
+            "operation_name": inventory.types[type_name]["operation"],
+        }
+        for index, ((type_name, account, region), _) in enumerate(targets)
+    ]
+
+    async def run_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        (type_name, account, region), role_arn = targets[item["index"]]
+        service_name = item["service_name"]
+        client_region = aws_region if region == GLOBAL_REGION else region
+        client = await aws_executor.run(
+            service_name, client_region, get_boto3_client, service_name, client_region, profile_name, role_arn
+        )
+        result = await aws_executor.run(service_name, client_region, inventory.crawl, client, type_name, account, region)
+        await report_page_progress(
+            ctx, item["index"] + 1, len(items), f"{type_name} {account}/{region}: {result['resources']} resources"
+        )
+        return {"status": "success", "content": [{"text": json.dumps(result)}], "structuredContent": {"result": result}}
+
+    texts, summary = await gather_use_aws(items, run_item, FANOUT_CONCURRENCY, BATCH_TIMEOUT)
+    summary["up_to_date"] = up_to_date
+    logger.info(f"Inventory crawl summary: {summary}")
+    crawled = [
+        {key: item[key] for key in ("type", "account", "region", "status", "result", "error") if key in item}
+        for item in items
+    ]
+    return {"crawled": crawled, "summary": summary}
+
+def is_coalescible_get_item(service_name: Optional[str], operation_name: Optional[str], parameters: Any) -> bool:
+    """Check whether a batch operation is a dynamodb get_item that batch_get_item can serve."""
+    if service_name != "dynamodb" or not operation_name or not isinstance(parameters, dict):
+        return False
+    resolved = aws_utils.service_catalog.resolve_operation(service_name, operation_name)
+    if resolved is None or resolved[0] != "get_item":
+        return False
+    # Other options (ReturnConsumedCapacity, legacy AttributesToGet) keep their own get_item call
+    allowed = {"TableName", "Key", "ConsistentRead", "ProjectionExpression", "ExpressionAttributeNames"}
+    return (
+        isinstance(parameters.get("TableName"), str)
+        and isinstance(parameters.get("Key"), dict)
+        and bool(parameters["Key"])
+        and set(parameters) <= allowed
+    )
+
+def get_items_batched(requests: List[Dict[str, Any]], region: str, profile_name: Optional[str]) -> List[Dict[str, Any]]:
+    """Run get_item requests as batch_get_item requests. Blocks, see aws_dynamodb.get_items_batched."""
+    client = get_boto3_client("dynamodb", region, profile_name)
+    return aws_dynamodb.get_items_batched(client, requests)
+
+async def run_use_aws_fanout(
+    service_name: str,
+    operation_name: str,
+    parameters: Dict[str, Any],
+    regions: List[str],
+    accounts: Optional[List[str]] = None,
+    label: str = "AWS Operation Details",
+    profile_name: Optional[str] = None,
+    paginate: bool = False,
+    max_items: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    query: Optional[str] = None,
+    prune: bool = True,
+    use_cache: bool = True,
+    aggregate: Optional[Dict[str, Any]] = None,
+    metric_points: Optional[int] = None,
+    raw_metrics: bool = False,
+    log_patterns: Optional[Dict[str, Any]] = None,
+    sharded_list: Optional[Dict[str, Any]] = None,
+    parallel_scan: Optional[Dict[str, Any]] = None,
+    watch: Optional[Dict[str, Any]] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Run a use_aws request in every combination of regions and accounts concurrently and merge
+    the results. See use_aws for the arguments.
+
+    Returns:
+        ToolResult dictionary with status, content and structuredContent
+    """
+    # Invalid names fail the same way everywhere, so report them once
+    if (not aws_utils.service_catalog.has_service(service_name)
+            or (aws_utils.service_catalog.resolve_operation(service_name, operation_name) is None
+                and aws_utils.resolve_client_method(service_name, operation_name) is None)):
+        return await run_use_aws(service_name, operation_name, parameters, aws_region, label, profile_name)
+
+    try:
+        role_arns = [aws_utils.resolve_role_arn(account) for account in accounts] if accounts else [None]
+    except ValueError:
+        return {"status": "error", "content": [{"text": f"Invalid accounts: {accounts}"}]}
+    regions = aws_utils.expand_regions(service_name, regions)
+    targets = [(role_arn, region) for role_arn in role_arns for region in regions]
+    if len(targets) > FANOUT_MAX_TARGETS:
+        return {
+            "status": "error",
+            "content": [{"text": f"Too many targets: {len(targets)} accounts x regions, the limit is {FANOUT_MAX_TARGETS}"}],
+        }
+
+    items = [
+        {"index": index, "account": aws_utils.account_of(role_arn), "region": region}
+        for index, (role_arn, region) in enumerate(targets)
+    ]
+
+    async def run_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        role_arn, region = targets[item["index"]]
+        return await run_use_aws(
+            service_name, operation_name, parameters, region, label, profile_name,
+            paginate, max_items, max_bytes, query, prune, use_cache, role_arn, aggregate,
+            metric_points, raw_metrics, log_patterns, sharded_list, parallel_scan, watch,
+        )
+
+    texts, summary = await gather_use_aws(items, run_item, FANOUT_CONCURRENCY, BATCH_TIMEOUT)
+    logger.info(f"Fan-out summary: {summary}")
+
+    # Merge list results into one list tagged with the region and account of each entry
+    results = [item for item in items if item["status"] == "success"]
+    merged = None
+    if results and all(isinstance(item.get("result"), list) for item in results):
+        merged = [
+            {**entry, "_region": item["region"], "_account": item["account"]} if isinstance(entry, dict) else entry
+            for item in results
+            for entry in item["result"]
+        ]
+        summary["merged"] = len(merged)
+
+    content = []
+    if merged is not None:
+        content.append({"text": aws_utils.encode_json(merged)})
+    for item, text in zip(items, texts):
+        if merged is None or item["status"] != "success":
+            target = f"{item['account']}/{item['region']}" if item["account"] else item["region"]
+            content.append({"text": f"[{target}] {item['status']}\n{text}"})
+    content.append({"text": f"Fan-out summary: {json.dumps(summary)}"})
+
+    structured = {"status": "success", "items": items, "summary": summary}
+    if merged is not None:
+        structured["merged"] = merged
+    return {"status": "success", "content": content, "structuredContent": structured}
+
+async def gather_use_aws(
+    items: List[Dict[str, Any]],
+    run_item: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+    timeout: float
+) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Run one ToolResult coroutine per item concurrently until the deadline.
+
+    Each item gets a status ('success', 'error' or 'timeout') and its decoded result or error
+    message. Items that have not finished by the deadline are cancelled, and the finished ones
+    are kept, so a slow target does not hold back the others.
+
+    Args:
+        items: Item dictionaries, updated in place
+        run_item: Coroutine function returning the ToolResult of an item
+        concurrency: Maximum number of items running at once
+        timeout: Overall deadline in seconds
+
+    Returns:
+        Tuple of the content text of each item and a summary of the statuses
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_bounded(item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_item(item)
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(run_bounded(item)) for item in items]
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    elapsed = time.perf_counter() - start
+
+    texts = []
+    for item, task in zip(items, tasks):
+        if task in pending:
+            result = {"status": "timeout", "content": [{"text": f"Not finished within {timeout} seconds"}]}
+        elif task.exception() is not None:
+            result = handle_aws_exception(task.exception(), item.get("service_name") or "", item.get("operation_name") or "")
+        else:
+            result = task.result()
+        text = "\n".join(block["text"] for block in result["content"])
+        item["status"] = result["status"]
+        if result["status"] == "success":
+            item["result"] = result.get("structuredContent", {}).get("result")
+        else:
+            item["error"] = text
+        texts.append(text)
+
+    summary = {
+        "total": len(items),
+        "success": sum(1 for item in items if item["status"] == "success"),
+        "error": sum(1 for item in items if item["status"] == "error"),
+        "timeout": sum(1 for item in items if item["status"] == "timeout"),
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+    return texts, summary
+
+def structured_result(shaped: Any, sizes: Dict[str, int], query: Optional[str], prune: bool) -> Dict[str, Any]:
+    """Return the structuredContent of a shaped response, with its sizes when a query or pruning shaped it."""
+    structured = {"status": "success", "result": shaped}
+    if query or prune:
+        structured.update(bytes_before=sizes["bytes_before"], bytes_after=sizes["bytes_after"])
+    return structured
+
+def call_aws_operation(
+    service_name: str,
+    operation_name: str,
+    parameters: Dict[str, Any],
+    region: str,
+    profile_name: Optional[str] = None,
+    query: Optional[str] = None,
+    prune: bool = True,
+    use_cache: bool = True,
+    role_arn: Optional[str] = None,
+    metric_points: Optional[int] = None,
+    raw_metrics: bool = False
+) -> Dict[str, Any]:
+    """
+    Execute a validated AWS operation and encode the result as compact JSON. This blocks,
+    so use_aws runs it in the thread pool of aws_executor.
+
+    Args:
+        service_name: AWS service name (e.g., 's3', 'ec2', 'dynamodb')
+        operation_name: Operation to perform in snake_case (e.g., 'list_buckets')
+        parameters: Dictionary of parameters for the operation
+        region: AWS region (e.g., 'us-west-2')
+        profile_name: Optional AWS profile name for credentials
+        query: Optional JMESPath expression applied to the response
+        prune: Drop ResponseMetadata and null or empty fields
+        use_cache: Serve read-only operations from response_cache
+        role_arn: Optional IAM role to assume with the profile's credentials
+        metric_points: Points kept per compacted CloudWatch metric series
+        raw_metrics: Skip the compaction of CloudWatch metric series
+
+    Returns:
+        ToolResult dictionary with status and content
+    """
     # Set up the boto3 client
-    client = get_boto3_client(service_name, region, profile_name)
+    client = get_boto3_client(service_name, region, profile_name, role_arn)
     operation_method = getattr(client, operation_name)
 
+    cache_key = None
+    if use_cache and aws_utils.is_cacheable_operation(service_name, operation_name):
+        identity = aws_utils.client_registry.get_identity(profile_name, role_arn)
+        # Without the caller identity a key could be shared with another account, so the cache is skipped
+        if identity is not None:
+            cache_key = response_cache.make_key(service_name, operation_name, parameters, region, identity)
+
+    # Metric series are compacted before they are cached, so the key carries the number of points
+    compact = (
+        not raw_metrics
+        and metric_compaction is not None
+        and metric_compaction.can_compact(service_name, operation_name)
+    )
+    if compact and cache_key:
+        cache_key += (metric_points or metric_compaction.METRIC_POINTS,)
+
     try:
-        response = operation_method(**parameters)
-        response = handle_streaming_body(response)
-        response = aws_utils.convert_datetime_to_str(response)
+        response = response_cache.get(cache_key) if cache_key else None
+        cached = response is not None
+        if not cached:
+            if (service_name, operation_name) == ("dynamodb", "batch_get_item"):
+                # Chunks of 100 keys, retrying UnprocessedKeys
+                response = aws_dynamodb.batch_get_items(client, **parameters)
+            else:
+                response = operation_method(**parameters)
+            response = aws_utils.handle_streaming_body(response, parameters)
+            if compact:
+                response = metric_compaction.compact_response(operation_name, response, metric_points)
+        shaped, text, sizes = aws_utils.encode_response(response, query, prune)
+        if cache_key and not cached:
+            response_cache.put(cache_key, response, sizes["bytes_before"])
+        logger.info(f"Response size: {sizes['bytes_before']} -> {sizes['bytes_after']} bytes (cached: {cached})")
 
         return {
             "status": "success",
-            "content": [{"text": f"Success: {str(response)}"}],
+            "content": [{"text": text}],
+            "structuredContent": structured_result(shaped, sizes, query, prune),
         }
-    except (ValidationError, ParamValidationError) as val_ex:
+    except Exception as ex:
+        return handle_aws_exception(ex, service_name, operation_name)
+    finally:
+        if aws_utils.is_mutative_operation(operation_name):
+            response_cache.invalidate(service_name, region)
+
+def handle_aws_exception(ex: Exception, service_name: str, operation_name: str) -> Dict[str, Any]:
+    """
+    Convert an exception of an AWS call into an error ToolResult. Validation errors
+    include the expected input schema of the operation.
+
+    Args:
+        ex: Exception raised by the AWS call
+        service_name: AWS service name
+        operation_name: Operation in snake_case
+
+    Returns:
+        ToolResult dictionary with status 'error'
+    """
+    if isinstance(ex, (ValidationError, ParamValidationError)):
         # Handle validation errors with schema
         try:
             schema = aws_utils.generate_input_schema(service_name, operation_name)
@@ -337,7 +1145,7 @@ def use_aws(
             return {
                 "status": "error",
                 "content": [
-                    {"text": f"Validation error: {str(val_ex)}"},
+                    {"text": f"Validation error: {str(ex)}"},
                     {"text": f"Expected input schema for {operation_name}:"},
                     {"text": json.dumps(schema, indent=2)},
                 ],
@@ -346,15 +1154,404 @@ def use_aws(
             logger.error(f"Failed to generate schema: {str(schema_ex)}")
             return {
                 "status": "error",
-                "content": [{"text": f"Validation error: {str(val_ex)}"}],
+                "content": [{"text": f"Validation error: {str(ex)}"}],
             }
+
+    logger.warning(f"AWS call threw exception: {type(ex).__name__}")
+    return {
+        "status": "error",
+        "content": [{"text": f"AWS call threw exception: {str(ex)}"}],
+    }
+
+async def report_page_progress(ctx: Optional[Context], progress: int, total: Optional[int], message: str) -> None:
+    """Send a page as a progress notification. Progress is best effort and never fails the call."""
+    if ctx is None:
+        return
+    try:
+        await ctx.report_progress(progress, total, message)
+    except Exception as e:
+        logger.debug(f"Failed to report progress: {str(e)}")
+
+async def paginate_aws_operation(
+    service_name: str,
+    operation_name: str,
+    parameters: Dict[str, Any],
+    region: str,
+    profile_name: Optional[str],
+    max_items: Optional[int],
+    max_bytes: Optional[int],
+    query: Optional[str] = None,
+    prune: bool = True,
+    use_cache: bool = True,
+    role_arn: Optional[str] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Fetch the pages of an operation with a botocore paginator.
+
+    Pages are fetched one at a time on the executor and serialized right away, so only
+    the current page is held as Python objects. Each page is reported as a progress
+    notification while fetching continues. Fetching stops early at max_items (exact,
+    using PaginationConfig.MaxItems) or once max_bytes of serialized pages are collected.
+
+    Args:
+        service_name: AWS service name (e.g., 's3', 'ec2', 'dynamodb')
+        operation_name: Operation to perform in snake_case (e.g., 'list_objects_v2')
+        parameters: Dictionary of parameters for the operation
+        region: AWS region (e.g., 'us-west-2')
+        profile_name: Optional AWS profile name for credentials
+        max_items: Optional maximum number of items
+        max_bytes: Optional maximum number of serialized bytes
+        query: Optional JMESPath expression applied to each page
+        prune: Drop ResponseMetadata and null or empty fields from each page
+        use_cache: Use the response cache when the operation cannot be paginated and is called once
+        role_arn: Optional IAM role to assume with the profile's credentials
+        ctx: MCP request context used for progress notifications
+
+    Returns:
+        ToolResult dictionary with one content block per page and a summary block
+    """
+    max_bytes = min(max_bytes or PAGINATE_MAX_BYTES, PAGINATE_MAX_BYTES)
+
+    client = await aws_executor.run(service_name, region, get_boto3_client, service_name, region, profile_name, role_arn)
+    if not client.can_paginate(operation_name):
+        logger.info(f"{service_name}.{operation_name} cannot be paginated, calling it once")
+        return await aws_executor.run(
+            service_name, region, call_aws_operation,
+            service_name, operation_name, parameters, region, profile_name, query, prune, use_cache, role_arn
+        )
+
+    parameters = dict(parameters)
+    if max_items:
+        parameters["PaginationConfig"] = {**parameters.get("PaginationConfig", {}), "MaxItems": max_items}
+
+    content = []
+    item_count = byte_count = 0
+    truncated = None
+    try:
+        page_iterator = client.get_paginator(operation_name).paginate(**parameters)
+        pages = iter(page_iterator)
+        while True:
+            page = await aws_executor.run(service_name, region, next, pages, None)
+            if page is None:
+                break
+
+            page_items = sum(len(key.search(page) or []) for key in page_iterator.result_keys)
+            _, text, _ = aws_utils.encode_response(page, query, prune, structured=False)
+            del page
+
+            item_count += page_items
+            byte_count += len(text)
+            content.append({"text": text})
+            await report_page_progress(ctx, item_count, max_items, text)
+
+            if byte_count >= max_bytes:
+                truncated = "max_bytes"
+                break
     except Exception as ex:
-        logger.warning(f"AWS call threw exception: {type(ex).__name__}")
-        return {
-            "status": "error",
-            "content": [{"text": f"AWS call threw exception: {str(ex)}"}],
-        }
-    
+        return await aws_executor.run(service_name, region, handle_aws_exception, ex, service_name, operation_name)
+
+    summary = {"pages": len(content), "items": item_count, "bytes": byte_count, "truncated": truncated}
+    if truncated is None and page_iterator.resume_token:
+        summary["truncated"] = "max_items"
+        summary["resume"] = {"PaginationConfig": {"StartingToken": page_iterator.resume_token}}
+    elif truncated == "max_bytes":
+        summary["resume"] = "Continue with the next token of the last page"
+    content.append({"text": f"Pagination summary: {json.dumps(summary)}"})
+
+    return {
+        "status": "success",
+        "content": content,
+    }
+
+async def watch_aws_operation(
+    service_name: str,
+    operation_name: str,
+    parameters: Dict[str, Any],
+    region: str,
+    profile_name: Optional[str],
+    query: Optional[str],
+    prune: bool,
+    role_arn: Optional[str],
+    metric_points: Optional[int],
+    raw_metrics: bool,
+    spec: Dict[str, Any],
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Poll an operation and return the diff against the last snapshot of the same watch, see
+    StateWatch. Each poll bypasses the response cache. With a wait, polling
+    continues every interval until something changes or the wait expires, sending a progress
+    notification per poll; the event loop is free between polls.
+
+    Args:
+        service_name: AWS service name (e.g., 'ecs')
+        operation_name: Read-only operation in snake_case (e.g., 'describe_services')
+        parameters: Dictionary of parameters for the operation
+        region: AWS region (e.g., 'us-west-2')
+        profile_name: Optional AWS profile name for credentials
+        query: Optional JMESPath expression applied before the diff, part of the watch key
+        prune: Drop ResponseMetadata and null or empty fields
+        role_arn: Optional IAM role to assume with the profile's credentials
+        metric_points: Points kept per compacted CloudWatch metric series
+        raw_metrics: Skip the compaction of CloudWatch metric series
+        spec: watch spec
+        ctx: MCP request context used for progress notifications
+
+    Returns:
+        ToolResult dictionary with the full state on the first call, then the changes
+    """
+    identity = await aws_executor.run(
+        service_name, region, aws_utils.client_registry.get_identity, profile_name, role_arn
+    )
+    if identity is None:
+        # Snapshots are kept per account, so they cannot be keyed without the caller identity
+        return {"status": "error", "content": [{"text": "watch needs the caller identity, and sts get_caller_identity failed"}]}
+    key = response_cache.make_key(service_name, operation_name, parameters, region, identity)
+    try:
+        watch = StateWatch(key + (query, prune), spec)
+    except (ValueError, TypeError) as ex:
+        return {"status": "error", "content": [{"text": f"Invalid watch: {str(ex)}"}]}
+
+    start = time.monotonic()
+    polls = 0
+    while True:
+        result = await aws_executor.run(
+            service_name, region, call_aws_operation,
+            service_name, operation_name, parameters, region, profile_name, query, prune, False, role_arn,
+            metric_points, raw_metrics
+        )
+        polls += 1
+        if result["status"] != "success":
+            return result
+        observed = watch.observe(result["structuredContent"]["result"])
+        if observed is not None or time.monotonic() - start + watch.interval > watch.wait:
+            break
+        await report_page_progress(ctx, polls, None, f"Poll {polls}: no change")
+        await asyncio.sleep(watch.interval)
+
+    observed = observed or watch.unchanged()
+    observed["watch"].update(polls=polls, waited_ms=round((time.monotonic() - start) * 1000, 1))
+    logger.info(f"Watch of {service_name}.{operation_name}: {observed['watch']}")
+    text = aws_utils.encode_json(observed)
+    return {
+        "status": "success",
+        "content": [{"text": text}],
+        "structuredContent": {"status": "success", "result": json.loads(text)},
+    }
+
+async def aggregate_aws_operation(
+    service_name: str,
+    operation_name: str,
+    parameters: Dict[str, Any],
+    region: str,
+    profile_name: Optional[str],
+    aggregator: Any,
+    max_items: Optional[int] = None,
+    role_arn: Optional[str] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Stream the pages of an operation through an aggregator and return only the aggregate.
+    The aggregator is an Aggregator or an LogPatternMiner.
+
+    Pages are fetched one at a time on the executor and dropped once folded in, so memory
+    grows with the number of groups rather than the number of records. Operations that
+    cannot be paginated are called once.
+
+    Args:
+        service_name: AWS service name (e.g., 'ec2')
+        operation_name: Operation to perform in snake_case (e.g., 'describe_instances')
+        parameters: Dictionary of parameters for the operation
+        region: AWS region (e.g., 'us-west-2')
+        profile_name: Optional AWS profile name for credentials
+        aggregator: Aggregator built from the aggregate spec, or LogPatternMiner
+        max_items: Optional maximum number of records read
+        role_arn: Optional IAM role to assume with the profile's credentials
+        ctx: MCP request context used for progress notifications
+
+    Returns:
+        ToolResult dictionary with the aggregate table
+    """
+    try:
+        client = await aws_executor.run(service_name, region, get_boto3_client, service_name, region, profile_name, role_arn)
+        if not client.can_paginate(operation_name):
+            operation_method = getattr(client, operation_name)
+            page = await aws_executor.run(service_name, region, lambda: operation_method(**parameters))
+            # Without a paginator max_items cannot stop the call, so it caps the records folded in
+            aggregator.add_page(page, limit=max_items)
+        else:
+            parameters = dict(parameters)
+            if max_items:
+                parameters["PaginationConfig"] = {**parameters.get("PaginationConfig", {}), "MaxItems": max_items}
+            page_iterator = client.get_paginator(operation_name).paginate(**parameters)
+            pages = iter(page_iterator)
+            while True:
+                page = await aws_executor.run(service_name, region, next, pages, None)
+                if page is None:
+                    break
+                aggregator.add_page(page, page_iterator.result_keys)
+                del page
+                await report_page_progress(ctx, aggregator.records, max_items, f"{aggregator.records} records aggregated")
+    except ValueError as ex:
+        return {"status": "error", "content": [{"text": f"Invalid aggregate: {str(ex)}"}]}
+    except Exception as ex:
+        return await aws_executor.run(service_name, region, handle_aws_exception, ex, service_name, operation_name)
+
+    result = aggregator.result()
+    logger.info(f"Aggregated {result['records']} records of {result['pages']} pages into {result['groups']} groups")
+    text = aws_utils.encode_json(result)
+    return {
+        "status": "success",
+        "content": [{"text": text}],
+        "structuredContent": {"status": "success", "result": json.loads(text)},
+    }
+
+async def list_s3_sharded(
+    parameters: Dict[str, Any],
+    region: str,
+    profile_name: Optional[str],
+    spec: Dict[str, Any],
+    aggregator: Optional[Aggregator] = None,
+    max_items: Optional[int] = None,
+    role_arn: Optional[str] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    List a bucket with S3ShardedListing and return its summary or aggregate.
+
+    Levels and shards run on the executor, so they count against the s3 concurrency limit
+    of aws_executor (USE_AWS_SERVICE_CONCURRENCY_LIMITS, e.g. "s3=16") as well as the
+    concurrency of the spec. A progress notification is sent as each shard completes.
+
+    Args:
+        parameters: list_objects_v2 parameters, e.g. {"Bucket": "my-bucket", "Prefix": "logs/"}
+        region: AWS region (e.g., 'us-west-2')
+        profile_name: Optional AWS profile name for credentials
+        spec: sharded_list spec, see S3ShardedListing
+        aggregator: Optional Aggregator that replaces the default summary
+        max_items: Optional maximum number of objects read
+        role_arn: Optional IAM role to assume with the profile's credentials
+        ctx: MCP request context used for progress notifications
+
+    Returns:
+        ToolResult dictionary with the summary or aggregate table
+    """
+    start = time.perf_counter()
+    try:
+        client = await aws_executor.run("s3", region, get_boto3_client, "s3", region, profile_name, role_arn)
+        listing = S3ShardedListing(client, parameters, spec, aggregator, max_items)
+    except (ValueError, TypeError) as ex:
+        return {"status": "error", "content": [{"text": f"Invalid sharded_list: {str(ex)}"}]}
+
+    semaphore = asyncio.Semaphore(listing.concurrency)
+
+    async def run_bounded(func: Callable[[Any], Any], prefixes: Any) -> Any:
+        async with semaphore:
+            return await aws_executor.run("s3", region, func, prefixes)
+
+    try:
+        frontier = [listing.prefix]
+        while listing.expand(frontier):
+            levels = await asyncio.gather(*(run_bounded(listing.list_level, prefix) for prefix in frontier))
+            frontier = listing.advance(frontier, levels)
+        groups = listing.group(frontier)
+        for shard in asyncio.as_completed([run_bounded(listing.list_shard, prefixes) for prefixes in groups]):
+            await shard
+            records = listing.consumer.records
+            await report_page_progress(
+                ctx, records, max_items, f"{listing.listed_shards}/{len(groups)} shards, {records} objects"
+            )
+    except Exception as ex:
+        return await aws_executor.run("s3", region, handle_aws_exception, ex, "s3", "list_objects_v2")
+
+    result = listing.result(time.perf_counter() - start)
+    logger.info(f"Sharded listing: {result['records']} objects, {result['listing']}")
+    text = aws_utils.encode_json(result)
+    return {
+        "status": "success",
+        "content": [{"text": text}],
+        "structuredContent": {"status": "success", "result": json.loads(text)},
+    }
+
+async def scan_dynamodb_parallel(
+    parameters: Dict[str, Any],
+    region: str,
+    profile_name: Optional[str],
+    spec: Dict[str, Any],
+    aggregator: Optional[Aggregator] = None,
+    max_items: Optional[int] = None,
+    query: Optional[str] = None,
+    prune: bool = True,
+    role_arn: Optional[str] = None,
+    ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Scan a table with aws_dynamodb.DynamoDBParallelScan and return its items or aggregate.
+
+    Segments run on the executor, so they count against the dynamodb concurrency limit of
+    aws_executor (USE_AWS_SERVICE_CONCURRENCY_LIMITS, e.g. "dynamodb=16") as well as the
+    workers of the spec. A progress notification is sent as each segment completes.
+
+    Args:
+        parameters: scan parameters, e.g. {"TableName": "orders", "ProjectionExpression": "id, #s"}
+        region: AWS region (e.g., 'us-west-2')
+        profile_name: Optional AWS profile name for credentials
+        spec: parallel_scan spec, see aws_dynamodb.DynamoDBParallelScan
+        aggregator: Optional Aggregator that replaces the items
+        max_items: Optional maximum number of items read
+        query: Optional JMESPath expression applied to the result
+        prune: Drop null or empty fields from the result
+        role_arn: Optional IAM role to assume with the profile's credentials
+        ctx: MCP request context used for progress notifications
+
+    Returns:
+        ToolResult dictionary with the items or aggregate table and the scan statistics
+    """
+    start = time.perf_counter()
+    try:
+        client = await aws_executor.run(
+            "dynamodb", region, get_boto3_client, "dynamodb", region, profile_name, role_arn
+        )
+        scan = aws_dynamodb.DynamoDBParallelScan(client, parameters, spec, aggregator, max_items)
+    except (ValueError, TypeError) as ex:
+        return {"status": "error", "content": [{"text": f"Invalid parallel_scan: {str(ex)}"}]}
+
+    semaphore = asyncio.Semaphore(scan.workers)
+
+    async def scan_bounded(segment: int) -> None:
+        async with semaphore:
+            await aws_executor.run("dynamodb", region, scan.scan_segment, segment)
+
+    try:
+        await aws_executor.run("dynamodb", region, scan.configure_capacity)
+        for segment in asyncio.as_completed([scan_bounded(segment) for segment in range(scan.segments)]):
+            await segment
+            await report_page_progress(
+                ctx, scan.count, max_items,
+                f"{scan.scanned_segments}/{scan.segments} segments, {scan.count} items"
+            )
+    except Exception as ex:
+        return await aws_executor.run("dynamodb", region, handle_aws_exception, ex, "dynamodb", "scan")
+
+    result = scan.result(time.perf_counter() - start)
+    logger.info(f"Parallel scan: {scan.count} items, {result['scan']}")
+    shaped, text, sizes = aws_utils.encode_response(result, query, prune)
+    return {
+        "status": "success",
+        "content": [{"text": text}],
+        "structuredContent": structured_result(shaped, sizes, query, prune),
+    }
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> JSONResponse:
+    """Expose executor queue depth, wait time, response size savings and cache hit rate."""
+    return JSONResponse({
+        "executor": aws_executor.metrics(),
+        "responses": aws_utils.response_stats.snapshot(),
+        "cache": response_cache.stats(),
+    })
+
 if __name__ =="__main__":
     print(f"###### main ######")
     mcp.run(transport="streamable-http")     
\ No newline at end of file
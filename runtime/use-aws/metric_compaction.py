@@ -0,0 +1,209 @@
+"""
+metric_compaction.py compacts CloudWatch metric responses returned by use_aws.
+
+get_metric_data and get_metric_statistics can return tens of thousands of datapoints per
+series. Long series are replaced by a summary (min/max/mean/p50/p95/p99, trend slope),
+anomaly points and an LTTB (Largest-Triangle-Three-Buckets) downsampled series, computed
+with NumPy. Series that already fit in the requested number of points are kept as they are.
+
+Datapoints of a series are sorted by time and treated as evenly spaced, which holds for
+the fixed Period of CloudWatch. This avoids converting every timestamp to a number; only
+the timestamps of the returned points are looked up.
+
+Settings (environment variables):
+    USE_AWS_METRIC_POINTS: points kept per downsampled series (default: 100)
+    USE_AWS_METRIC_ANOMALY_Z: robust z-score above which a point is an anomaly (default: 3.5)
+    USE_AWS_METRIC_MAX_ANOMALIES: anomaly points returned per series (default: 10)
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+METRIC_POINTS = int(os.environ.get("USE_AWS_METRIC_POINTS", "100"))
+ANOMALY_Z = float(os.environ.get("USE_AWS_METRIC_ANOMALY_Z", "3.5"))
+MAX_ANOMALIES = int(os.environ.get("USE_AWS_METRIC_MAX_ANOMALIES", "10"))
+
+COMPACTED_OPERATIONS = {
+    ("cloudwatch", "get_metric_data"),
+    ("cloudwatch", "get_metric_statistics"),
+}
+
+# Statistics of a get_metric_statistics datapoint, in the order they are reported
+STATISTICS = ["Average", "Sum", "Minimum", "Maximum", "SampleCount"]
+
+
+def can_compact(service_name: str, operation_name: str) -> bool:
+    """Check whether the response of an operation holds metric series to compact."""
+    return (service_name, operation_name) in COMPACTED_OPERATIONS
+
+
+def lttb(values: np.ndarray, points: int) -> np.ndarray:
+    """
+    Select the indices of a Largest-Triangle-Three-Buckets downsampling of a series.
+
+    The first and last points are always kept. Each bucket in between contributes the point
+    that forms the largest triangle with the point selected in the previous bucket and the
+    average of the next bucket, so peaks and dips survive downsampling. Buckets are walked
+    in order, and the area computation within a bucket is vectorized.
+
+    Args:
+        values: Values of the series at evenly spaced positions
+        points: Number of points to keep
+
+    Returns:
+        Sorted indices of the selected points
+    """
+    n = len(values)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    bounds = np.append(edges, n)
+    lengths = np.diff(bounds)
+    averages = np.add.reduceat(values, edges) / lengths
+    centers = (bounds[:-1] + bounds[1:] - 1) / 2.0
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        # The last bucket in the middle looks ahead to the final point
+        avg_x, avg_y = centers[i + 1], averages[i + 1]
+        xs = np.arange(start, end)
+        area = np.abs((a - avg_x) * (values[start:end] - values[a]) - (a - xs) * (avg_y - values[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def summarize(timestamps: List[Any], values: np.ndarray, points: int) -> Dict[str, Any]:
+    """
+    Summarize a series sorted by time.
+
+    Args:
+        timestamps: Timestamps of the datapoints, ascending
+        values: Values of the datapoints
+        points: Number of points kept in the downsampled series
+
+    Returns:
+        Dictionary with Summary, Anomalies, and the downsampled Timestamps and Values
+    """
+    n = len(values)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    summary = {
+        "Points": n,
+        "Start": timestamps[0],
+        "End": timestamps[-1],
+        "Min": float(values.min()),
+        "Max": float(values.max()),
+        "Mean": float(values.mean()),
+        "P50": float(p50),
+        "P95": float(p95),
+        "P99": float(p99),
+    }
+
+    # Least-squares slope over the evenly spaced positions, scaled to the average spacing
+    if n > 1:
+        positions = np.arange(n, dtype=np.float64)
+        centered = positions - positions.mean()
+        slope = float(np.dot(centered, values - values.mean()) / np.dot(centered, centered))
+        spacing = (timestamps[-1] - timestamps[0]).total_seconds() / (n - 1)
+        summary["SlopePerHour"] = slope * 3600 / spacing if spacing else 0.0
+
+    # Robust z-score with the median absolute deviation, falling back to the standard deviation
+    deviation = np.abs(values - p50)
+    scale = float(np.median(deviation)) / 0.6745
+    if scale == 0:
+        scale = float(values.std())
+    anomalies = []
+    if scale > 0:
+        scores = deviation / scale
+        candidates = np.flatnonzero(scores > ANOMALY_Z)
+        summary["AnomalyCount"] = int(len(candidates))
+        if len(candidates) > MAX_ANOMALIES:
+            candidates = candidates[np.argsort(scores[candidates])[-MAX_ANOMALIES:]]
+        anomalies = [
+            {"Timestamp": timestamps[i], "Value": float(values[i]), "Score": round(float(scores[i]), 2)}
+            for i in np.sort(candidates)
+        ]
+
+    selected = lttb(values, points)
+    return {
+        "Summary": summary,
+        "Anomalies": anomalies,
+        "Timestamps": [timestamps[i] for i in selected],
+        "Values": values[selected].tolist(),
+    }
+
+
+def compact_metric_data(response: Dict[str, Any], points: int) -> Dict[str, Any]:
+    """Compact the MetricDataResults of a get_metric_data response."""
+    results = []
+    for result in response.get("MetricDataResults", []):
+        timestamps, values = result.get("Timestamps", []), result.get("Values", [])
+        if len(values) <= points:
+            results.append(result)
+            continue
+
+        # Results are ordered by ScanBy, descending by default
+        if timestamps[0] > timestamps[-1]:
+            timestamps = timestamps[::-1]
+            values = values[::-1]
+        compacted = summarize(timestamps, np.fromiter(values, dtype=np.float64, count=len(values)), points)
+        results.append({
+            **{key: value for key, value in result.items() if key not in ("Timestamps", "Values")},
+            **compacted,
+        })
+    return {**response, "MetricDataResults": results}
+
+
+def compact_metric_statistics(response: Dict[str, Any], points: int) -> Dict[str, Any]:
+    """Compact the Datapoints of a get_metric_statistics response into one series per statistic."""
+    datapoints = response.get("Datapoints", [])
+    if len(datapoints) <= points:
+        return response
+
+    datapoints = sorted(datapoints, key=lambda datapoint: datapoint["Timestamp"])
+    timestamps = [datapoint["Timestamp"] for datapoint in datapoints]
+    names = [name for name in STATISTICS if name in datapoints[0]]
+    names += list(datapoints[0].get("ExtendedStatistics", {}))
+
+    series = {}
+    for name in names:
+        values = np.array(
+            [datapoint.get(name, datapoint.get("ExtendedStatistics", {}).get(name, np.nan)) for datapoint in datapoints],
+            dtype=np.float64,
+        )
+        valid = ~np.isnan(values)
+        series_timestamps = timestamps if valid.all() else [t for t, ok in zip(timestamps, valid) if ok]
+        if len(series_timestamps):
+            series[name] = summarize(series_timestamps, values[valid], points)
+
+    compacted = {key: value for key, value in response.items() if key != "Datapoints"}
+    compacted["Unit"] = datapoints[0].get("Unit")
+    compacted["Series"] = series
+    return compacted
+
+
+def compact_response(operation_name: str, response: Dict[str, Any], points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Compact a CloudWatch metric response.
+
+    Args:
+        operation_name: get_metric_data or get_metric_statistics
+        response: The response of the operation
+        points: Points kept per downsampled series (default: USE_AWS_METRIC_POINTS)
+
+    Returns:
+        The response with long series replaced by summaries and downsampled series
+    """
+    points = max(points or METRIC_POINTS, 3)
+    if operation_name == "get_metric_data":
+        return compact_metric_data(response, points)
+    if operation_name == "get_metric_statistics":
+        return compact_metric_statistics(response, points)
+    return response
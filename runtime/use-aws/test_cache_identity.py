@@ -0,0 +1,96 @@
+"""
+Check that cached use_aws responses are never shared between accounts.
+
+Two profiles get refreshable credentials of different accounts from credential_process.
+Their credential provider ("custom-process") is the same, so the cache key must come from
+the caller identity that sts get_caller_identity resolves for each profile, and no identity
+at all while that lookup fails. STS is stubbed, so no AWS account is needed.
+
+Usage:
+    python test_cache_identity.py
+"""
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from botocore.stub import Stubber
+
+ACCOUNTS = {"account-a": "111111111111", "account-b": "222222222222"}
+
+def write_config(directory: str) -> str:
+    """Write an AWS config with one credential_process profile per account"""
+    expiration = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    lines = []
+    for profile, account in ACCOUNTS.items():
+        credentials = {
+            "Version": 1,
+            "AccessKeyId": f"AKIA{account}",
+            "SecretAccessKey": "secret",
+            "SessionToken": "token",
+            "Expiration": expiration,
+        }
+        script = os.path.join(directory, f"{profile}.py")
+        with open(script, "w") as f:
+            f.write(f"print({json.dumps(json.dumps(credentials))})\n")
+        lines += [f"[profile {profile}]", f"credential_process = {sys.executable} {script}", ""]
+
+    path = os.path.join(directory, "config")
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+    return path
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["AWS_CONFIG_FILE"] = write_config(directory)
+        os.environ["AWS_SHARED_CREDENTIALS_FILE"] = os.path.join(directory, "credentials")
+        for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN", "AWS_PROFILE"):
+            os.environ.pop(name, None)
+
+        import use_aws as aws_utils
+        from aws_cache import response_cache
+
+        registry = aws_utils.client_registry
+        stubbers = []
+        for profile, account in ACCOUNTS.items():
+            credentials = registry.get_session(profile).get_credentials()
+            print(f"{profile}: credential provider {credentials.method}")
+
+            stubber = Stubber(registry.get_client("sts", aws_utils.aws_region, profile))
+            # The first lookup fails, e.g. throttled, and the next one resolves the caller
+            stubber.add_client_error("get_caller_identity", "Throttling")
+            stubber.add_response("get_caller_identity", {
+                "UserId": f"AIDA{account}",
+                "Account": account,
+                "Arn": f"arn:aws:iam::{account}:user/{profile}",
+            })
+            stubber.activate()
+            stubbers.append(stubber)
+
+        for profile in ACCOUNTS:
+            # Both profiles use the credential provider "custom-process", so no weaker key may stand in
+            assert registry.get_identity(profile) is None, "an unresolved identity must not key the cache"
+
+        identities = {profile: registry.get_identity(profile) for profile in ACCOUNTS}
+        for profile, identity in identities.items():
+            print(f"{profile}: identity {identity}")
+            # Resolved once per session: a second lookup must not call STS again
+            assert registry.get_identity(profile) == identity
+
+        keys = {
+            profile: response_cache.make_key("ec2", "describe_instances", {}, "us-west-2", identity)
+            for profile, identity in identities.items()
+        }
+        assert keys["account-a"] != keys["account-b"], "profiles of different accounts share a cache key"
+        for profile, account in ACCOUNTS.items():
+            assert account in identities[profile]
+
+        response_cache.put(keys["account-a"], {"Reservations": ["account-a"]}, 32)
+        assert response_cache.get(keys["account-b"]) is None, "account-b was served account-a's response"
+        for stubber in stubbers:
+            stubber.assert_no_pending_responses()
+        print("OK: each account has its own cache key")
+
+if __name__ == "__main__":
+    main()
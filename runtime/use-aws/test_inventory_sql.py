@@ -0,0 +1,107 @@
+"""
+Check the sandbox of use_aws_inventory sql statements.
+
+Builds an index in a temporary file from a stubbed client, then shows that sql can read it
+(json_each included) while ATTACH, PRAGMA, writes, schema changes and recursive CTEs are
+rejected, and a runaway cross join is interrupted after USE_AWS_INVENTORY_SQL_TIMEOUT. It
+also crawls a custom resource type whose name expression selects a list. No AWS account is
+needed.
+
+Usage:
+    python test_inventory_sql.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("USE_AWS_INVENTORY_SQL_TIMEOUT", "1")
+
+import aws_inventory
+
+REJECTED = {
+    "ATTACH": "ATTACH DATABASE '{directory}/other.sqlite' AS other",
+    "PRAGMA": "PRAGMA writable_schema = ON",
+    "PRAGMA function": "SELECT * FROM pragma_table_info('resources')",
+    "INSERT": "INSERT INTO resources VALUES ('x', 'x', 'x', 'x', 'x', '{{}}', 0)",
+    "UPDATE": "UPDATE resources SET name = 'x'",
+    "DELETE": "DELETE FROM resources",
+    "DROP": "DROP TABLE resources",
+    "CREATE": "CREATE TABLE other (id TEXT)",
+    "load_extension": "SELECT load_extension('/tmp/evil')",
+}
+
+# Statements that never finish in time: an endless recursive CTE, and a cross join of 10^10 rows
+RUNAWAY = {
+    "recursive CTE": "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n",
+    "cross join": "SELECT COUNT(*) FROM " + ", ".join(
+        f"json_each('[{','.join(map(str, range(100)))}]') t{i}" for i in range(5)
+    ),
+}
+
+class StubClient:
+    """A client whose single operation returns fixed resources"""
+
+    def can_paginate(self, operation_name):
+        return False
+
+    def describe_things(self):
+        return {"Things": [
+            {"Id": "t-1", "Names": ["web", "prod"], "Tags": [{"Key": "env", "Value": "prod"}]},
+            {"Id": "t-2", "Names": "db", "Tags": []},
+        ]}
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        inventory = aws_inventory.Inventory(os.path.join(directory, "inventory.sqlite"), types={
+            # The name expression of the first resource selects a list
+            "stub:thing": {"service": "stub", "operation": "describe_things", "items": "Things[]",
+                           "id": "Id", "name": "Names", "ttl": 60},
+        })
+        print(f"crawl: {inventory.crawl(StubClient(), 'stub:thing', '123456789012', 'us-west-2')}")
+
+        names = inventory.sql("SELECT id, name FROM resources ORDER BY id")["rows"]
+        print(f"names: {names}")
+        if names != [["t-1", None], ["t-2", "db"]]:
+            failures.append(f"unexpected names {names}")
+
+        rows = inventory.sql(
+            "SELECT r.id, t.value ->> '$.Value' FROM resources r, json_each(r.data, '$.Tags') t"
+        )["rows"]
+        print(f"json_each: {rows}")
+        if rows != [["t-1", "prod"]]:
+            failures.append(f"json_each returned {rows}")
+
+        for label, statement in REJECTED.items():
+            try:
+                inventory.sql(statement.format(directory=directory))
+                failures.append(f"{label} was allowed")
+                print(f"{label:15s} ALLOWED")
+            except sqlite3.DatabaseError as ex:
+                print(f"{label:15s} rejected: {ex}")
+
+        for label, statement in RUNAWAY.items():
+            start = time.monotonic()
+            try:
+                inventory.sql(statement)
+                failures.append(f"the {label} finished")
+            except sqlite3.DatabaseError as ex:
+                elapsed = time.monotonic() - start
+                print(f"{label:15s} rejected after {elapsed:.2f} s: {ex}")
+                if elapsed > aws_inventory.INVENTORY_SQL_TIMEOUT + 1:
+                    failures.append(f"the {label} ran for {elapsed:.2f} s")
+
+        if inventory.sql("SELECT COUNT(*) FROM resources")["rows"] != [[2]]:
+            failures.append("the index changed")
+        if os.path.exists(os.path.join(directory, "other.sqlite")):
+            failures.append("ATTACH created a file")
+
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("OK: sql statements can only read the index")
+
+if __name__ == "__main__":
+    main()
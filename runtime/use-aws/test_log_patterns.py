@@ -0,0 +1,98 @@
+"""
+Throughput benchmark of the use_aws log pattern miner.
+
+Streams synthetic CloudWatch Logs events through LogPatternMiner in filter_log_events sized
+pages and reports lines per second, the number of patterns and the peak memory.
+
+Usage:
+    python test_log_patterns.py                     # 1M lines
+    python test_log_patterns.py --lines 200000 --memory
+    python test_log_patterns.py --file app.log      # lines of a local log file
+"""
+import argparse
+import random
+import resource
+import time
+import tracemalloc
+
+import use_aws as aws_utils
+from aws_log_patterns import LogPatternMiner
+
+TEMPLATES = [
+    "INFO Request {id} GET /api/{resource}/{num} completed in {ms}ms status=200",
+    "INFO Request {id} POST /api/{resource} completed in {ms}ms status=201",
+    "WARN Request {id} GET /api/{resource}/{num} slow response {ms}ms",
+    "ERROR Request {id} failed: connection reset by peer {ip}:{port}",
+    "ERROR Timeout after {ms}ms waiting for {resource} lock held by worker-{num}",
+    "INFO User {user} logged in from {ip}",
+    "INFO User {user} logged out after {num} seconds",
+    "DEBUG Cache hit key={resource}:{num} ttl={num}",
+    "DEBUG Cache miss key={resource}:{num}",
+    "INFO Processed batch {num} with {num} records in {ms}ms",
+    "WARN Retrying {resource} call attempt {num} of 5",
+    "INFO START RequestId: {id} Version: $LATEST",
+    "INFO END RequestId: {id}",
+    "INFO REPORT RequestId: {id} Duration: {ms} ms Billed Duration: {ms} ms Memory Size: 512 MB Max Memory Used: {num} MB",
+    "ERROR Unhandled exception in handler {resource}: KeyError '{user}'",
+]
+USERS = [f"user{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}" for i in range(500)] + ["alice", "bob", "carol", "dave"]
+RESOURCES = ["orders", "users", "payments", "inventory", "sessions", "invoices"]
+
+def synthetic_pages(lines: int, page_size: int = 10000, seed: int = 0):
+    """filter_log_events-like pages of events built from TEMPLATES"""
+    rng = random.Random(seed)
+    start = 1735689600000
+    for offset in range(0, lines, page_size):
+        events = []
+        for i in range(offset, min(offset + page_size, lines)):
+            template = TEMPLATES[min(int(rng.expovariate(0.3)), len(TEMPLATES) - 1)]
+            message = template.format(
+                id=f"{rng.getrandbits(64):016x}", resource=rng.choice(RESOURCES), num=rng.randint(1, 9999),
+                ms=rng.randint(1, 3000), ip=f"10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}",
+                port=rng.randint(1024, 65535), user=rng.choice(USERS),
+            )
+            events.append({"timestamp": start + i * 10, "message": message, "logStreamName": "stream"})
+        yield {"events": events}
+
+def file_pages(path: str, page_size: int = 10000):
+    events = []
+    with open(path, errors="replace") as f:
+        for line in f:
+            events.append({"message": line})
+            if len(events) == page_size:
+                yield {"events": events}
+                events = []
+    if events:
+        yield {"events": events}
+
+def benchmark(pages, memory: bool = False):
+    if memory:
+        tracemalloc.start()
+    miner = LogPatternMiner()
+    mining = 0.0
+    for page in pages:
+        start = time.perf_counter()
+        miner.add_page(page)
+        mining += time.perf_counter() - start
+    result = miner.result()
+
+    print(f"{'lines':35s} {result['records']:d}")
+    print(f"{'throughput':35s} {result['records'] / mining:,.0f} lines/s ({mining:.2f} s)")
+    print(f"{'patterns':35s} {result['groups']:d} (evicted lines: {result.get('evicted_records', 0)})")
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{'peak traced memory':35s} {peak / 1024 / 1024:.1f} MB (including the current page)")
+    print(f"{'max RSS':35s} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    print(f"{'encoded result':35s} {len(aws_utils.encode_json(result)):d} bytes")
+    for pattern in result["patterns"][:10]:
+        print(f"{pattern['count']:9d}  {pattern['template']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark use_aws log pattern mining")
+    parser.add_argument("--lines", type=int, default=1000000, help="synthetic lines")
+    parser.add_argument("--file", help="mine the lines of a log file instead")
+    parser.add_argument("--memory", action="store_true", help="trace peak memory (slower)")
+    args = parser.parse_args()
+
+    benchmark(file_pages(args.file) if args.file else synthetic_pages(args.lines), args.memory)
@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+import time
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+mcp_url = "http://127.0.0.1:8000/mcp"
+
+params = {
+    "service_name": "ec2",
+    "operation_name": "describe_regions",
+    "parameters": {},
+    "region": "us-west-2",
+    "label": "Load test"
+}
+
+async def run_session(requests: int, latencies: list, errors: list):
+    """Open one MCP session and call use_aws sequentially"""
+    async with streamablehttp_client(mcp_url, {}, timeout=120, terminate_on_close=False) as (
+        read_stream, write_stream, _,):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            for _ in range(requests):
+                start = time.perf_counter()
+                try:
+                    result = await session.call_tool("use_aws", params)
+                    if result.isError:
+                        errors.append(result.content)
+                except Exception as e:
+                    errors.append(str(e))
+                latencies.append(time.perf_counter() - start)
+
+async def run_load(sessions: int, requests: int):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[run_session(requests, latencies, errors) for _ in range(sessions)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"sessions: {sessions:3d}, calls: {len(latencies):5d}, errors: {len(errors):3d}, "
+          f"throughput: {len(latencies) / elapsed:8.1f} calls/s, p50: {p50:7.1f} ms, p95: {p95:7.1f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test for the use_aws MCP server")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=10, help="calls per session")
+    args = parser.parse_args()
+
+    print(f"Connecting to: {mcp_url}")
+    for sessions in args.sessions:
+        await run_load(sessions, args.requests)
+
+if __name__ == "__main__":
+    asyncio.run(main())
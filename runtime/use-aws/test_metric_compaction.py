@@ -0,0 +1,84 @@
+"""
+Microbenchmark of the CloudWatch metric compaction of use_aws.
+
+Compacts synthetic get_metric_data and get_metric_statistics responses and reports the time
+and the encoded size before and after compaction.
+
+Usage:
+    python test_metric_compaction.py                  # 100k points per series
+    python test_metric_compaction.py --points 1000000 --series 3 --keep 200
+"""
+import argparse
+import math
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from dateutil.tz import tzutc
+
+import metric_compaction
+import use_aws as aws_utils
+
+def synthetic_series(points: int, seed: int):
+    """Daily seasonality with a slow trend, noise and a few spikes, newest first like ScanBy's default"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=tzutc())
+    timestamps = [start + timedelta(minutes=i) for i in range(points)]
+    values = [
+        50 + 20 * math.sin(i * 2 * math.pi / 1440) + i * 0.0001 + rng.gauss(0, 2)
+        + (80 if rng.random() < 0.0005 else 0)
+        for i in range(points)
+    ]
+    return timestamps[::-1], values[::-1]
+
+def synthetic_metric_data(points: int, series: int) -> dict:
+    results = []
+    for i in range(series):
+        timestamps, values = synthetic_series(points, i)
+        results.append({
+            "Id": f"m{i}", "Label": f"CPUUtilization {i}", "StatusCode": "Complete",
+            "Timestamps": timestamps, "Values": values,
+        })
+    return {"MetricDataResults": results, "Messages": []}
+
+def synthetic_metric_statistics(points: int) -> dict:
+    timestamps, values = synthetic_series(points, 0)
+    datapoints = [
+        {"Timestamp": t, "Average": v, "Maximum": v * 1.5, "Unit": "Percent"}
+        for t, v in zip(timestamps, values)
+    ]
+    random.Random(0).shuffle(datapoints)
+    return {"Label": "CPUUtilization", "Datapoints": datapoints}
+
+def benchmark(name: str, operation_name: str, response: dict, keep: int, number: int = 5):
+    print(f"\n=== {name} ===")
+    elapsed = min(timeit.repeat(
+        lambda: metric_compaction.compact_response(operation_name, response, keep), number=number, repeat=3
+    )) / number
+    compacted = metric_compaction.compact_response(operation_name, response, keep)
+    before = len(aws_utils.encode_json(response))
+    after = len(aws_utils.encode_json(compacted))
+    print(f"{'compact_response':35s} {elapsed * 1000:8.2f} ms/op")
+    print(f"{'encoded size':35s} {before:d} -> {after:d} bytes")
+
+    series = compacted.get("MetricDataResults") or list(compacted.get("Series", {}).values())
+    first = series[0]
+    print(f"{'summary':35s} {aws_utils.encode_json(first['Summary'])}")
+    print(f"{'anomalies':35s} {len(first['Anomalies'])}, downsampled to {len(first['Values'])} points")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark use_aws CloudWatch metric compaction")
+    parser.add_argument("--points", type=int, default=100000, help="datapoints per series")
+    parser.add_argument("--series", type=int, default=1, help="series of get_metric_data")
+    parser.add_argument("--keep", type=int, default=metric_compaction.METRIC_POINTS, help="points kept per series")
+    args = parser.parse_args()
+
+    benchmark(
+        f"get_metric_data ({args.series} x {args.points} points)",
+        "get_metric_data", synthetic_metric_data(args.points, args.series), args.keep,
+    )
+    # get_metric_statistics returns at most 1440 datapoints per call
+    benchmark(
+        "get_metric_statistics (1440 datapoints, 2 statistics)",
+        "get_metric_statistics", synthetic_metric_statistics(1440), args.keep,
+    )
@@ -0,0 +1,127 @@
+"""
+Microbenchmark of the use_aws response encoding.
+
+Compares the previous path (convert_datetime_to_str copy + str() repr) with the
+single-pass encoder (encode_json) on large responses, and times the whole default tool
+path (pruning, encoding and structured content) and the query path before and after
+to_json_value.
+
+Usage:
+    python test_response_encoding.py                        # synthetic describe_instances response
+    python test_response_encoding.py --record ec2.pkl --service ec2 --operation describe_instances
+    python test_response_encoding.py ec2.pkl s3.pkl         # recorded responses
+"""
+import argparse
+import json
+import pickle
+import timeit
+from datetime import datetime, timezone
+
+import use_aws as aws_utils
+
+def synthetic_response(instances: int = 2000) -> dict:
+    """Build a describe_instances-like response with datetimes and nested structures"""
+    launch_time = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return {
+        "Reservations": [
+            {
+                "ReservationId": f"r-{i:017x}",
+                "OwnerId": "123456789012",
+                "Groups": [],
+                "Instances": [{
+                    "InstanceId": f"i-{i:017x}",
+                    "InstanceType": "m5.large",
+                    "LaunchTime": launch_time,
+                    "State": {"Code": 16, "Name": "running"},
+                    "Placement": {"AvailabilityZone": "us-west-2a", "Tenancy": "default"},
+                    "PrivateIpAddress": f"10.0.{i // 256 % 256}.{i % 256}",
+                    "BlockDeviceMappings": [{
+                        "DeviceName": "/dev/xvda",
+                        "Ebs": {"AttachTime": launch_time, "DeleteOnTermination": True, "Status": "attached"},
+                    }],
+                    "NetworkInterfaces": [{
+                        "Attachment": {"AttachTime": launch_time, "DeviceIndex": 0, "Status": "attached"},
+                        "Groups": [{"GroupId": "sg-0123456789abcdef0", "GroupName": "default"}],
+                        "PrivateIpAddresses": [{"Primary": True, "PrivateIpAddress": f"10.0.0.{i % 256}"}],
+                    }],
+                    "Tags": [{"Key": "Name", "Value": f"instance-{i}"}, {"Key": "env", "Value": "prod"}],
+                }],
+            }
+            for i in range(instances)
+        ],
+        "ResponseMetadata": {"RequestId": "00000000-0000-0000-0000-000000000000", "HTTPStatusCode": 200},
+    }
+
+def previous_path(response):
+    return f"Success: {str(aws_utils.convert_datetime_to_str(response))}"
+
+def encoder_path(response):
+    return aws_utils.encode_json(response)
+
+def previous_tool_path(response):
+    """Encode for the size before pruning, prune, encode again and parse the text for structuredContent"""
+    bytes_before = len(aws_utils.encode_json(response))
+    text = aws_utils.encode_json(aws_utils.prune_response(response))
+    return text, {"status": "success", "result": json.loads(text)}, bytes_before
+
+def tool_path(response):
+    """Convert and prune in one walk, encode once and return the shaped object as structuredContent"""
+    shaped, text, sizes = aws_utils.encode_response(response, prune=True)
+    return text, {"status": "success", "result": shaped}, sizes["bytes_before"]
+
+QUERY = "sort_by(Reservations[].Instances[], &LaunchTime)[].{id: InstanceId, state: State.Name, tags: Tags}"
+
+def previous_query_path(response):
+    """Convert the response, encode it for the size before, query it and convert the result again"""
+    converted, _ = aws_utils.to_json_value(response)
+    bytes_before = len(aws_utils.encode_json(converted))
+    shaped, _ = aws_utils.to_json_value(aws_utils.compile_query(QUERY).search(converted), True)
+    return aws_utils.encode_json(shaped), shaped, bytes_before
+
+def query_path(response):
+    """Convert the response once, query and prune that tree and encode the result"""
+    shaped, text, sizes = aws_utils.encode_response(response, QUERY, prune=True)
+    return text, shaped, sizes["bytes_before"]
+
+def benchmark(name: str, response, number: int = 20):
+    print(f"\n=== {name} ===")
+    for label, func in [("convert_datetime_to_str + str()", previous_path), ("encode_json", encoder_path)]:
+        elapsed = min(timeit.repeat(lambda: func(response), number=number, repeat=3)) / number
+        print(f"{label:35s} {elapsed * 1000:8.2f} ms/op, {len(func(response)):9d} bytes")
+
+    print("--- default tool path (prune=True) ---")
+    for label, func in [("encode x2 + prune + json.loads", previous_tool_path), ("encode_response", tool_path)]:
+        elapsed = min(timeit.repeat(lambda: func(response), number=number, repeat=3)) / number
+        text, _, bytes_before = func(response)
+        print(f"{label:35s} {elapsed * 1000:8.2f} ms/op, {bytes_before:9d} -> {len(text):d} bytes")
+
+    print(f"--- query path ({QUERY}) ---")
+    for label, func in [("convert x2", previous_query_path), ("encode_response", query_path)]:
+        elapsed = min(timeit.repeat(lambda: func(response), number=number, repeat=3)) / number
+        text, _, bytes_before = func(response)
+        print(f"{label:35s} {elapsed * 1000:8.2f} ms/op, {bytes_before:9d} -> {len(text):d} bytes")
+
+def record(path: str, service_name: str, operation_name: str, region: str):
+    client = aws_utils.get_client(service_name, region)
+    response = getattr(client, operation_name)()
+    with open(path, "wb") as f:
+        pickle.dump(response, f)
+    print(f"Recorded {service_name}.{operation_name} to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark use_aws response encoding")
+    parser.add_argument("files", nargs="*", help="pickled boto3 responses")
+    parser.add_argument("--record", help="record a response to this file")
+    parser.add_argument("--service", default="ec2")
+    parser.add_argument("--operation", default="describe_instances")
+    parser.add_argument("--region", default="us-west-2")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.service, args.operation, args.region)
+    elif args.files:
+        for path in args.files:
+            with open(path, "rb") as f:
+                benchmark(path, pickle.load(f))
+    else:
+        benchmark("synthetic describe_instances (2000 instances)", synthetic_response())
@@ -0,0 +1,205 @@
+"""
+Benchmark of the prefix-sharded S3 listing of use_aws against a local S3 stand-in.
+
+By default a minimal ListObjectsV2 server with synthetic keys is started in a subprocess.
+It keeps the keys in a sorted list and answers each page in O(page) with an added
+per-request latency, like S3. moto server rebuilds and sorts the whole key set for every
+page, which makes a sequential walk of 1M keys take hours, so it only fits small buckets;
+pass --endpoint-url to list a bucket of moto server, MinIO or S3 instead.
+
+The sequential paginator and S3ShardedListing feed the same S3ListingSummary, so the
+difference is the listing itself. The sequential baseline runs with botocore's default
+timestamp parser and with the fast parser of the use_aws client registry.
+
+Usage:
+    python test_s3_sharded_listing.py                           # 1M keys, 20 ms per request
+    python test_s3_sharded_listing.py --keys 200000 --latency-ms 50 --concurrency 8 16 32
+    python test_s3_sharded_listing.py --endpoint-url http://localhost:5000 --bucket my-bucket
+"""
+import argparse
+import base64
+import bisect
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import boto3
+from botocore.config import Config
+
+import use_aws as aws_utils
+from aws_s3_listing import S3ListingSummary, S3ShardedListing
+
+SERVICES = ["api", "auth", "billing", "checkout", "inventory", "search", "shipping", "web"]
+STORAGE_CLASSES = ["STANDARD"] * 7 + ["STANDARD_IA"] * 2 + ["GLACIER"]
+
+def synthetic_keys(count: int):
+    """logs/<service>/<yyyy>/<mm>/<dd>/<hh>/part-<n>.json.gz spread over 30 days"""
+    keys = []
+    for i in range(count):
+        hour = i * 720 // count
+        keys.append(
+            f"logs/{SERVICES[i % len(SERVICES)]}/2025/01/{hour // 24 + 1:02d}/{hour % 24:02d}/part-{i:07d}.json.gz"
+        )
+    keys.sort()
+    return keys
+
+def upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string that starts with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def serve(port: int, count: int, latency: float):
+    keys = synthetic_keys(count)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+            body = self.list_objects_v2(url.path.strip("/"), query).encode()
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def list_objects_v2(self, bucket: str, query: dict) -> str:
+            prefix = query.get("prefix", "")
+            delimiter = query.get("delimiter", "")
+            max_keys = int(query.get("max-keys", "1000"))
+            end = bisect.bisect_left(keys, upper_bound(prefix)) if prefix else len(keys)
+            token = query.get("continuation-token")
+            if token:
+                kind, name = base64.urlsafe_b64decode(token).decode().split(":", 1)
+                i = bisect.bisect_left(keys, upper_bound(name)) if kind == "P" else bisect.bisect_right(keys, name)
+            else:
+                i = bisect.bisect_left(keys, prefix)
+                if query.get("start-after"):
+                    i = max(i, bisect.bisect_right(keys, query["start-after"]))
+
+            contents, prefixes, last = [], [], None
+            while i < end and len(contents) + len(prefixes) < max_keys:
+                key = keys[i]
+                if delimiter:
+                    j = key.find(delimiter, len(prefix))
+                    if j >= 0:
+                        common = key[:j + len(delimiter)]
+                        prefixes.append(common)
+                        last = f"P:{common}"
+                        i = bisect.bisect_left(keys, upper_bound(common), i, end)
+                        continue
+                contents.append(i)
+                last = f"K:{key}"
+                i += 1
+
+            parts = [
+                '<?xml version="1.0" encoding="UTF-8"?>',
+                '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">',
+                f"<Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(contents) + len(prefixes)}</KeyCount>",
+                f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{'true' if i < end else 'false'}</IsTruncated>",
+            ]
+            if delimiter:
+                parts.append(f"<Delimiter>{escape(delimiter)}</Delimiter>")
+            if i < end:
+                parts.append(f"<NextContinuationToken>{base64.urlsafe_b64encode(last.encode()).decode()}</NextContinuationToken>")
+            for n in contents:
+                parts.append(
+                    f"<Contents><Key>{escape(keys[n])}</Key><LastModified>2025-01-31T00:00:00.000Z</LastModified>"
+                    f"<ETag>&quot;d41d8cd98f00b204e9800998ecf8427e&quot;</ETag><Size>{n * 2654435761 % 8388608}</Size>"
+                    f"<StorageClass>{STORAGE_CLASSES[n % len(STORAGE_CLASSES)]}</StorageClass></Contents>"
+                )
+            for common in prefixes:
+                parts.append(f"<CommonPrefixes><Prefix>{escape(common)}</Prefix></CommonPrefixes>")
+            parts.append("</ListBucketResult>")
+            return "".join(parts)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print("ready", flush=True)
+    server.serve_forever()
+
+def start_stand_in(port: int, count: int, latency_ms: float) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--serve", "--port", str(port), "--keys", str(count), "--latency-ms", str(latency_ms)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    process.stdout.readline()
+    return process
+
+def report(label: str, result: dict, elapsed: float):
+    print(
+        f"{label:35s} {elapsed:7.2f} s  {result['records'] / elapsed:10,.0f} keys/s  "
+        f"{result['records']:d} keys  {result['bytes']:d} bytes"
+    )
+
+def create_client(endpoint_url: str, max_pool_connections: int, fast_timestamps: bool = True):
+    session = boto3.Session(aws_access_key_id="bench", aws_secret_access_key="bench", region_name="us-east-1")
+    if fast_timestamps:
+        aws_utils.use_fast_timestamp_parser(session)
+    return session.client(
+        "s3", endpoint_url=endpoint_url,
+        config=Config(max_pool_connections=max_pool_connections, s3={"addressing_style": "path"}),
+    )
+
+def sequential_listing(client, parameters: dict) -> dict:
+    summary = S3ListingSummary(parameters["Prefix"], prefix_depth=2)
+    for page in client.get_paginator("list_objects_v2").paginate(**parameters):
+        summary.add_page(page)
+    return summary.result()
+
+def benchmark(endpoint_url: str, bucket: str, prefix: str, concurrency_levels, sequential: bool):
+    parameters = {"Bucket": bucket, "Prefix": prefix}
+    client = create_client(endpoint_url, max(concurrency_levels))
+    if sequential:
+        for label, sequential_client in [
+            ("sequential paginate (dateutil)", create_client(endpoint_url, 10, fast_timestamps=False)),
+            ("sequential paginate", client),
+        ]:
+            start = time.perf_counter()
+            result = sequential_listing(sequential_client, parameters)
+            report(label, result, time.perf_counter() - start)
+
+    for concurrency in concurrency_levels:
+        listing = S3ShardedListing(client, parameters, {"concurrency": concurrency, "prefix_depth": 2})
+        start = time.perf_counter()
+        result = listing.run()
+        report(f"sharded, concurrency {concurrency}", result, time.perf_counter() - start)
+        print(f"{'':35s} {result['listing']}")
+    print(f"by_storage_class: {result['by_storage_class']}")
+    print(f"by_prefix: {result['by_prefix'][:3]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the prefix-sharded S3 listing of use_aws")
+    parser.add_argument("--keys", type=int, default=1000000, help="synthetic keys of the stand-in")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="per-request latency of the stand-in")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--no-sequential", action="store_true", help="skip the sequential baseline")
+    parser.add_argument("--endpoint-url", help="list a bucket of this S3-compatible endpoint instead")
+    parser.add_argument("--bucket", default="bench")
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.keys, args.latency_ms / 1000)
+        sys.exit(0)
+
+    process = None
+    endpoint_url = args.endpoint_url
+    if endpoint_url is None:
+        start = time.perf_counter()
+        process = start_stand_in(args.port, args.keys, args.latency_ms)
+        endpoint_url = f"http://127.0.0.1:{args.port}"
+        print(f"stand-in with {args.keys} keys and {args.latency_ms} ms latency ready in {time.perf_counter() - start:.1f} s")
+    try:
+        benchmark(endpoint_url, args.bucket, args.prefix, args.concurrency, not args.no_sequential)
+    finally:
+        if process is not None:
+            process.terminate()
@@ -2,31 +2,74 @@
 use_aws.py is able to generate input schema for AWS service operations.
 modifed from: https://github.com/strands-agents/tools/blob/main/src/strands_tools/use_aws.py
 """ 
-import io
 import os
 
-aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-aws_session_token = os.environ.get('AWS_SESSION_TOKEN')
 aws_region = os.environ.get('AWS_DEFAULT_REGION', 'us-west-2')
 
-from rich.console import Console
-def create() -> Console:
+
+class NullConsole:
+    """Console that discards everything printed to it."""
+
+    def print(self, *args, **kwargs) -> None:
+        pass
+
+
+def console_enabled() -> bool:
+    """Console rendering is opt-in with STRANDS_TOOL_CONSOLE_MODE=enabled."""
+    return os.getenv("STRANDS_TOOL_CONSOLE_MODE") == "enabled"
+
+
+def create():
     """Create rich console instance.
 
     If STRANDS_TOOL_CONSOLE_MODE environment variable is set to "enabled", output is directed to stdout.
+    Otherwise nothing is rendered, and rich is not imported at all.
 
     Returns
         Console instance.
     """
-    if os.getenv("STRANDS_TOOL_CONSOLE_MODE") != "enabled":
-        return Console(file=io.StringIO())
+    if not console_enabled():
+        return NullConsole()
+
+    try:
+        from rich.console import Console
+    except ImportError:
+        return NullConsole()
+    return Console()
+
 
-    return Console()        
+def print_operation_details(service_name: str, operation_name: str, parameters: dict, label: str) -> None:
+    """Render the details of an operation as a panel when console rendering is enabled."""
+    if not console_enabled():
+        return
 
+    try:
+        from colorama import Fore, Style
+        from rich.panel import Panel
+    except ImportError:
+        return
+
+    operation_details = f"{Fore.CYAN}Service:{Style.RESET_ALL} {service_name}\n"
+    operation_details += f"{Fore.CYAN}Operation:{Style.RESET_ALL} {operation_name}\n"
+    operation_details += f"{Fore.CYAN}Parameters:{Style.RESET_ALL}\n"
+    for key, value in parameters.items():
+        operation_details += f"  - {key}: {value}\n"
+
+    create().print(Panel(operation_details, title=label, expand=False))
+
+import base64
+import json
 import re
-from datetime import datetime
-from typing import Any
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import jmespath
+from botocore.response import StreamingBody
 
 def convert_datetime_to_str(obj: Any) -> Any:
     """
@@ -48,6 +91,324 @@ def to_snake_case(text: str) -> str:
     pattern = re.compile(r"(?<!^)(?=[A-Z])")
     return pattern.sub("_", text).lower()
 
+# Keys dropped from every response by the default pruning profile
+PRUNE_KEYS = frozenset(["ResponseMetadata"])
+
+def prune_response(obj: Any) -> Any:
+    """
+    Recursively drop ResponseMetadata and null or empty fields (None, "", [], {})
+    from a JSON-like object. Zero and False are kept since they carry information.
+    """
+    if isinstance(obj, dict):
+        pruned = {}
+        for k, v in obj.items():
+            if k in PRUNE_KEYS:
+                continue
+            v = prune_response(v)
+            if v is None or (isinstance(v, (str, list, dict)) and not v):
+                continue
+            pruned[k] = v
+        return pruned
+    elif isinstance(obj, list):
+        return [prune_response(item) for item in obj]
+    else:
+        return obj
+
+@lru_cache(maxsize=256)
+def compile_query(query: str) -> Any:
+    """
+    Compile a JMESPath expression. Raises jmespath.exceptions.JMESPathError if invalid.
+    """
+    return jmespath.compile(query)
+
+class ResponseStats:
+    """Thread-safe totals of response sizes before and after query/pruning."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def record(self, bytes_before: int, bytes_after: int) -> None:
+        with self._lock:
+            self.responses += 1
+            self.bytes_before += bytes_before
+            self.bytes_after += bytes_after
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "bytes_before": self.bytes_before,
+                "bytes_after": self.bytes_after,
+                "bytes_saved": self.bytes_before - self.bytes_after,
+            }
+
+response_stats = ResponseStats()
+
+# StreamingBody limits: text bodies up to STREAMING_BODY_MAX_BYTES are returned inline; for larger
+# or binary bodies reading stops after a preview of the first bytes and a handle to the source is returned
+STREAMING_BODY_MAX_BYTES = int(os.environ.get("USE_AWS_STREAMING_BODY_MAX_BYTES", str(256 * 1024)))
+STREAMING_BODY_PREVIEW_BYTES = int(os.environ.get("USE_AWS_STREAMING_BODY_PREVIEW_BYTES", str(4 * 1024)))
+STREAMING_BODY_CHUNK_BYTES = 64 * 1024
+
+def sniff_content_type(head: bytes, content_type: Optional[str] = None) -> str:
+    """
+    Classify a body as "json", "text" or "binary" from its content type and first bytes.
+    """
+    content_type = (content_type or "").lower()
+    if content_type in ("application/octet-stream", "binary/octet-stream"):
+        content_type = ""  # generic S3 default, decide from the bytes
+    if "json" in content_type:
+        return "json"
+    if b"\x00" in head:
+        return "binary"
+    try:
+        # The last bytes are skipped since a multi-byte character may be cut there
+        head[:-3].decode("utf-8")
+    except UnicodeDecodeError:
+        return "binary"
+    if content_type and not content_type.startswith("text/") and not any(
+        t in content_type for t in ("xml", "yaml", "csv", "javascript")
+    ):
+        return "binary"
+    if head.lstrip()[:1] in (b"{", b"["):
+        return "json"
+    return "text"
+
+def read_streaming_body(body: StreamingBody, content_type: Optional[str] = None,
+                        content_length: Optional[int] = None) -> Any:
+    """
+    Read a StreamingBody without ever holding more than the inline limit in memory.
+
+    Small text bodies are returned inline (JSON is decoded). For bodies over the limit, and
+    binary bodies, reading stops after the first bytes and the connection is closed, so the
+    rest is never downloaded; a handle with a preview of those bytes is returned instead
+    (a binary body that fits in the preview is complete there, base64 encoded).
+
+    Args:
+        body: StreamingBody returned by an AWS API
+        content_type: Content type reported by the API (e.g., ContentType of s3.get_object)
+        content_length: Length reported by the API (e.g., ContentLength of s3.get_object)
+
+    Returns:
+        The decoded body, or a dictionary describing the part that was not read
+    """
+    head = bytearray()
+    try:
+        # A body known to be over the limit is never returned inline, so only its preview is read
+        limit = STREAMING_BODY_PREVIEW_BYTES if (content_length or 0) > STREAMING_BODY_MAX_BYTES else STREAMING_BODY_MAX_BYTES + 1
+        kind, eof = None, False
+        while len(head) < limit:
+            chunk = body.read(min(STREAMING_BODY_CHUNK_BYTES, limit - len(head)))
+            if not chunk:
+                eof = True
+                break
+            head += chunk
+            if kind is None and len(head) >= min(STREAMING_BODY_PREVIEW_BYTES, limit):
+                kind = sniff_content_type(bytes(head[:STREAMING_BODY_PREVIEW_BYTES]), content_type)
+                if kind == "binary":
+                    break
+        if kind is None:
+            kind = sniff_content_type(bytes(head[:STREAMING_BODY_PREVIEW_BYTES]), content_type)
+        eof = eof or len(head) == content_length
+    finally:
+        body.close()
+
+    if eof and kind != "binary":
+        text = head.decode("utf-8", errors="replace")
+        if kind == "json":
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                pass
+        return text
+
+    preview = bytes(head[:STREAMING_BODY_PREVIEW_BYTES])
+    truncated = not eof or len(preview) < len(head)
+    if truncated:
+        logger.info(f"Read {len(preview)} of {content_length if content_length is not None else 'unknown'} bytes of a streaming body")
+    return {
+        "truncated": truncated,
+        "size": content_length if content_length is not None else (len(head) if eof else None),
+        "contentType": content_type or kind,
+        "preview": preview.decode("utf-8", errors="ignore") if kind != "binary" else base64.b64encode(preview).decode("ascii"),
+        "previewEncoding": "utf-8" if kind != "binary" else "base64",
+        "previewBytes": len(preview),
+    }
+
+def body_source(response: Dict[str, Any], parameters: Dict[str, Any], preview_bytes: int) -> Dict[str, Any]:
+    """
+    Describe where the rest of a truncated body can be read: the object of the request
+    (pinned to the version that was read) and, when the API accepts ranges, the Range of the
+    bytes after the preview.
+    """
+    source = {name: parameters[name] for name in ("Bucket", "Key") if name in parameters}
+    version = response.get("VersionId") or parameters.get("VersionId")
+    if source and version:
+        source["VersionId"] = version
+    if response.get("AcceptRanges") == "bytes":
+        # An open-ended or bounded Range of the request continues from its own start
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", str(parameters.get("Range", "bytes=0-")).strip())
+        if match:
+            source["Range"] = f"bytes={int(match.group(1)) + preview_bytes}-{match.group(2)}"
+    return source
+
+def handle_streaming_body(response: Dict[str, Any], parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Replace StreamingBody values of an AWS response in place with bounded reads.
+
+    Args:
+        response: AWS API response that may contain StreamingBody objects
+        parameters: Parameters of the request, used to point a truncated body back to its source
+
+    Returns:
+        Processed response with StreamingBody objects converted to Python objects or truncated handles
+    """
+    if not isinstance(response, dict):
+        # Client methods such as generate_presigned_url return plain values
+        return response
+    for key, value in response.items():
+        if isinstance(value, StreamingBody):
+            body = read_streaming_body(value, response.get("ContentType"), response.get("ContentLength"))
+            if isinstance(body, dict) and body.get("truncated") is True and parameters:
+                source = body_source(response, parameters, body["previewBytes"])
+                if source:
+                    body["source"] = source
+            response[key] = body
+    return response
+
+def json_default(obj: Any) -> Any:
+    """
+    Convert a value the json encoder cannot handle natively.
+
+    The encoder calls this only for those values, so a response is serialized in a
+    single pass without first making a converted copy of the whole object.
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    elif isinstance(obj, Decimal):
+        if not obj.is_finite():
+            return str(obj)
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    elif isinstance(obj, (bytes, bytearray)):
+        try:
+            return obj.decode("utf-8")
+        except UnicodeDecodeError:
+            return base64.b64encode(obj).decode("ascii")
+    elif isinstance(obj, StreamingBody):
+        return read_streaming_body(obj)
+    elif isinstance(obj, (set, frozenset)):
+        return list(obj)
+    else:
+        return str(obj)
+
+def encode_json(obj: Any) -> str:
+    """Serialize a JSON-like AWS response to compact JSON in a single pass."""
+    return json.dumps(obj, default=json_default, ensure_ascii=False, separators=(",", ":"))
+
+# Values copied as they are by to_json_value; exact types, so subclasses take the slow path
+JSON_SCALAR_TYPES = frozenset([str, int, float, bool, type(None)])
+
+def to_json_value(obj: Any, prune: bool = False) -> Tuple[Any, int]:
+    """
+    Copy a JSON-like AWS response with every value converted to a JSON type, optionally
+    dropping ResponseMetadata and null or empty fields as prune_response does.
+
+    Datetimes become ISO 8601 strings, Decimals numbers and bytes text (see json_default),
+    so JMESPath can sort and compare them and the copy can be returned as structured content.
+
+    Returns:
+        Tuple of the copy and the characters that pruning removed from the encoded response,
+        so that the size before pruning is known without encoding the response twice
+    """
+    removed = 0
+
+    def convert_dict(value: Dict[Any, Any]) -> Dict[str, Any]:
+        nonlocal removed
+        result = {}
+        for k, v in value.items():
+            if type(k) is not str:
+                k = encode_json(k).strip('"')  # as json.dumps converts keys, e.g. 5 -> "5"
+            if prune and k in PRUNE_KEYS:
+                removed += len(encode_json(k)) + 1 + len(encode_json(v))
+                continue
+            if type(v) in JSON_SCALAR_TYPES:
+                # Most values are scalars, so they are handled here without a call
+                if prune and (v is None or v == "" and type(v) is str):
+                    removed += len(encode_json(k)) + (5 if v is None else 3)  # "k":null or "k":""
+                    continue
+            else:
+                v = convert(v)
+                if prune and (v is None or (isinstance(v, (str, list, dict)) and not v)):
+                    removed += len(encode_json(k)) + (5 if v is None else 3)
+                    continue
+            result[k] = v
+        if prune and len(result) < len(value):
+            # Commas between the entries that were dropped
+            removed += (len(value) - 1) - max(len(result) - 1, 0)
+        return result
+
+    def convert(value: Any) -> Any:
+        if type(value) in JSON_SCALAR_TYPES:
+            return value
+        if isinstance(value, dict):
+            return convert_dict(value)
+        if isinstance(value, (list, tuple)):
+            return [item if type(item) in JSON_SCALAR_TYPES else convert(item) for item in value]
+        if isinstance(value, (str, int, float)):  # subclasses such as IntEnum
+            return value
+        converted = json_default(value)
+        return convert(converted) if isinstance(converted, list) else converted
+
+    return convert(obj), removed
+
+def encode_response(response: Any, query: Optional[str] = None, prune: bool = True,
+                    structured: bool = True) -> Tuple[Any, str, Dict[str, int]]:
+    """
+    Apply a JMESPath query and the default pruning profile to a response, and encode it.
+
+    The response is converted to JSON types at most once, and the text is encoded from that
+    same tree. Without a query, pruning or structured content, it is encoded straight from
+    the botocore response.
+
+    Args:
+        response: JSON-like AWS response
+        query: Optional JMESPath expression, e.g. "Reservations[].Instances[].[InstanceId, State.Name]"
+        prune: Drop ResponseMetadata and null or empty fields
+        structured: Return the shaped response; False when only the text is used
+
+    Returns:
+        Tuple of the shaped response in JSON types (see to_json_value, None when not
+        structured and nothing was shaped), its compact JSON text, and the size in bytes
+        before and after shaping
+    """
+    if query:
+        # The query runs on JSON types so that timestamps sort and compare; its result is
+        # made of that tree, so pruning it only drops fields and converts nothing
+        converted, _ = to_json_value(response)
+        bytes_before = len(encode_json(converted))
+        shaped = compile_query(query).search(converted)
+        if prune:
+            shaped = prune_response(shaped)
+        text = encode_json(shaped)
+    elif prune or structured:
+        shaped, removed = to_json_value(response, prune)
+        text = encode_json(shaped)
+        bytes_before = len(text) + removed
+    else:
+        shaped = None
+        text = encode_json(response)
+        bytes_before = len(text)
+    bytes_after = len(text)
+
+    response_stats.record(bytes_before, bytes_after)
+    return shaped, text, {"bytes_before": bytes_before, "bytes_after": bytes_after}
+
+
+
+
 
 """
 This module provides utility functions for generating JSON schemas for AWS service operations.
@@ -67,14 +428,22 @@ schema = generate_input_schema('s3', 'list_buckets')
 
 """
 
+import difflib
 import logging
+import mmap
 import re
+from collections import OrderedDict
 from functools import lru_cache
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import boto3
-from botocore.exceptions import UnknownServiceError
-from botocore.model import Shape
+import botocore
+import botocore.utils
+from botocore import xform_name
+from botocore.config import Config
+from botocore.credentials import DeferredRefreshableCredentials, RefreshableCredentials
+from botocore.session import get_session as get_botocore_session
+from botocore.loaders import create_loader
 
 # Initialize logging and set paths
 logger = logging.getLogger(__name__)
@@ -95,57 +464,946 @@ SHAPE_TYPE_MAP = {
     "long": {"type": "integer"},
 }
 
+# Input schema cache: memory entries, disk location and services precomputed by build()
+SCHEMA_CACHE_SIZE = int(os.environ.get("USE_AWS_SCHEMA_CACHE_SIZE", "1024"))
+SCHEMA_CACHE_DIR = os.environ.get("USE_AWS_SCHEMA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "use-aws-schemas"))
+SCHEMA_PRECOMPUTE_SERVICES = os.environ.get(
+    "USE_AWS_SCHEMA_PRECOMPUTE_SERVICES",
+    "ec2,s3,iam,sts,lambda,dynamodb,rds,ecs,eks,logs,cloudwatch,cloudformation,sns,sqs,"
+    "route53,elbv2,autoscaling,kms,secretsmanager,ssm,bedrock,bedrock-agent",
+)
 
-@lru_cache(maxsize=128)
-def generate_schema(shape: Optional[Shape], depth: int = 0, max_depth: int = 5) -> Dict[str, Any]:
+# Optional on-disk location of the service catalog
+CATALOG_PATH = os.environ.get("USE_AWS_CATALOG_PATH")
+
+# Memory-mapped catalog baked into the Lambda package next to this module
+BUNDLED_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aws_catalog.idx")
+# Version 2 leaves parameters that botocore fills in out of the required parameters
+CATALOG_MAGIC = b"use-aws-catalog/2"
+
+# Required parameters that botocore handlers fill in (glacier accountId defaults to "-") or
+# accept under an alias (logs fromTime for from), so callers may leave them out
+HANDLER_PARAMETERS = {
+    "glacier": {"accountId"},
+    "logs": {"from"},
+    "cloudsearchdomain": {"return"},
+    "ec2": {"Filter"},
+}
+
+# Client registry settings
+CLIENT_CACHE_SIZE = int(os.environ.get("USE_AWS_CLIENT_CACHE_SIZE", "64"))
+MAX_POOL_CONNECTIONS = int(os.environ.get("USE_AWS_MAX_POOL_CONNECTIONS", "32"))
+
+# Cross-account settings: role assumed in target accounts given by account id
+ASSUME_ROLE_NAME = os.environ.get("USE_AWS_ASSUME_ROLE_NAME", "OrganizationAccountAccessRole")
+ASSUME_ROLE_DURATION = int(os.environ.get("USE_AWS_ASSUME_ROLE_DURATION", "3600"))
+ASSUME_ROLE_SESSION_NAME = os.environ.get("USE_AWS_ASSUME_ROLE_SESSION_NAME", "use-aws")
+
+
+def parse_timestamp(value: Any) -> Any:
+    """
+    Parse a timestamp of a response. ISO 8601 strings with a timezone, the format of most
+    XML and JSON responses (e.g. LastModified of every S3 object), take the fromisoformat
+    fast path. Epoch seconds, RFC 822 dates and naive strings go to botocore's parser,
+    which costs ~70 us per value through dateutil.
+    """
+    if isinstance(value, str) and len(value) > 10 and value[4] == "-":
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            parsed = None
+        if parsed is not None and parsed.tzinfo is not None:
+            return parsed
+    return botocore.utils.parse_timestamp(value)
+
+def use_fast_timestamp_parser(session: boto3.Session) -> boto3.Session:
+    """Make the clients of a session parse response timestamps with parse_timestamp."""
+    session._session.get_component("response_parser_factory").set_parser_defaults(timestamp_parser=parse_timestamp)
+    return session
+
+class ClientRegistry:
     """
-    Recursively generate a JSON schema from a boto3 shape.
+    Thread-safe LRU cache of boto3 clients.
+
+    Creating a client makes botocore load the service model JSON and open a new
+    connection pool, which dominates the latency of cheap calls such as describe_*.
+    Clients are reused per (service, region, profile, role, credential identity), and
+    sessions are reused per profile so the loader cache is shared between clients.
+    Their clients parse ISO 8601 timestamps with a fast path (see parse_timestamp).
+
+    Sessions of assumed roles hold refreshable STS credentials, so a cached session
+    assumes its role again shortly before the credentials expire instead of on every call.
+
+    boto3 sessions are not thread-safe, so sessions and clients are created under
+    a lock. The clients themselves are thread-safe and are used without locking.
+    """
+
+    def __init__(self, max_size: int = CLIENT_CACHE_SIZE, max_pool_connections: int = MAX_POOL_CONNECTIONS):
+        self.max_size = max_size
+        self.config = Config(max_pool_connections=max_pool_connections)
+        self._sessions: Dict[Tuple[Optional[str], Optional[str]], boto3.Session] = {}
+        self._clients: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._identities: Dict[Tuple[Optional[str], Optional[str]], str] = {}
+        self._lock = threading.RLock()
+
+    def get_session(self, profile_name: Optional[str] = None, role_arn: Optional[str] = None) -> boto3.Session:
+        """Return the cached boto3 session for the profile and role, creating it on first use."""
+        with self._lock:
+            session = self._sessions.get((profile_name, role_arn))
+            if session is None:
+                if role_arn:
+                    session = self._assume_role_session(profile_name, role_arn)
+                else:
+                    session = boto3.Session(profile_name=profile_name)
+                self._sessions[(profile_name, role_arn)] = use_fast_timestamp_parser(session)
+            return session
 
-    This function creates a JSON schema representation of the given boto3 shape,
-    handling nested structures up to a specified maximum depth.
+    def _assume_role_session(self, profile_name: Optional[str], role_arn: str) -> boto3.Session:
+        # Credentials are fetched lazily on the first call and refreshed by botocore
+        # before they expire. The loader is shared, so service models are loaded once.
+        base_session = self.get_session(profile_name)
+        sts = self.get_client("sts", aws_region, profile_name)
+
+        def fetch_credentials() -> Dict[str, str]:
+            logger.info(f"Assuming role: {role_arn}")
+            credentials = sts.assume_role(
+                RoleArn=role_arn,
+                RoleSessionName=ASSUME_ROLE_SESSION_NAME,
+                DurationSeconds=ASSUME_ROLE_DURATION,
+            )["Credentials"]
+            return {
+                "access_key": credentials["AccessKeyId"],
+                "secret_key": credentials["SecretAccessKey"],
+                "token": credentials["SessionToken"],
+                "expiry_time": credentials["Expiration"].isoformat(),
+            }
+
+        botocore_session = get_botocore_session()
+        botocore_session.register_component("data_loader", base_session._session.get_component("data_loader"))
+        botocore_session._credentials = DeferredRefreshableCredentials(
+            refresh_using=fetch_credentials, method="sts-assume-role"
+        )
+        return boto3.Session(botocore_session=botocore_session)
+
+    def get_identity(self, profile_name: Optional[str] = None, role_arn: Optional[str] = None) -> Optional[str]:
+        """
+        Return the identity used to key cached responses of the profile and role.
+
+        The identity is the profile, the role and the caller ARN of their credentials, which
+        names the account. It is looked up once per session with sts get_caller_identity, so
+        two profiles whose credential_process returns keys of different accounts never share
+        cached responses. When the lookup fails, None is returned and the lookup is retried
+        on the next call; callers must not cache responses without an identity.
+        """
+        with self._lock:
+            identity = self._identities.get((profile_name, role_arn))
+        if identity is not None:
+            return identity
+
+        try:
+            sts = self.get_client("sts", aws_region, profile_name, role_arn)
+            caller = sts.get_caller_identity()["Arn"]
+        except Exception as e:
+            logger.warning(f"Could not resolve the caller identity of profile {profile_name} and role {role_arn}: {e}")
+            return None
+
+        identity = "|".join([profile_name or "", role_arn or "", caller])
+        with self._lock:
+            self._identities[(profile_name, role_arn)] = identity
+        return identity
+
+    @staticmethod
+    def _credential_identity(session: boto3.Session) -> Optional[str]:
+        # Refreshable credentials rotate their keys, but a client refreshes them on its own,
+        # so the provider is enough to identify them. Static credentials are keyed by access key.
+        credentials = session.get_credentials()
+        if credentials is None:
+            return None
+        if isinstance(credentials, RefreshableCredentials):
+            return credentials.method
+        return credentials.access_key
+
+    def get_client(
+        self,
+        service_name: str,
+        region_name: Optional[str] = None,
+        profile_name: Optional[str] = None,
+        role_arn: Optional[str] = None,
+    ) -> Any:
+        """
+        Return a cached boto3 client, creating it on a cache miss.
+
+        Args:
+            service_name (str): Name of the AWS service (e.g., 's3', 'ec2').
+            region_name (Optional[str]): AWS region name. Defaults to AWS_DEFAULT_REGION.
+            profile_name (Optional[str]): Optional AWS profile name from ~/.aws/credentials.
+            role_arn (Optional[str]): Optional IAM role assumed with the profile's credentials.
+
+        Returns:
+            Any: A boto3 client for the service.
+        """
+        region_name = region_name or aws_region
+        with self._lock:
+            session = self.get_session(profile_name, role_arn)
+            identity = role_arn or self._credential_identity(session)
+            key = (service_name, region_name, profile_name, identity)
+
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+            client = session.client(service_name=service_name, region_name=region_name, config=self.config)
+            self._clients[key] = client
+            if len(self._clients) > self.max_size:
+                evicted, _ = self._clients.popitem(last=False)
+                logger.debug(f"Evicted boto3 client: {evicted[:3]}")
+            return client
+
+    def clear(self) -> None:
+        """Drop all cached clients and sessions."""
+        with self._lock:
+            self._clients.clear()
+            self._sessions.clear()
+            self._identities.clear()
+
+
+client_registry = ClientRegistry()
+
+
+def get_client(
+    service_name: str,
+    region_name: Optional[str] = None,
+    profile_name: Optional[str] = None,
+    role_arn: Optional[str] = None,
+) -> Any:
+    """Return a pooled boto3 client from the shared client registry."""
+    return client_registry.get_client(service_name, region_name, profile_name, role_arn)
+
+
+def resolve_role_arn(account: str) -> str:
+    """
+    Return the role to assume for an account. An account id maps to ASSUME_ROLE_NAME
+    in that account, and a role ARN is used as it is.
+
+    Raises:
+        ValueError: when the account is neither a 12-digit account id nor an ARN
+    """
+    account = account.strip() if isinstance(account, str) else ""
+    if account.startswith("arn:") and len(account.split(":")) >= 6:
+        return account
+    if not re.fullmatch(r"\d{12}", account):
+        raise ValueError(f"not an account id or role ARN: {account!r}")
+    partition = client_registry.get_session().get_partition_for_region(aws_region)
+    return f"arn:{partition}:iam::{account}:role/{ASSUME_ROLE_NAME}"
+
+
+def account_of(role_arn: Optional[str]) -> Optional[str]:
+    """Return the account id of a role ARN, or None for the default credentials."""
+    if not role_arn:
+        return None
+    return role_arn.split(":")[4]
+
+
+def available_regions(service_name: str) -> List[str]:
+    """
+    Return the regions of a service in the partition of AWS_DEFAULT_REGION.
+
+    The list comes from the endpoint data bundled with botocore, so no network call is made.
+    Global services such as iam have no regional endpoints and return the default region.
+    """
+    session = client_registry.get_session()
+    regions = session.get_available_regions(service_name, session.get_partition_for_region(aws_region))
+    return regions or [aws_region]
+
+
+def expand_regions(service_name: str, regions: List[str]) -> List[str]:
+    """Expand "*" in a list of regions to every region of the service, keeping the order."""
+    expanded = []
+    for region in regions:
+        for name in available_regions(service_name) if region == "*" else [region]:
+            if name not in expanded:
+                expanded.append(name)
+    return expanded
+
+
+def required_members(service_name: str, shapes: Dict[str, Any], shape_name: Optional[str]) -> List[str]:
+    """
+    Return the required members of an input shape that a caller must pass.
+
+    Members marked idempotencyToken are generated by botocore when they are missing, and
+    HANDLER_PARAMETERS are filled in or renamed by botocore handlers, so both are left out.
+    """
+    shape = shapes.get(shape_name, {}) if shape_name else {}
+    members = shape.get("members", {})
+    handled = HANDLER_PARAMETERS.get(service_name, set())
+    return [
+        name for name in shape.get("required", [])
+        if name not in handled and not members.get(name, {}).get("idempotencyToken")
+    ]
+
+
+class ServiceCatalog:
+    """
+    Index of AWS services and operations built from the botocore loader.
+
+    Validation and name resolution are dictionary lookups instead of creating a client
+    and scanning it with dir(). Each service maps snake_case operation names to their
+    PascalCase API name and input shape name:
+
+        {"s3": {"list_buckets": ["ListBuckets", "ListBucketsRequest"], ...}, ...}
+
+    Services are indexed lazily on first use. When a path is given, the catalog is read
+    from that file if it was saved by the same botocore version, and build() writes the
+    complete catalog back to it.
+    """
+
+    def __init__(self, path: Optional[str] = CATALOG_PATH):
+        self.path = path
+        self.botocore_version = botocore.__version__
+        self._services: Optional[List[str]] = None
+        self._operations: Dict[str, Dict[str, List[Optional[str]]]] = {}
+        self._lock = threading.Lock()
+        if path:
+            self.load(path)
+
+    @staticmethod
+    def _loader() -> Any:
+        # Share the loader of the pooled session, so models indexed here are already
+        # cached when a client for the same service is created.
+        return client_registry.get_session()._session.get_component("data_loader")
+
+    def service_model(self, service_name: str) -> Dict[str, Any]:
+        """Return the raw service-2 model of a service. The loader caches it after the first load."""
+        return self._loader().load_service_model(service_name, "service-2")
+
+    @staticmethod
+    def _index_operations(service_model: Dict[str, Any]) -> Dict[str, List[Optional[str]]]:
+        operations = {}
+        for pascal_name, operation in service_model.get("operations", {}).items():
+            input_shape = operation.get("input", {}).get("shape")
+            operations[xform_name(pascal_name)] = [pascal_name, input_shape]
+        return operations
+
+    def services(self) -> List[str]:
+        """Return the sorted list of available service names."""
+        if self._services is None:
+            with self._lock:
+                if self._services is None:
+                    self._services = sorted(self._loader().list_available_services("service-2"))
+        return self._services
+
+    def has_service(self, service_name: str) -> bool:
+        """Check whether the service is known to botocore."""
+        return service_name in self._operations or service_name in self.services()
+
+    def operations(self, service_name: str) -> Dict[str, List[Optional[str]]]:
+        """
+        Return the operation index of a service, loading it on first use.
+
+        Args:
+            service_name (str): The name of the AWS service.
+
+        Returns:
+            Dict[str, List[Optional[str]]]: snake_case name -> [PascalCase name, input shape name].
+            Empty if the service is unknown.
+        """
+        operations = self._operations.get(service_name)
+        if operations is not None:
+            return operations
+        if service_name not in self.services():
+            return {}
+
+        with self._lock:
+            operations = self._operations.get(service_name)
+            if operations is None:
+                service_model = self._loader().load_service_model(service_name, "service-2")
+                operations = self._index_operations(service_model)
+                self._operations[service_name] = operations
+        return operations
+
+    @staticmethod
+    def normalize_operation_name(operation_name: str) -> str:
+        """Normalize snake_case, kebab-case, camelCase or PascalCase to the boto3 method name."""
+        return xform_name(operation_name.replace("-", "_"))
+
+    def resolve_operation(self, service_name: str, operation_name: str) -> Optional[Tuple[str, str]]:
+        """
+        Resolve an operation name in any casing.
+
+        Returns:
+            Optional[Tuple[str, str]]: (snake_case name, PascalCase name), or None if not found.
+        """
+        operations = self.operations(service_name)
+        snake_name = operation_name if operation_name in operations else self.normalize_operation_name(operation_name)
+        entry = operations.get(snake_name)
+        if entry is None:
+            return None
+        return snake_name, entry[0]
+
+    def input_shape_name(self, service_name: str, operation_name: str) -> Optional[str]:
+        """Return the input shape name of an operation, if it has one."""
+        resolved = self.resolve_operation(service_name, operation_name)
+        if resolved is None:
+            return None
+        return self.operations(service_name)[resolved[0]][1]
+
+    def required_parameters(self, service_name: str, operation_name: str) -> List[str]:
+        """Return the required top-level parameters of an operation."""
+        shape_name = self.input_shape_name(service_name, operation_name)
+        if shape_name is None:
+            return []
+        return required_members(service_name, self.service_model(service_name)["shapes"], shape_name)
+
+    def suggest_services(self, service_name: str, n: int = 5) -> List[str]:
+        """Return the closest matching service names."""
+        return difflib.get_close_matches(service_name.lower(), self.services(), n=n, cutoff=0.5)
+
+    def suggest_operations(self, service_name: str, operation_name: str, n: int = 5) -> List[str]:
+        """Return the closest matching snake_case operation names of a service."""
+        snake_name = self.normalize_operation_name(operation_name)
+        return difflib.get_close_matches(snake_name, list(self.operations(service_name)), n=n, cutoff=0.5)
+
+    def build(self, path: Optional[str] = None) -> None:
+        """
+        Index every service and save the catalog to disk.
+
+        A separate loader is used so that the full set of service models is not
+        kept in memory by the shared session after the catalog is built.
+
+        Args:
+            path (Optional[str]): Destination file. Defaults to the catalog path.
+        """
+        loader = create_loader()
+        services = sorted(loader.list_available_services("service-2"))
+        operations = {
+            service_name: self._index_operations(loader.load_service_model(service_name, "service-2"))
+            for service_name in services
+        }
+        with self._lock:
+            self._services = services
+            self._operations = operations
+
+        path = path or self.path
+        if path:
+            self.save(path)
+
+    def save(self, path: str) -> None:
+        """Save the indexed services to disk, keyed by the botocore version."""
+        with self._lock:
+            data = {
+                "botocore_version": self.botocore_version,
+                "services": self._services,
+                "operations": self._operations,
+            }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        logger.info(f"Saved service catalog ({len(self._operations)} services): {path}")
+
+    def load(self, path: str) -> bool:
+        """
+        Load a saved catalog. Files written by another botocore version are ignored.
+
+        Returns:
+            bool: True if the catalog was loaded.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Service catalog not loaded from {path}: {str(e)}")
+            return False
+
+        if data.get("botocore_version") != self.botocore_version:
+            logger.info(f"Ignoring service catalog built with botocore {data.get('botocore_version')}")
+            return False
+
+        with self._lock:
+            self._services = data["services"]
+            self._operations = data["operations"]
+        return True
+
+
+class MappedServiceCatalog(ServiceCatalog):
+    """
+    Read-only service catalog backed by a memory-mapped index file.
+
+    Opening the file reads two header lines and nothing else, so no botocore model is
+    loaded at import time. Lookups are binary searches over the mapped pages. The file
+    holds sorted UTF-8 lines after the header:
+
+        use-aws-catalog/2<TAB><botocore version>
+        <service>,<service>,...
+        <service><TAB><snake op><TAB><Pascal op><TAB><input shape><TAB><required,params>
+
+    The file may be built with another botocore version than the one at runtime. An
+    operation or a service that is missing from the file is looked up in the botocore
+    model of that one service, so newer operations and services still resolve.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path=None)
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self._map.find(b"\n")
+        header = self._map[:header_end].split(b"\t")
+        if header[0] != CATALOG_MAGIC or len(header) != 2:
+            self._map.close()
+            raise ValueError(f"Not a use_aws catalog index: {path}")
+        self.catalog_version = header[1].decode()
+        services_end = self._map.find(b"\n", header_end + 1)
+        self._services = self._map[header_end + 1:services_end].decode().split(",")
+        self._data_start = services_end + 1
+        self._runtime_services: Optional[List[str]] = None
+        if self.catalog_version != self.botocore_version:
+            logger.info(f"Service catalog built with botocore {self.catalog_version}, running {self.botocore_version}")
+
+    def _is_runtime_service(self, service_name: str) -> bool:
+        # Services added after the file was built; the loader lists them without loading models
+        if self._runtime_services is None:
+            self._runtime_services = sorted(self._loader().list_available_services("service-2"))
+        return service_name in self._runtime_services
+
+    def has_service(self, service_name: str) -> bool:
+        return service_name in self._services or self._is_runtime_service(service_name)
+
+    def _seek(self, key: bytes) -> int:
+        # Offset of the first line that is not less than key
+        lo, hi = self._data_start, len(self._map)
+        while lo < hi:
+            start = self._map.rfind(b"\n", 0, (lo + hi) // 2) + 1
+            end = self._map.find(b"\n", start)
+            if self._map[start:end] < key:
+                lo = end + 1
+            else:
+                hi = start
+        return lo
+
+    def _lookup(self, service_name: str, snake_name: str) -> Optional[List[str]]:
+        # Fields of an operation line: [snake op, Pascal op, input shape, required params]
+        key = f"{service_name}\t{snake_name}\t".encode()
+        start = self._seek(key)
+        if self._map[start:start + len(key)] != key:
+            return None
+        end = self._map.find(b"\n", start)
+        return self._map[start:end].decode().split("\t")[1:]
+
+    def operations(self, service_name: str) -> Dict[str, List[Optional[str]]]:
+        operations = self._operations.get(service_name)
+        if operations is not None:
+            return operations
+        if service_name not in self._services:
+            if not self._is_runtime_service(service_name):
+                return {}
+            operations = self._index_operations(self.service_model(service_name))
+            with self._lock:
+                self._operations[service_name] = operations
+            return operations
+
+        operations = {}
+        prefix = f"{service_name}\t".encode()
+        start = self._seek(prefix)
+        while self._map[start:start + len(prefix)] == prefix:
+            end = self._map.find(b"\n", start)
+            snake_name, pascal_name, input_shape, _ = self._map[start:end].decode().split("\t")[1:]
+            operations[snake_name] = [pascal_name, input_shape or None]
+            start = end + 1
+        with self._lock:
+            self._operations[service_name] = operations
+        return operations
+
+    def resolve_operation(self, service_name: str, operation_name: str) -> Optional[Tuple[str, str]]:
+        if service_name not in self._services:
+            return super().resolve_operation(service_name, operation_name)
+        for snake_name in (operation_name, self.normalize_operation_name(operation_name)):
+            fields = self._lookup(service_name, snake_name)
+            if fields is not None:
+                return snake_name, fields[1]
+
+        # Not in the file: fall back to the botocore model of this service only
+        operations = self._index_operations(self.service_model(service_name))
+        snake_name = self.normalize_operation_name(operation_name)
+        if snake_name not in operations:
+            return None
+        return snake_name, operations[snake_name][0]
+
+    def input_shape_name(self, service_name: str, operation_name: str) -> Optional[str]:
+        resolved = self.resolve_operation(service_name, operation_name)
+        if resolved is None:
+            return None
+        fields = self._lookup(service_name, resolved[0])
+        if fields is None:
+            return super().input_shape_name(service_name, operation_name)
+        return fields[2] or None
+
+    def required_parameters(self, service_name: str, operation_name: str) -> List[str]:
+        resolved = self.resolve_operation(service_name, operation_name)
+        if resolved is None:
+            return []
+        fields = self._lookup(service_name, resolved[0])
+        if fields is None:
+            return super().required_parameters(service_name, operation_name)
+        return fields[3].split(",") if fields[3] else []
+
+    def build(self, path: Optional[str] = None) -> None:
+        self.write(path or self.path)
+
+    @staticmethod
+    def write(path: str) -> None:
+        """
+        Build the catalog index of every service from the botocore loader.
+
+        Args:
+            path (str): Destination file.
+        """
+        loader = create_loader()
+        services = sorted(loader.list_available_services("service-2"))
+        lines = []
+        for service_name in services:
+            service_model = loader.load_service_model(service_name, "service-2")
+            shapes = service_model.get("shapes", {})
+            for pascal_name, operation in service_model.get("operations", {}).items():
+                input_shape = operation.get("input", {}).get("shape") or ""
+                required = required_members(service_name, shapes, input_shape)
+                lines.append(f"{service_name}\t{xform_name(pascal_name)}\t{pascal_name}\t{input_shape}\t{','.join(required)}")
+        lines.sort(key=lambda line: line.encode())
+
+        with open(path, "wb") as f:
+            f.write(CATALOG_MAGIC + b"\t" + botocore.__version__.encode() + b"\n")
+            f.write(",".join(services).encode() + b"\n")
+            f.write("\n".join(lines).encode() + b"\n")
+        logger.info(f"Saved service catalog index ({len(services)} services, {len(lines)} operations): {path}")
+
+
+def open_service_catalog(path: Optional[str] = CATALOG_PATH) -> ServiceCatalog:
+    """
+    Open the service catalog. A memory-mapped index (USE_AWS_CATALOG_PATH, or aws_catalog.idx
+    bundled next to this module) is preferred, then a JSON catalog, then the botocore loader.
+    """
+    if path is None and os.path.exists(BUNDLED_CATALOG_PATH):
+        path = BUNDLED_CATALOG_PATH
+    if path and os.path.exists(path):
+        try:
+            return MappedServiceCatalog(path)
+        except (OSError, ValueError):
+            pass
+    return ServiceCatalog(path)
+
+
+service_catalog = open_service_catalog()
+
+
+def resolve_client_method(service_name: str, operation_name: str) -> Optional[str]:
+    """
+    Resolve a method that boto3 adds to clients besides the API operations of the service
+    model, such as generate_presigned_url, get_paginator or s3 upload_file and download_file.
+
+    The service catalog only indexes API operations, so these are looked up on a client of
+    the service, as dir(client) did before the catalog. Use it when resolve_operation fails.
+
+    Returns:
+        Optional[str]: The method name, or None if the client has no such public method.
+    """
+    if not service_catalog.has_service(service_name):
+        return None
+    client = get_client(service_name)
+    for name in (operation_name, service_catalog.normalize_operation_name(operation_name)):
+        if not name.startswith("_") and callable(getattr(client, name, None)):
+            return name
+    return None
+
+
+MUTATIVE_OPERATIONS = [
+    "create",
+    "put",
+    "delete",
+    "update",
+    "terminate",
+    "revoke",
+    "disable",
+    "deregister",
+    "stop",
+    "add",
+    "modify",
+    "remove",
+    "attach",
+    "detach",
+    "start",
+    "enable",
+    "register",
+    "set",
+    "associate",
+    "disassociate",
+    "allocate",
+    "release",
+    "cancel",
+    "reboot",
+    "accept",
+]
+
+# Prefixes of operations whose responses may be cached. Operations that are neither
+# mutative nor listed here (invoke, send_message, receive_message, ...) are never cached.
+READ_ONLY_OPERATIONS = [
+    "describe",
+    "list",
+    "get",
+    "head",
+    "batch_get",
+    "search",
+    "lookup",
+]
+
+
+# Read-only operations that are never cached: they return secrets or short-lived credentials,
+# which must not stay in process memory or be served stale after a rotation
+UNCACHEABLE_OPERATIONS = {
+    ("secretsmanager", "get_secret_value"),
+    ("secretsmanager", "batch_get_secret_value"),
+    ("secretsmanager", "get_random_password"),
+    ("ssm", "get_parameter"),
+    ("ssm", "get_parameters"),
+    ("ssm", "get_parameters_by_path"),
+    ("ssm", "get_parameter_history"),
+    ("sts", "get_session_token"),
+    ("sts", "get_federation_token"),
+    ("sso", "get_role_credentials"),
+    ("cognito-identity", "get_credentials_for_identity"),
+    ("cognito-identity", "get_open_id_token"),
+    ("ecr", "get_authorization_token"),
+    ("ecr-public", "get_authorization_token"),
+    ("codeartifact", "get_authorization_token"),
+    ("redshift", "get_cluster_credentials"),
+    ("redshift", "get_cluster_credentials_with_iam"),
+    ("redshift-serverless", "get_credentials"),
+}
+
+
+def is_mutative_operation(operation_name: str) -> bool:
+    """Check if a snake_case operation name starts with a mutative verb."""
+    return operation_name.split("_", 1)[0] in MUTATIVE_OPERATIONS
+
+
+def is_read_only_operation(operation_name: str) -> bool:
+    """Check if a snake_case operation name is a cacheable read such as describe_* or list_*."""
+    return not is_mutative_operation(operation_name) and any(
+        operation_name == prefix or operation_name.startswith(prefix + "_") for prefix in READ_ONLY_OPERATIONS
+    )
+
+
+def is_cacheable_operation(service_name: str, operation_name: str) -> bool:
+    """Check if the responses of an operation may be cached: read-only and not a secret or credentials."""
+    return is_read_only_operation(operation_name) and (service_name, operation_name) not in UNCACHEABLE_OPERATIONS
+
+
+def parse_service_settings(value: str) -> Dict[str, int]:
+    """
+    Parse comma separated "service=value" settings, e.g. "ec2=60,logs=0".
+    """
+    settings = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            service_name, setting = item.split("=")
+            settings[service_name.strip()] = int(setting)
+        except ValueError:
+            logger.warning(f"Ignoring invalid service setting: {item}")
+    return settings
+
+
+
+def generate_schema(
+    shapes: Dict[str, Any],
+    shape_name: Optional[str],
+    defs: Optional[Dict[str, Any]] = None,
+    stack: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Recursively generate a JSON schema from a shape of a raw botocore service model.
+
+    Structures are inlined. A structure that contains itself, directly or through other
+    shapes, is emitted once in defs and referenced with {"$ref": "#/$defs/<name>"}, so
+    recursive shapes are complete instead of truncated at a fixed depth.
 
     Args:
-        shape (Optional[Shape]): The boto3 shape to generate a schema from.
-        depth (int): Current depth in the recursion. Defaults to 0.
-        max_depth (int): Maximum depth to recurse. Defaults to 5.
+        shapes (Dict[str, Any]): The "shapes" section of the service model.
+        shape_name (Optional[str]): Name of the shape to generate a schema from.
+        defs (Optional[Dict[str, Any]]): Collects the schemas of recursive structures.
+        stack (Optional[List[str]]): Structures being generated, used to detect recursion.
 
     Returns:
         Dict[str, Any]: A dictionary representing the JSON schema.
     """
-    if depth > max_depth or shape is None:
+    if shape_name is None or shape_name not in shapes:
         return {}
+    defs = {} if defs is None else defs
+    stack = [] if stack is None else stack
 
-    shape_type = shape.type_name
+    shape = shapes[shape_name]
+    shape_type = shape.get("type")
 
     if shape_type == "structure":
+        if shape_name in stack or shape_name in defs:
+            defs.setdefault(shape_name, None)
+            return {"$ref": f"#/$defs/{shape_name}"}
+        if shape.get("document"):
+            return {"type": "object"}
+
+        stack.append(shape_name)
         schema = {
             "type": "object",
-            "properties": (
-                {}
-                if not hasattr(shape, "members")
-                else {
-                    member_name: generate_schema(member_shape, depth + 1, max_depth)
-                    for member_name, member_shape in shape.members.items()
-                }
-            ),
+            "properties": {
+                member_name: generate_schema(shapes, member.get("shape"), defs, stack)
+                for member_name, member in shape.get("members", {}).items()
+            },
         }
-        if hasattr(shape, "required_members") and shape.required_members:
-            schema["required"] = list(shape.required_members)
+        if shape.get("required"):
+            schema["required"] = list(shape["required"])
+        stack.pop()
+
+        if shape_name in defs:
+            defs[shape_name] = schema
+            return {"$ref": f"#/$defs/{shape_name}"}
         return schema
     elif shape_type == "list":
         return {
             "type": "array",
-            "items": generate_schema(getattr(shape, "member", None), depth + 1, max_depth),
+            "items": generate_schema(shapes, shape.get("member", {}).get("shape"), defs, stack),
         }
     elif shape_type == "map":
         return {
             "type": "object",
-            "additionalProperties": generate_schema(getattr(shape, "value", None), depth + 1, max_depth),
+            "additionalProperties": generate_schema(shapes, shape.get("value", {}).get("shape"), defs, stack),
         }
     else:
         return SHAPE_TYPE_MAP.get(shape_type, {"type": "object"})
 
 
+class SchemaCache:
+    """
+    Cache of operation input schemas in memory and on disk.
+
+    Schemas are generated from the raw service models of the botocore loader, without
+    creating clients or botocore Shape objects. Each schema is stored as a JSON file at
+    <directory>/<botocore version>/<service>/<operation>.json, so an upgrade of botocore
+    starts a new cache, and build() can precompute the commonly used services ahead of time.
+    """
+
+    def __init__(self, directory: Optional[str] = SCHEMA_CACHE_DIR, max_size: int = SCHEMA_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.botocore_version = botocore.__version__
+        self._schemas: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, service_name: str, operation_name: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, self.botocore_version, service_name, f"{operation_name}.json")
+
+    def get(self, service_name: str, operation_name: str) -> Dict[str, Any]:
+        """
+        Return the input schema of an operation from memory, disk, or by generating it.
+
+        Args:
+            service_name (str): The name of the AWS service.
+            operation_name (str): The snake_case name of the operation.
+
+        Returns:
+            Dict[str, Any]: {"description": ..., "inputSchema": {"json": ...}}
+        """
+        key = (service_name, operation_name)
+        with self._lock:
+            schema = self._schemas.get(key)
+            if schema is not None:
+                self._schemas.move_to_end(key)
+                return schema
+
+        path = self._path(service_name, operation_name)
+        schema = self._read(path) if path else None
+        if schema is None:
+            schema = self.generate(service_name, operation_name)
+            if path:
+                self._write(path, schema)
+
+        with self._lock:
+            self._schemas[key] = schema
+            if len(self._schemas) > self.max_size:
+                self._schemas.popitem(last=False)
+        return schema
+
+    @staticmethod
+    def generate(service_name: str, operation_name: str, service_model: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generate the input schema of an operation from its service model."""
+        resolved = service_catalog.resolve_operation(service_name, operation_name)
+        if resolved is None:
+            raise ValueError(f"Operation '{operation_name}' not found in service '{service_name}'")
+        service_model = service_model or service_catalog.service_model(service_name)
+        shapes = service_model.get("shapes", {})
+        operation = service_model["operations"][resolved[1]]
+
+        defs: Dict[str, Any] = {}
+        input_schema = generate_schema(shapes, operation.get("input", {}).get("shape"), defs)
+        if defs:
+            input_schema["$defs"] = defs
+        return {
+            "description": clean_and_trim_description(operation.get("documentation", "")),
+            "inputSchema": {"json": input_schema},
+        }
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: str, schema: Dict[str, Any]) -> None:
+        # Written to a temporary file and renamed, so concurrent readers never see a partial file
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), delete=False, encoding="utf-8") as f:
+                json.dump(schema, f, separators=(",", ":"))
+            os.replace(f.name, path)
+        except OSError as e:
+            logger.debug(f"Input schema not saved to {path}: {str(e)}")
+
+    def build(self, services: Optional[List[str]] = None) -> int:
+        """
+        Precompute the input schemas of every operation of the given services on disk.
+
+        Args:
+            services (Optional[List[str]]): Services to precompute. Defaults to
+                USE_AWS_SCHEMA_PRECOMPUTE_SERVICES.
+
+        Returns:
+            int: The number of schemas written.
+        """
+        if services is None:
+            services = [name.strip() for name in SCHEMA_PRECOMPUTE_SERVICES.split(",") if name.strip()]
+        loader = create_loader()
+        count = 0
+        for service_name in services:
+            if not service_catalog.has_service(service_name):
+                logger.warning(f"Skipping unknown service: {service_name}")
+                continue
+            service_model = loader.load_service_model(service_name, "service-2")
+            for operation_name in service_catalog.operations(service_name):
+                path = self._path(service_name, operation_name)
+                if path:
+                    self._write(path, self.generate(service_name, operation_name, service_model))
+                    count += 1
+        logger.info(f"Precomputed {count} input schemas: {self.directory}")
+        return count
+
+
+schema_cache = SchemaCache()
+
+
 def clean_and_trim_description(description: str, max_length: int = 2000) -> str:
     """
     Clean and trim a description string by removing HTML tags and limiting length.
@@ -204,7 +1462,7 @@ def to_pascal_case(service_name: str, input_str: str) -> str:
     """
     Convert a snake_case, kebab-case, or camelCase string to PascalCase.
 
-    This function uses boto3 to get the correct PascalCase for AWS operation names.
+    The correct PascalCase for AWS operation names is looked up in the service catalog.
 
     Args:
         service_name (str): The name of the AWS service.
@@ -219,6 +1477,12 @@ def to_pascal_case(service_name: str, input_str: str) -> str:
         >>> to_pascal_case("dynamodb", "create-table")
         'CreateTable'
     """
+    try:
+        resolved = service_catalog.resolve_operation(service_name, input_str)
+        if resolved is not None:
+            return resolved[1]
+    except Exception as e:  # pragma: no cover
+        logger.debug(f"Service catalog lookup failed for '{service_name}': {str(e)}")
 
     # Check if the input is already in PascalCase
     if input_str and input_str[0].isupper() and "_" not in input_str and "-" not in input_str:
@@ -226,51 +1490,8 @@ def to_pascal_case(service_name: str, input_str: str) -> str:
 
     # Convert to PascalCase
     pascal_case = "".join(word.capitalize() for word in WORD_SPLIT_PATTERN.split(input_str))
-
-    try:
-        # Validate using boto3
-        if aws_access_key and aws_secret_key:
-            client = boto3.client(
-                service_name, 
-                region_name="us-west-2", 
-                aws_access_key_id=aws_access_key, 
-                aws_secret_access_key=aws_secret_key, 
-                aws_session_token=aws_session_token
-            )
-        else:
-            client = boto3.client(
-                service_name, 
-                region_name="us-west-2"
-            )
-        service_model = client.meta.service_model
-        service_model.operation_model(pascal_case)
-        return pascal_case
-    except Exception:
-        try:
-            # Fallback: search for matching operation name
-            if aws_access_key and aws_secret_key:
-                client = boto3.client(
-                    service_name, 
-                    region_name="us-west-2", 
-                    aws_access_key_id=aws_access_key, 
-                    aws_secret_access_key=aws_secret_key, 
-                    aws_session_token=aws_session_token
-                )
-            else:
-                client = boto3.client(
-                    service_name, 
-                    region_name="us-west-2"
-                )
-            operations = client.meta.service_model.operation_names
-            snake_case = to_snake_case(input_str)
-            result = next(
-                (op for op in operations if to_snake_case(op) == snake_case),
-                pascal_case,
-            )
-            return result
-        except Exception:  # pragma: no cover
-            logger.debug(f"Could not validate PascalCase for '{input_str}', using: '{pascal_case}'")
-            return pascal_case
+    logger.debug(f"Could not validate PascalCase for '{input_str}', using: '{pascal_case}'")
+    return pascal_case
 
 
 @lru_cache(maxsize=128)
@@ -294,31 +1515,16 @@ def check_boto3_validity(service_name: str, operation_name: str) -> Tuple[bool,
         (False, "Unknown service: 'invalid_service'")
     """
     try:
-        if aws_access_key and aws_secret_key:
-            client = boto3.client(
-                service_name, 
-                region_name="us-west-2", 
-                aws_access_key_id=aws_access_key, 
-                aws_secret_access_key=aws_secret_key, 
-                aws_session_token=aws_session_token
-            )
-        else:
-            client = boto3.client(
-                service_name, 
-                region_name="us-west-2"
-            )
-        pascal_operation_name = to_pascal_case(service_name, operation_name)
-        snake_operation_name = to_snake_case(pascal_operation_name)
+        if not service_catalog.has_service(service_name):
+            return False, f"Unknown service: '{service_name}'"
 
-        if hasattr(client, snake_operation_name) or hasattr(client, pascal_operation_name):
-            return True, ""
-        else:
+        if (service_catalog.resolve_operation(service_name, operation_name) is None
+                and resolve_client_method(service_name, operation_name) is None):
             return (
                 False,
                 f"Operation '{operation_name}' not found in service '{service_name}'",
             )
-    except UnknownServiceError:
-        return False, f"Unknown service: '{service_name}'"
+        return True, ""
     except Exception as e:  # pragma: no cover
         return False, str(e)
 
@@ -327,8 +1533,8 @@ def generate_input_schema(service_name: str, operation_name: str) -> Dict[str, A
     """
     Generate an input schema for a given AWS service operation.
 
-    This function combines all the utility functions to create a complete input schema
-    for the specified AWS service operation.
+    The schema is generated from the botocore service model without creating a client,
+    and cached in memory and on disk by schema_cache.
 
     Args:
         service_name (str): The name of the AWS service.
@@ -347,31 +1553,7 @@ def generate_input_schema(service_name: str, operation_name: str) -> Dict[str, A
         }
 
     try:
-        # Create a boto3 client and get the service model
-        if aws_access_key and aws_secret_key:
-            client = boto3.client(
-                service_name, 
-                region_name="us-west-2", 
-                aws_access_key_id=aws_access_key, 
-                aws_secret_access_key=aws_secret_key, 
-                aws_session_token=aws_session_token
-            )
-        else:
-            client = boto3.client(
-                service_name, 
-                region_name="us-west-2"
-            )
-        service_model = client.meta.service_model
-        pascal_operation_name = to_pascal_case(service_name, operation_name)
-        operation_model = service_model.operation_model(pascal_operation_name)
-
-        # Generate the schema
-        result = {
-            "result": "success",
-            "name": operation_name,
-            "description": clean_and_trim_description(operation_model.documentation),
-            "inputSchema": {"json": generate_schema(operation_model.input_shape)},
-        }
-        return result
+        schema = schema_cache.get(service_name, service_catalog.normalize_operation_name(operation_name))
+        return {"result": "success", "name": operation_name, **schema}
     except Exception as e:
         raise RuntimeError(f"Error generating input schema: {str(e)}") from e